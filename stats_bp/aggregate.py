@@ -0,0 +1,104 @@
+import numpy as np
+from scipy import stats
+
+SIZES = ['32', '64', '128', '256', '512']
+METRICS = ['ipc', 'miss']
+AXES = ['impl', 'size', 'bench']
+
+# Mean of each metric: harmonic for the IPC, arithmetic for the miss rate
+MEANS = {'ipc': 'hmean', 'miss': 'mean'}
+
+
+def count(values, axis):
+    return np.sum(~np.isnan(values), axis=axis)
+
+
+def mean(values, axis):
+    """Arithmetic mean of the values that are not NaN, NaN if there are none"""
+    n = count(values, axis)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(n > 0, np.nansum(values, axis=axis) / n, np.nan)
+
+
+def hmean(values, axis):
+    n = count(values, axis)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(n > 0, n / np.nansum(1.0 / values, axis=axis), np.nan)
+
+
+def gmean(values, axis):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.exp(mean(np.log(values), axis))
+
+
+REDUCERS = {'mean': mean, 'hmean': hmean, 'gmean': gmean}
+
+
+class Cube:
+    """Results pivoted in an impl x size x bench x metric array, NaN where a
+    run is missing
+
+    data is load_results(by='impl'): data[impl][size][bench][metric].
+    """
+
+    def __init__(self, data, sizes=SIZES, benchmarks=None, metrics=METRICS):
+        self.impls = sorted(data)
+        self.sizes = list(sizes)
+        self.benchmarks = list(benchmarks) if benchmarks else \
+            sorted({bench for impl in data for size in data[impl] for bench in data[impl][size]})
+        self.metrics = list(metrics)
+        self.values = np.full((len(self.impls), len(self.sizes), len(self.benchmarks), len(self.metrics)),
+                              np.nan)
+        sizes = {size: i for i, size in enumerate(self.sizes)}
+        benchmarks = {bench: i for i, bench in enumerate(self.benchmarks)}
+        for i, impl in enumerate(self.impls):
+            for size, runs in data[impl].items():
+                if size not in sizes:
+                    continue
+                for bench, run in runs.items():
+                    if bench in benchmarks:
+                        self.values[i, sizes[size], benchmarks[bench]] = [run[m] for m in self.metrics]
+
+    def metric(self, metric):
+        """impl x size x bench array of a metric"""
+        return self.values[..., self.metrics.index(metric)]
+
+    def has(self, impl, size):
+        """Whether there is a run of an implementation at a size"""
+        return not np.all(np.isnan(self.values[self.impls.index(impl), self.sizes.index(size)]))
+
+    def reduce(self, metric, over, how=None):
+        """Mean of a metric over an axis (impl, size or bench), the mean of
+        MEANS by default; the axis is removed"""
+        return REDUCERS[how or MEANS[metric]](self.metric(metric), AXES.index(over))
+
+    def confidence_interval(self, metric, over, level=0.95):
+        """Arithmetic mean of a metric over an axis, and the half width of its
+        Student's t confidence interval (NaN with fewer than 2 values)"""
+        values = self.metric(metric)
+        axis = AXES.index(over)
+        n = count(values, axis)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            deviation = np.sqrt(mean((values - np.expand_dims(mean(values, axis), axis)) ** 2, axis)
+                                * n / (n - 1))
+            half_width = stats.t.ppf((1 + level) / 2, n - 1) * deviation / np.sqrt(n)
+        return mean(values, axis), np.where(n > 1, half_width, np.nan)
+
+    def speedup(self, baseline, metric='ipc'):
+        """impl x size x bench array of a metric relative to the one of a
+        baseline implementation"""
+        values = self.metric(metric)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return values / values[self.impls.index(baseline)]
+
+    def summary(self, over):
+        """All the means of every metric over an axis: {(metric, statistic):
+        array}, the statistics being mean, hmean, gmean, ci (the confidence
+        interval half width) and n"""
+        result = {}
+        for metric in self.metrics:
+            for how in REDUCERS:
+                result[(metric, how)] = self.reduce(metric, over, how)
+            result[(metric, 'ci')] = self.confidence_interval(metric, over)[1]
+            result[(metric, 'n')] = count(self.metric(metric), AXES.index(over))
+        return result
@@ -1,49 +1,20 @@
-import re
 import matplotlib.pyplot as plt
-from collections import defaultdict
 import numpy as np
 import os
-from scipy.stats import hmean
-
-def parse_file(filename):
-    with open(filename, 'r') as f:
-        content = f.read()
-
-    implementations = content.split('----------------------------')
-    data = defaultdict(lambda: defaultdict(lambda: defaultdict(dict)))
-
-    for impl in implementations:
-        if not impl.strip():
-            continue
-
-        impl_match = re.search(r'Implementation: (.+?) \((\d+) Kbits\)', impl)
-        if not impl_match:
-            impl_match = re.search(r'Implementation: (.+?) \( Kbits\)', impl)
-            if impl_match:
-                impl_name = impl_match.group(1).strip()
-                size = 'N/A'
-            else:
-                continue
-        else:
-            impl_name = impl_match.group(1).strip()
-            size = impl_match.group(2)
-
-        benchmarks = re.findall(r'([a-zA-Z\-]+)\s*IPC:\s*([\d.]+)\s*Ratio of branch misses:\s*([\d.]+)\s*%', impl)
-
-        for bench, ipc, miss in benchmarks:
-            data[bench][impl_name][size] = {
-                'ipc': float(ipc),
-                'miss': float(miss)
-            }
-
-    return data
-
-def create_mean_comparison_plots(data):
+from aggregate import Cube
+from stats_db import STATS_DB, load_results
+
+def create_mean_comparison_plots(cube):
     os.makedirs('mean_comparison_plots/png', exist_ok=True)
     os.makedirs('mean_comparison_plots/eps', exist_ok=True)
 
-    implementations = sorted({impl for bench in data for impl in data[bench]})
-    sizes = ['32', '64', '128', '256', '512']
+    implementations = cube.impls
+    sizes = cube.sizes
+
+    # Harmonic mean IPC and arithmetic mean miss rate over the benchmarks,
+    # 0 without runs
+    ipc_means = np.nan_to_num(cube.reduce('ipc', over='bench'))
+    miss_means = np.nan_to_num(cube.reduce('miss', over='bench'))
 
     # Color setup
     colors = plt.cm.tab20(np.linspace(0, 1, len(implementations)))
@@ -73,21 +44,9 @@ def create_mean_comparison_plots(data):
     width = 0.15
     multiplier = 0
 
-    for impl in implementations:
-        ipc_means = []
-        for size in sizes:
-            ipc_values = []
-            for bench in data:
-                if impl in data[bench] and size in data[bench][impl]:
-                    ipc_values.append(data[bench][impl][size]['ipc'])
-
-            if ipc_values:
-                ipc_means.append(hmean(ipc_values))
-            else:
-                ipc_means.append(0)
-
+    for i, impl in enumerate(implementations):
         offset = width * multiplier
-        plt.bar(x + offset, ipc_means, width, label=impl, color=colors[multiplier])
+        plt.bar(x + offset, ipc_means[i], width, label=impl, color=colors[multiplier])
         multiplier += 1
 
     plt.title('Harmonic Mean IPC Across All Benchmarks', fontsize=14)
@@ -107,21 +66,9 @@ def create_mean_comparison_plots(data):
 
     multiplier = 0
 
-    for impl in implementations:
-        miss_means = []
-        for size in sizes:
-            miss_values = []
-            for bench in data:
-                if impl in data[bench] and size in data[bench][impl]:
-                    miss_values.append(data[bench][impl][size]['miss'])
-
-            if miss_values:
-                miss_means.append(np.mean(miss_values))
-            else:
-                miss_means.append(0)
-
+    for i, impl in enumerate(implementations):
         offset = width * multiplier
-        plt.bar(x + offset, miss_means, width, label=impl, color=colors[multiplier])
+        plt.bar(x + offset, miss_means[i], width, label=impl, color=colors[multiplier])
         multiplier += 1
 
     plt.title('Arithmetic Mean Miss Rate Across All Benchmarks', fontsize=14)
@@ -137,5 +84,5 @@ def create_mean_comparison_plots(data):
     plt.close()
 
 # Example usage
-data = parse_file('stats_bp.txt')
-create_mean_comparison_plots(data)
\ No newline at end of file
+cube = Cube(load_results(STATS_DB, by='impl'))
+create_mean_comparison_plots(cube)
\ No newline at end of file
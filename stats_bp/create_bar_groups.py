@@ -1,185 +1,98 @@
-import re
 import matplotlib.pyplot as plt
-from collections import defaultdict
 import numpy as np
 import os
-from scipy.stats import hmean
-
-
-def parse_file(filename):
-    with open(filename, 'r') as f:
-        content = f.read()
-
-    implementations = content.split('----------------------------')
-    data = defaultdict(lambda: defaultdict(lambda: defaultdict(dict)))
-
-    for impl in implementations:
-        if not impl.strip():
-            continue
-
-        # Extract implementation name and size
-        impl_match = re.search(r'Implementation: (.+?) \((\d+) Kbits\)', impl)
-        if not impl_match:
-            impl_match = re.search(r'Implementation: (.+?) \( Kbits\)', impl)
-            if impl_match:
-                impl_name = impl_match.group(1).strip()
-                size = 'N/A'
-            else:
-                continue
-        else:
-            impl_name = impl_match.group(1).strip()
-            size = impl_match.group(2)
-
-        # Extract benchmarks data
-        benchmarks = re.findall(r'([a-zA-Z\-]+)\s*IPC:\s*([\d.]+)\s*Ratio of branch misses:\s*([\d.]+)\s*%', impl)
-
-        for bench, ipc, miss in benchmarks:
-            data[bench][impl_name][size] = {
-                'ipc': float(ipc),
-                'miss': float(miss)
-            }
-
-    return data
-
-
-def create_size_comparison_plots(data):
+from aggregate import Cube
+from stats_db import STATS_DB, load_results
+from render import render
+
+
+# Style for publication-quality plots
+STYLE = 'seaborn-v0_8-deep'
+RC_PARAMS = {
+    'font.size': 12,
+    'axes.titlesize': 14,
+    'axes.labelsize': 12,
+    'xtick.labelsize': 10,
+    'ytick.labelsize': 10,
+    'legend.fontsize': 10,
+    'figure.dpi': 300,
+    'savefig.dpi': 300,
+    'savefig.bbox': 'tight',
+    'savefig.pad_inches': 0.1,
+    'lines.linewidth': 1.5,
+    'axes.grid': True,
+    'grid.alpha': 0.3
+}
+
+
+def plot_size_bars(title, ylabel, bars, bench_labels, style, rc_params, outputs):
+    plt.style.use(style)
+    plt.rcParams.update(rc_params)
+
+    plt.figure(figsize=(14, 6))  # Slightly wider to accommodate average bar
+
+    x = np.arange(len(bench_labels))
+    width = 0.15
+    multiplier = 0
+
+    for impl, values, color in bars:
+        offset = width * multiplier
+        plt.bar(x + offset, values, width, label=impl, color=color)
+        multiplier += 1
+
+    plt.title(title, fontsize=14)
+    plt.xlabel('Benchmarks', fontsize=12)
+    plt.ylabel(ylabel, fontsize=12)
+    plt.xticks(x + width * (multiplier - 1) / 2, bench_labels, rotation=45, ha='right')
+    plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
+    plt.grid(True, axis='y', linestyle='--', alpha=0.3)
+    plt.tight_layout()
+
+    # Save in both formats
+    plt.savefig(outputs[0])
+    plt.savefig(outputs[1], format='eps')
+    plt.close()
+
+
+def create_size_comparison_plots(cube, jobs=None):
     # Create output directories if they don't exist
     os.makedirs('size_comparison_plots/png', exist_ok=True)
     os.makedirs('size_comparison_plots/eps', exist_ok=True)
 
-    benchmarks = sorted(data.keys())
-    implementations = sorted({impl for bench in data for impl in data[bench]})
-    sizes = ['32', '64', '128', '256', '512']
+    benchmarks = cube.benchmarks
+    implementations = cube.impls
+    sizes = cube.sizes
 
     # Color setup
-    colors = plt.cm.tab20(np.linspace(0, 1, len(implementations) + 1))  # +1 for average bar
-
-    # Set style for publication-quality plots
-    plt.style.use('seaborn-v0_8-deep')
-    plt.rcParams.update({
-        'font.size': 12,
-        'axes.titlesize': 14,
-        'axes.labelsize': 12,
-        'xtick.labelsize': 10,
-        'ytick.labelsize': 10,
-        'legend.fontsize': 10,
-        'figure.dpi': 300,
-        'savefig.dpi': 300,
-        'savefig.bbox': 'tight',
-        'savefig.pad_inches': 0.1,
-        'lines.linewidth': 1.5,
-        'axes.grid': True,
-        'grid.alpha': 0.3
-    })
-
-    # Create plots for each size
-    for size in sizes:
-        # IPC Plot for this size
-        plt.figure(figsize=(14, 6))  # Slightly wider to accommodate average bar
-
-        x = np.arange(len(benchmarks) + 1)  # +1 for average position
-        width = 0.15
-        multiplier = 0
-
-        # Calculate harmonic means for IPC
-        ipc_hmeans = {impl: 0 for impl in implementations}
-        valid_counts = {impl: 0 for impl in implementations}
-
-        for impl in implementations:
-            ipc_values = []
-            for bench in benchmarks:
-                if impl in data[bench] and size in data[bench][impl]:
-                    ipc_values.append(data[bench][impl][size]['ipc'])
-
-            if ipc_values:
-                ipc_hmeans[impl] = hmean(ipc_values)
-                valid_counts[impl] = len(ipc_values)
-
-        for impl in implementations:
-            ipc_values = []
-            for bench in benchmarks:
-                if impl in data[bench] and size in data[bench][impl]:
-                    ipc_values.append(data[bench][impl][size]['ipc'])
-                else:
-                    ipc_values.append(0)
-
-            # Add average at the end
-            if valid_counts[impl] > 0:
-                ipc_values.append(ipc_hmeans[impl])
-            else:
-                ipc_values.append(0)
-
-            offset = width * multiplier
-            plt.bar(x + offset, ipc_values, width, label=impl, color=colors[multiplier])
-            multiplier += 1
-
-        # Add benchmark labels + "Average"
-        bench_labels = benchmarks + ['Average']
-
-        plt.title(f'IPC Comparison ({size}Kbits) with Harmonic Mean', fontsize=14)
-        plt.xlabel('Benchmarks', fontsize=12)
-        plt.ylabel('IPC', fontsize=12)
-        plt.xticks(x + width * (multiplier - 1) / 2, bench_labels, rotation=45, ha='right')
-        plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
-        plt.grid(True, axis='y', linestyle='--', alpha=0.3)
-        plt.tight_layout()
-
-        # Save in both formats
-        plt.savefig(f'size_comparison_plots/png/ipc_{size}K.png')
-        plt.savefig(f'size_comparison_plots/eps/ipc_{size}K.eps', format='eps')
-        plt.close()
-
-        # Miss Rate Plot for this size
-        plt.figure(figsize=(14, 6))
-
-        multiplier = 0
-
-        # Calculate arithmetic means for miss rate
-        miss_means = {impl: 0 for impl in implementations}
-        valid_counts = {impl: 0 for impl in implementations}
-
-        for impl in implementations:
-            miss_values = []
-            for bench in benchmarks:
-                if impl in data[bench] and size in data[bench][impl]:
-                    miss_values.append(data[bench][impl][size]['miss'])
-
-            if miss_values:
-                miss_means[impl] = np.mean(miss_values)
-                valid_counts[impl] = len(miss_values)
-
-        for impl in implementations:
-            miss_values = []
-            for bench in benchmarks:
-                if impl in data[bench] and size in data[bench][impl]:
-                    miss_values.append(data[bench][impl][size]['miss'])
-                else:
-                    miss_values.append(0)
-
-            # Add average at the end
-            if valid_counts[impl] > 0:
-                miss_values.append(miss_means[impl])
-            else:
-                miss_values.append(0)
-
-            offset = width * multiplier
-            plt.bar(x + offset, miss_values, width, label=impl, color=colors[multiplier])
-            multiplier += 1
-
-        plt.title(f'Branch Miss Rate Comparison ({size}Kbits) with Arithmetic Mean', fontsize=14)
-        plt.xlabel('Benchmarks', fontsize=12)
-        plt.ylabel('Miss Rate (%)', fontsize=12)
-        plt.xticks(x + width * (multiplier - 1) / 2, bench_labels, rotation=45, ha='right')
-        plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
-        plt.grid(True, axis='y', linestyle='--', alpha=0.3)
-        plt.tight_layout()
-
-        # Save in both formats
-        plt.savefig(f'size_comparison_plots/png/miss_rate_{size}K.png')
-        plt.savefig(f'size_comparison_plots/eps/miss_rate_{size}K.eps', format='eps')
-        plt.close()
-
-
-# Example usage
-data = parse_file('stats_bp.txt')
-create_size_comparison_plots(data)
\ No newline at end of file
+    colors = plt.cm.tab20(np.linspace(0, 1, len(implementations) + 1)).tolist()  # +1 for average bar
+
+    # Add benchmark labels + "Average"
+    bench_labels = benchmarks + ['Average']
+
+    # IPC with harmonic means, miss rate with arithmetic means, missing
+    # runs and means drawn as 0
+    values = {metric: np.nan_to_num(np.concatenate(
+        [cube.metric(metric), cube.reduce(metric, over='bench')[:, :, np.newaxis]], axis=2))
+        for metric in ('ipc', 'miss')}
+
+    figures = []
+    for s, size in enumerate(sizes):
+        for metric, title, ylabel, name in (
+                ('ipc', f'IPC Comparison ({size}Kbits) with Harmonic Mean', 'IPC', 'ipc'),
+                ('miss', f'Branch Miss Rate Comparison ({size}Kbits) with Arithmetic Mean',
+                 'Miss Rate (%)', 'miss_rate')):
+            bars = [(impl, values[metric][i, s].tolist(), colors[i])
+                    for i, impl in enumerate(implementations)]
+
+            outputs = [f'size_comparison_plots/png/{name}_{size}K.png',
+                       f'size_comparison_plots/eps/{name}_{size}K.eps']
+            figures.append((plot_size_bars,
+                            (title, ylabel, bars, bench_labels, STYLE, RC_PARAMS, outputs), outputs))
+
+    # Only the figures whose data changed are drawn again
+    render(figures, jobs)
+
+
+if __name__ == '__main__':
+    cube = Cube(load_results(STATS_DB, by='impl'))
+    create_size_comparison_plots(cube)
@@ -1,45 +1,9 @@
-import re
 import matplotlib.pyplot as plt
-from collections import defaultdict
 import numpy as np
 import os
 import math
-
-
-def parse_file(filename):
-    with open(filename, 'r') as f:
-        content = f.read()
-
-    implementations = content.split('----------------------------')
-    data = defaultdict(lambda: defaultdict(lambda: defaultdict(dict)))
-
-    for impl in implementations:
-        if not impl.strip():
-            continue
-
-        # Extract implementation name and size
-        impl_match = re.search(r'Implementation: (.+?) \((\d+) Kbits\)', impl)
-        if not impl_match:
-            impl_match = re.search(r'Implementation: (.+?) \( Kbits\)', impl)
-            if impl_match:
-                impl_name = impl_match.group(1).strip()
-                size = 'N/A'
-            else:
-                continue
-        else:
-            impl_name = impl_match.group(1).strip()
-            size = impl_match.group(2)
-
-        # Extract benchmarks data
-        benchmarks = re.findall(r'([a-zA-Z\-]+)\s*IPC:\s*([\d.]+)\s*Ratio of branch misses:\s*([\d.]+)\s*%', impl)
-
-        for bench, ipc, miss in benchmarks:
-            data[bench][impl_name][size] = {
-                'ipc': float(ipc),
-                'miss': float(miss)
-            }
-
-    return data
+from stats_db import STATS_DB, load_results
+from render import render
 
 
 def get_effective_size(impl_name, nominal_size):
@@ -78,7 +42,32 @@ def get_effective_size(impl_name, nominal_size):
     return nominal_size
 
 
-def create_plots(data):
+def plot_benchmark(title, ylabel, series, nominal_sizes, output):
+    plt.figure(figsize=(12, 6))
+    for impl, color, marker, x, y in series:
+        plt.plot(x, y,
+                 label=impl,
+                 color=color,
+                 marker=marker,
+                 linestyle='-',
+                 linewidth=2,
+                 markersize=8)
+
+    plt.title(title, fontsize=14)
+    plt.xlabel('Presupuesto (Kbits)', fontsize=12)
+    plt.ylabel(ylabel, fontsize=12)
+    plt.grid(True, linestyle='--', alpha=0.7)
+
+    # Set x-ticks to show nominal sizes
+    plt.xticks([int(size) for size in nominal_sizes], nominal_sizes)
+
+    plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
+    plt.tight_layout()
+    plt.savefig(output, dpi=300, bbox_inches='tight')
+    plt.close()
+
+
+def create_plots(data, jobs=None):
     # Create output directory if it doesn't exist
     os.makedirs('benchmark_plots', exist_ok=True)
 
@@ -92,83 +81,36 @@ def create_plots(data):
     implementations = sorted(implementations)
 
     # Color and marker setup
-    colors = plt.cm.tab20(np.linspace(0, 1, len(implementations)))
+    colors = plt.cm.tab20(np.linspace(0, 1, len(implementations))).tolist()
     markers = ['o', 's', '^', 'D', 'v', '>', '<', 'p', '*', 'h', 'H', '+', 'x', 'X', 'd', '|', '_']
 
+    figures = []
     for bench in benchmarks:
-        # IPC Plot
-        plt.figure(figsize=(12, 6))
-        for i, impl in enumerate(implementations):
-            if impl not in data[bench]:
-                continue
-
-            x = []
-            y = []
-            for size in nominal_sizes:
-                if size in data[bench][impl]:
-                    effective_size = get_effective_size(impl, size)
-                    x.append(effective_size)
-                    y.append(data[bench][impl][size]['ipc'])
-
-            if x and y:  # Only plot if we have data
-                plt.plot(x, y,
-                         label=impl,
-                         color=colors[i],
-                         marker=markers[i % len(markers)],
-                         linestyle='-',
-                         linewidth=2,
-                         markersize=8)
-
-        plt.title(f'IPC de {bench.upper()}', fontsize=14)
-        plt.xlabel('Presupuesto (Kbits)', fontsize=12)
-        plt.ylabel('IPC', fontsize=12)
-        plt.grid(True, linestyle='--', alpha=0.7)
-
-        # Set x-ticks to show nominal sizes
-        plt.xticks([32, 64, 128, 256, 512], nominal_sizes)
-
-        plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
-        plt.tight_layout()
-        plt.savefig(f'benchmark_plots/{bench}_ipc.png', dpi=300, bbox_inches='tight')
-        plt.close()
-
-        # Branch Miss Rate Plot
-        plt.figure(figsize=(12, 6))
-        for i, impl in enumerate(implementations):
-            if impl not in data[bench]:
-                continue
-
-            x = []
-            y = []
-            for size in nominal_sizes:
-                if size in data[bench][impl]:
-                    effective_size = get_effective_size(impl, size)
-                    x.append(effective_size)
-                    y.append(data[bench][impl][size]['miss'])
-
-            if x and y:  # Only plot if we have data
-                plt.plot(x, y,
-                         label=impl,
-                         color=colors[i],
-                         marker=markers[i % len(markers)],
-                         linestyle='-',
-                         linewidth=2,
-                         markersize=8)
-
-        plt.title(f'Tasa de Fallos de {bench.upper()}', fontsize=14)
-        plt.xlabel('Presupuesto (Kbits)', fontsize=12)
-        plt.ylabel('Tasa de Fallos (%)', fontsize=12)
-        plt.grid(True, linestyle='--', alpha=0.7)
-
-        # Set x-ticks to show nominal sizes
-        plt.xticks([32, 64, 128, 256, 512], nominal_sizes)
-
-        plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
-        plt.tight_layout()
-        plt.savefig(f'benchmark_plots/{bench}_miss_rate.png', dpi=300, bbox_inches='tight')
-        plt.close()
-
-
-# Example usage
-data = parse_file('stats_bp.txt')
-create_plots(data)
\ No newline at end of file
+        for metric, title, ylabel, name in (
+                ('ipc', f'IPC de {bench.upper()}', 'IPC', 'ipc'),
+                ('miss', f'Tasa de Fallos de {bench.upper()}', 'Tasa de Fallos (%)', 'miss_rate')):
+            series = []
+            for i, impl in enumerate(implementations):
+                if impl not in data[bench]:
+                    continue
+
+                x = []
+                y = []
+                for size in nominal_sizes:
+                    if size in data[bench][impl]:
+                        x.append(get_effective_size(impl, size))
+                        y.append(data[bench][impl][size][metric])
+
+                if x and y:  # Only plot if we have data
+                    series.append((impl, colors[i], markers[i % len(markers)], x, y))
+
+            output = f'benchmark_plots/{bench}_{name}.png'
+            figures.append((plot_benchmark, (title, ylabel, series, nominal_sizes, output), [output]))
+
+    # Only the figures whose data changed are drawn again
+    render(figures, jobs)
+
+
+if __name__ == '__main__':
+    data = load_results(STATS_DB, by='bench')
+    create_plots(data)
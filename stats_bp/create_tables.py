@@ -1,155 +1,139 @@
+import argparse
+import math
 import re
-from collections import defaultdict
-from statistics import harmonic_mean
-
-def parse_file(filename):
-    with open(filename, 'r') as f:
-        content = f.read()
-
-    implementations = content.split('----------------------------')
-    data = defaultdict(lambda: defaultdict(dict))
-
-    for impl in implementations:
-        if not impl.strip():
+import sys
+from aggregate import Cube
+from stats_db import STATS_DB, load_results
+
+# Column header, caption and label prefix of the table of each metric
+METRICS = {
+    'miss': ('Tasa de fallos (\\%)', 'Tasa de fallos de predicción', 'branch-misses'),
+    'ipc': ('IPC', 'IPC', 'ipc'),
+}
+
+# Header of the first column and caption wording of each kind of row
+ROWS = {
+    'size': ('Tamaño', '(Kbits)', 'cada tamaño'),
+    'params': ('Configuración', '', 'cada configuración'),
+}
+
+LATEX_SPECIAL = {'\\': '\\textbackslash{}', '_': '\\_', '%': '\\%', '&': '\\&', '#': '\\#',
+                 '$': '\\$', '{': '\\{', '}': '\\}'}
+
+
+def escape(text):
+    return ''.join(LATEX_SPECIAL.get(c, c) for c in str(text))
+
+
+def row_order(row):
+    """Rows in natural order: the numbers in sizes and configuration
+    parameters are compared as numbers, e.g. bht=8192 before bht=16384"""
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', row)]
+
+
+def cell(value):
+    return "& - " if math.isnan(value) else f"& {value:.2f} "
+
+
+def latex_table(impl_name, metric, row_kind, rows, benchmarks, values, means, part=''):
+    """One table of a metric: a row per size or configuration, a column per
+    benchmark and the means over the rows
+
+    values is the rows x benchmarks array of the metric, NaN where a run is
+    missing, and means its mean over the rows. Returns the table as a string.
+    """
+    header, caption, label = METRICS[metric]
+    row_header, row_unit, row_caption = ROWS[row_kind]
+    n = len(benchmarks)
+    lines = [
+        "\\begin{table}[H]",
+        "    \\centering",
+        "    \\resizebox{\\linewidth}{!}{",
+        f"        \\begin{{tabular}}{{|{'c|' * (n + 1)}}}",
+        "            \\hline",
+        "             \\rowcolor{gray!60}",
+        f"             \\textbf{{{row_header}}} & \\multicolumn{{{n}}}{{|c|}}{{\\textbf{{{header}}}}} \\\\",
+        f"             \\cline{{2-{n + 1}}}",
+        "              \\rowcolor{gray!60}",
+        "              " + (f"\\textbf{{{row_unit}}} " if row_unit else "")
+        + ''.join(f"& \\textbf{{{escape(bench)}}} " for bench in benchmarks) + "\\\\ ",
+        "              \\hline",
+    ]
+    for row, row_values in zip(rows, values):
+        lines.append(f"              \\textbf{{{escape(row)}}} " + ''.join(map(cell, row_values)) + "\\\\")
+        lines.append("              \\hline")
+    lines.append("              \\cellcolor{gray!60} \\textbf{Media} " + ''.join(map(cell, means)) + "\\\\")
+    lines.append("              \\hline")
+    lines += [
+        "        \\end{tabular}",
+        "    }",
+        f"    \\caption{{{caption} para {row_caption} para la implementación \\textbf{{{escape(impl_name)}}}"
+        + (" (cont.)" if part else "") + "}",
+        f"    \\label{{{label}-{impl_name.lower().replace(' ', '-')}{part}}}",
+        "\\end{table}",
+        "",
+    ]
+    return '\n'.join(lines) + '\n'
+
+
+def generate_latex_tables(data, row_kind='size', metrics=('miss', 'ipc'), impls=None, max_columns=None):
+    """LaTeX tables of every implementation of load_results(by='impl') and
+    metric, as one string
+
+    The rows and columns are the sizes (or configurations) and benchmarks
+    found in the data, so any benchmark suite or design space sweep gets its
+    tables. Wider suites than max_columns benchmarks are split in several
+    tables.
+    """
+    rows = sorted({row for impl in data for row in data[impl] if row != 'N/A'}, key=row_order)
+    cube = Cube(data, rows)
+    means = {metric: cube.reduce(metric, over='size') for metric in metrics}
+    step = max_columns or len(cube.benchmarks) or 1
+
+    tables = []
+    for i, impl_name in enumerate(cube.impls):
+        if impls and impl_name not in impls:
             continue
-
-        # Extract implementation name and size
-        impl_match = re.search(r'Implementation: (.+?) \((\d+) Kbits\)', impl)
-        if not impl_match:
-            impl_match = re.search(r'Implementation: (.+?) \( Kbits\)', impl)
-            if impl_match:
-                impl_name = impl_match.group(1).strip()
-                size = 'N/A'
-            else:
-                continue
-        else:
-            impl_name = impl_match.group(1).strip()
-            size = impl_match.group(2)
-
-        # Extract benchmarks data
-        benchmarks = re.findall(r'([a-zA-Z\-]+)\s*IPC:\s*([\d.]+)\s*Ratio of branch misses:\s*([\d.]+)\s*%', impl)
-
-        for bench, ipc, miss in benchmarks:
-            data[impl_name][size][bench] = {
-                'ipc': float(ipc),
-                'miss': float(miss)
-            }
-
-    return data
-
-def generate_latex_tables(data):
-    benchmarks = ['bfs', 'cutcp', 'histo', 'lbm', 'mri-gridding', 'mri-q',
-                  'sad', 'sgemm', 'spmv', 'stencil', 'tpacf']
-    sizes = ['32', '64', '128', '256', '512']
-
-    for impl_name in data:
         # Skip implementations with no size information
         if 'N/A' in data[impl_name]:
             continue
+        present = [j for j, row in enumerate(rows) if cube.has(impl_name, row)]
+        if not present:
+            continue
 
-        # Branch Misses Table (unchanged)
-        print(f"\\begin{{table}}[H]")
-        print(f"    \\centering")
-        print(f"    \\resizebox{{\\linewidth}}{{!}}{{")
-        print(f"        \\begin{{tabular}}{{|c|c|c|c|c|c|c|c|c|c|c|c|c|}}")
-        print(f"            \\hline")
-        print(f"             \\rowcolor{{gray!60}}")
-        print(f"             \\textbf{{Tamaño}} & \\multicolumn{{11}}{{|c|}}{{\\textbf{{Tasa de fallos (\\%)}}}} \\\\")
-        print(f"             \\cline{{2-12}}")
-        print(f"              \\rowcolor{{gray!60}}")
-        print(f"              \\textbf{{(Kbits)}} & \\textbf{{bfs}} & \\textbf{{cutcp}} & \\textbf{{histo}} & \\textbf{{lbm}} & \\textbf{{mri-gridding}} & \\textbf{{mri-q}} & \\textbf{{sad}} & \\textbf{{sgemm}} & \\textbf{{spmv}} & \\textbf{{stencil}} & \\textbf{{tpacf}} \\\\ ")
-        print(f"              \\hline")
-
-        # Calculate averages for each size
-        size_averages = defaultdict(list)
-
-        for size in sizes:
-            if size not in data[impl_name]:
-                continue
-
-            print(f"              \\textbf{{{size}}} ", end="")
-            for bench in benchmarks:
-                if bench in data[impl_name][size]:
-                    print(f"& {data[impl_name][size][bench]['miss']:.2f} ", end="")
-                    size_averages[size].append(data[impl_name][size][bench]['miss'])
-                else:
-                    print("& - ", end="")
-            print("\\\\")
-            print(f"              \\hline")
-
-        # Calculate overall averages (arithmetic mean for misses)
-        print(f"              \\cellcolor{{gray!60}} \\textbf{{Media}} ", end="")
-        for bench in benchmarks:
-            bench_values = []
-            for size in sizes:
-                if size in data[impl_name] and bench in data[impl_name][size]:
-                    bench_values.append(data[impl_name][size][bench]['miss'])
-            if bench_values:
-                avg = sum(bench_values) / len(bench_values)
-                print(f"& {avg:.2f} ", end="")
-            else:
-                print("& - ", end="")
-        print("\\\\")
-        print(f"              \\hline")
-
-        print(f"        \\end{{tabular}}")
-        print(f"    }}")
-        print(f"    \\caption{{Tasa de fallos de predicción para cada tamaño para la implementación \\textbf{{{impl_name}}}}}")
-        print(f"    \\label{{branch-misses-{impl_name.lower().replace(' ', '-')}}}")
-        print(f"\\end{{table}}")
-        print()
-
-        # IPC Table
-        print(f"\\begin{{table}}[H]")
-        print(f"    \\centering")
-        print(f"    \\resizebox{{\\linewidth}}{{!}}{{")
-        print(f"        \\begin{{tabular}}{{|c|c|c|c|c|c|c|c|c|c|c|c|c|}}")
-        print(f"            \\hline")
-        print(f"             \\rowcolor{{gray!60}}")
-        print(f"             \\textbf{{Tamaño}} & \\multicolumn{{11}}{{|c|}}{{\\textbf{{IPC}}}} \\\\")
-        print(f"             \\cline{{2-12}}")
-        print(f"              \\rowcolor{{gray!60}}")
-        print(f"              \\textbf{{(Kbits)}} & \\textbf{{bfs}} & \\textbf{{cutcp}} & \\textbf{{histo}} & \\textbf{{lbm}} & \\textbf{{mri-gridding}} & \\textbf{{mri-q}} & \\textbf{{sad}} & \\textbf{{sgemm}} & \\textbf{{spmv}} & \\textbf{{stencil}} & \\textbf{{tpacf}} \\\\ ")
-        print(f"              \\hline")
-
-        for size in sizes:
-            if size not in data[impl_name]:
-                continue
-
-            print(f"              \\textbf{{{size}}} ", end="")
-            for bench in benchmarks:
-                if bench in data[impl_name][size]:
-                    print(f"& {data[impl_name][size][bench]['ipc']:.2f} ", end="")
-                else:
-                    print("& - ", end="")
-            print("\\\\")
-            print(f"              \\hline")
-
-        # Calculate harmonic mean for IPC values
-        print(f"              \\cellcolor{{gray!60}} \\textbf{{Media}} ", end="")
-        for bench in benchmarks:
-            bench_values = []
-            for size in sizes:
-                if size in data[impl_name] and bench in data[impl_name][size]:
-                    bench_values.append(data[impl_name][size][bench]['ipc'])
-            if bench_values:
-                try:
-                    hmean = harmonic_mean(bench_values)
-                    print(f"& {hmean:.2f} ", end="")
-                except statistics.StatisticsError:
-                    print("& - ", end="")
-            else:
-                print("& - ", end="")
-        print("\\\\")
-        print(f"              \\hline")
-
-        print(f"        \\end{{tabular}}")
-        print(f"    }}")
-        print(f"    \\caption{{IPC para cada tamaño para la implementación \\textbf{{{impl_name}}}}}")
-        print(f"    \\label{{ipc-{impl_name.lower().replace(' ', '-')}}}")
-        print(f"\\end{{table}}")
-        print()
-
-# Example usage
-data = parse_file('stats_bp.txt')
-generate_latex_tables(data)
\ No newline at end of file
+        for metric in metrics:
+            values = cube.metric(metric)[i][present]
+            for start in range(0, len(cube.benchmarks), step):
+                columns = slice(start, start + step)
+                tables.append(latex_table(impl_name, metric, row_kind, [rows[j] for j in present],
+                                          cube.benchmarks[columns], values[:, columns],
+                                          means[metric][i][columns],
+                                          f'-{start // step + 1}' if start else ''))
+    return ''.join(tables)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate the LaTeX tables of the results store')
+    parser.add_argument('--db', default=STATS_DB, help='Results store')
+    parser.add_argument('--source', default='perf', help='Source of the results (perf, perf_old, gem5)')
+    parser.add_argument('--rows', default='size', choices=list(ROWS),
+                        help='Rows of the tables: nominal sizes, or configuration parameters of a sweep '
+                             '(the runs without parameters keep their size)')
+    parser.add_argument('--impl', action='append', help='Only these implementations (repeatable)')
+    parser.add_argument('--metric', action='append', choices=list(METRICS),
+                        help='Only these metrics (repeatable)')
+    parser.add_argument('--max_columns', type=int, help='Split the tables of wider benchmark suites')
+    parser.add_argument('-o', '--output', help='Output file, stdout by default')
+    args = parser.parse_args()
+
+    data = load_results(args.db, by='impl', source=args.source, row=args.rows)
+    tables = generate_latex_tables(data, args.rows, args.metric or list(METRICS), args.impl, args.max_columns)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(tables)
+    else:
+        sys.stdout.write(tables)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+import hashlib
+import inspect
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+
+matplotlib.use('Agg')
+
+# Hash of the inputs of each rendered figure, by output file
+RENDER_CACHE = 'render_cache.json'
+
+
+def function_source(func):
+    """Source of a function, or its bytecode when the source is not available"""
+    try:
+        return inspect.getsource(func)
+    except (OSError, TypeError):
+        return func.__code__.co_code.hex()
+
+
+def figure_hash(func, args):
+    """Hash of a figure: its drawing function, source included, and the data
+    and style it is given"""
+    key = json.dumps([func.__module__, func.__qualname__, function_source(func), args],
+                     sort_keys=True, default=repr)
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def load_cache(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(path, cache):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(cache, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def init_worker():
+    matplotlib.use('Agg')
+
+
+def render(figures, jobs=None, cache_path=RENDER_CACHE):
+    """Draw figures in a process pool, skipping the up-to-date ones
+
+    figures are (func, args, outputs) tuples: func(*args) draws and saves the
+    outputs. It must be a module-level function, and args plain data (lists,
+    dicts, numbers and strings), the whole figure input, style included. A
+    figure is up to date when all its outputs exist and were drawn from the
+    same func and args. Returns the number of figures drawn.
+    """
+    cache = load_cache(cache_path)
+    pending = []
+    for func, args, outputs in figures:
+        digest = figure_hash(func, args)
+        if all(cache.get(out) == digest and os.path.exists(out) for out in outputs):
+            continue
+        pending.append((func, args, outputs, digest))
+    if not pending:
+        return 0
+
+    jobs = jobs or os.cpu_count()
+    if jobs == 1 or len(pending) == 1:
+        try:
+            for func, args, outputs, digest in pending:
+                func(*args)
+                for out in outputs:
+                    cache[out] = digest
+        finally:
+            save_cache(cache_path, cache)
+        return len(pending)
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker) as pool:
+        futures = [(pool.submit(func, *args), outputs, digest)
+                   for func, args, outputs, digest in pending]
+        try:
+            for future, outputs, digest in futures:
+                future.result()
+                for out in outputs:
+                    cache[out] = digest
+        finally:
+            save_cache(cache_path, cache)
+    return len(pending)
@@ -0,0 +1,296 @@
+import argparse
+import os
+import re
+import sqlite3
+from collections import defaultdict
+
+# Results store shared by the report generators
+STATS_DB = 'stats_bp.db'
+
+# results holds the IPC and branch miss ratio of each run, counters every
+# counter of its stats file
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    source TEXT NOT NULL,
+    impl TEXT NOT NULL,
+    size TEXT NOT NULL,
+    params TEXT NOT NULL,
+    benchmark TEXT NOT NULL,
+    ipc REAL,
+    miss REAL,
+    PRIMARY KEY (source, impl, size, params, benchmark)
+);
+CREATE TABLE IF NOT EXISTS counters (
+    source TEXT NOT NULL,
+    impl TEXT NOT NULL,
+    size TEXT NOT NULL,
+    params TEXT NOT NULL,
+    benchmark TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value REAL,
+    PRIMARY KEY (source, impl, size, params, benchmark, name)
+);
+"""
+
+# Implementation of the BranchPredictorImpl number of a stats directory
+IMPL_NAMES = {'0': 'Bimodal', '1': 'Gshare', '2': 'Local', '3': 'Tournament', '4': 'TAGE'}
+
+
+def kbits_map(configs):
+    """Return the nominal size of each configuration, from the configurations
+    of each size"""
+    return {params: size for size in configs for params in configs[size]}
+
+
+# Configurations of each nominal size in Kbits, per create_tables.sh
+PERF_KBITS = kbits_map({
+    '32': ['bht=8192_ctrbits=3', 'gbp=8192_ctrbits=3', 'lbp=2048_lhr=2048_ctrbits=3',
+           'mbp=1024_gbp=512_lbp=2048_lhr=2048', 'bimodal=4096_power=1_ubitperiod=2048'],
+    '64': ['bht=16384_ctrbits=3', 'gbp=16384_ctrbits=3', 'lbp=4096_lhr=4096_ctrbits=3',
+           'mbp=1024_gbp=512_lbp=4096_lhr=4096', 'bimodal=8192_power=2_ubitperiod=2048'],
+    '128': ['bht=32768_ctrbits=3', 'gbp=32768_ctrbits=3', 'lbp=8192_lhr=8192_ctrbits=3',
+            'mbp=2048_gbp=16384_lbp=4096_lhr=4096', 'bimodal=16384_power=3_ubitperiod=2048'],
+    '256': ['bht=65536_ctrbits=3', 'gbp=65536_ctrbits=3', 'lbp=16384_lhr=16384_ctrbits=2',
+            'mbp=32768_gbp=16384_lbp=8192_lhr=8192', 'bimodal=32768_power=4_ubitperiod=2048'],
+    '512': ['bht=131072_ctrbits=3', 'gbp=131072_ctrbits=3', 'lbp=65536_lhr=16384_ctrbits=3',
+            'mbp=65536_gbp=65536_lbp=8192_lhr=8192', 'bimodal=65536_power=5_ubitperiod=2048'],
+})
+
+PERF_OLD_KBITS = kbits_map({
+    '32': ['bht=16384', 'gbp=16384', 'lbp=4096_lhr=2048_ctrbits=2',
+           'mbp=2048_gbp=4096_lbp=4096_lhr=1024', 'bimodal=8192_power=1_ubitperiod=2048'],
+    '64': ['bht=32768', 'gbp=32768', 'lbp=4096_lhr=4096_ctrbits=4',
+           'mbp=8192_gbp=8192_lbp=4096_lhr=2048', 'bimodal=16384_power=2_ubitperiod=2048'],
+    '128': ['bht=65536', 'gbp=65536', 'lbp=8192_lhr=8192_ctrbits=3',
+            'mbp=4096_gbp=16384_lbp=16384_lhr=4096', 'bimodal=32768_power=3_ubitperiod=2048'],
+    '256': ['bht=131072', 'gbp=131072', 'lbp=16384_lhr=16384_ctrbits=2',
+            'mbp=16384_gbp=16384_lbp=65536_lhr=4096', 'bimodal=65536_power=4_ubitperiod=2048'],
+    '512': ['bht=262144', 'gbp=262144', 'lbp=65536_lhr=16384_ctrbits=3',
+            'mbp=32768_gbp=32768_lbp=65536_lhr=16384', 'bimodal=131072_power=5_ubitperiod=2048'],
+})
+
+GEM5_KBITS = kbits_map({
+    '32': ['bht=8192', 'gbp=8192', 'lbp=4096_lhr=2048_ctrbits=1',
+           'mbp=1024_gbp=2048_lbp=4096_lhr=1024', 'bimodal=8192_power=1_ubitperiod=2048'],
+    '64': ['bht=16384', 'gbp=16384', 'lbp=4096_lhr=4096_ctrbits=3',
+           'mbp=1024_gbp=4096_lbp=8192_lhr=2048', 'bimodal=16384_power=2_ubitperiod=2048'],
+    '128': ['bht=32768', 'gbp=32768', 'lbp=8192_lhr=8192_ctrbits=2',
+            'mbp=2048_gbp=16384_lbp=16384_lhr=2048', 'bimodal=32768_power=3_ubitperiod=2048'],
+    '256': ['bht=65536', 'gbp=65536', 'lbp=16384_lhr=16384_ctrbits=1',
+            'mbp=8192_gbp=8192_lbp=32768_lhr=8192', 'bimodal=65536_power=4_ubitperiod=2048'],
+    '512': ['bht=131072', 'gbp=131072', 'lbp=65536_lhr=16384_ctrbits=2',
+            'mbp=8192_gbp=16384_lbp=65536_lhr=16384', 'bimodal=131072_power=5_ubitperiod=2048'],
+})
+
+# perf stat counter line, e.g. "1,234.56 msec task-clock # 0.99 CPUs utilized"
+PERF_COUNTER_RE = re.compile(r'^\s*([\d,.]+)\s+(?:msec\s+)?([A-Za-z][\w\-:/.]*)(.*)$')
+PERF_TIME_RE = re.compile(r'^\s*([\d.]+)\s+(?:\+-\s+[\d.]+\s+)?seconds\s+(time elapsed|user|sys)')
+MISS_RE = re.compile(r'([\d.]+)\s*%\s+of all branches')
+IPC_RE = re.compile(r'([\d.]+)\s+insn per cycle')
+
+# gem5 stats.txt line, "name value [# description]"
+GEM5_COUNTER_RE = re.compile(r'^(\S+)\s+(-?[\d.]+(?:[eE][-+]?\d+)?)(?:\s|$)')
+GEM5_BRANCHES = 'branchPred.committed_0::total'
+GEM5_MISSES = 'branchPred.mispredicted_0::total'
+GEM5_IPC = 'core.ipc'
+
+
+def get_impl(name_dir, kbits=PERF_KBITS):
+    """Return the implementation, size and parameters of a stats directory,
+    named <x>_<y>_<impl number>_<parameters>"""
+    fields = name_dir.split('_')
+    impl = IMPL_NAMES.get(fields[2], '') if len(fields) > 2 else ''
+    params = '_'.join(fields[3:])
+    return impl, kbits.get(params, 'N/A'), params
+
+
+def get_benchmark(name):
+    """Benchmark of a stats file or directory, named <x>_<benchmark>_..."""
+    fields = name.split('_')
+    return fields[1] if len(fields) > 1 else name
+
+
+def parse_perf_stat(lines):
+    """Return the counters of a perf stat report, and its (IPC, branch miss
+    ratio in %) as perf comments them"""
+    counters = {}
+    ipc = miss = None
+    for line in lines:
+        time = PERF_TIME_RE.match(line)
+        if time:
+            counters['seconds ' + time.group(2)] = float(time.group(1))
+            continue
+        match = PERF_COUNTER_RE.match(line)
+        if not match:
+            continue
+        try:
+            counters[match.group(2)] = float(match.group(1).replace(',', ''))
+        except ValueError:
+            continue
+        comment = match.group(3)
+        if ipc is None and 'insn per cycle' in comment:
+            ipc = float(IPC_RE.search(comment).group(1))
+        elif miss is None and 'of all branches' in comment:
+            miss = float(MISS_RE.search(comment).group(1))
+    return counters, (ipc, miss)
+
+
+def parse_gem5_stats(lines):
+    """Return the counters of a gem5 stats.txt, of its first dump, and its
+    (IPC, branch miss ratio in %)"""
+    counters = {}
+    for line in lines:
+        if line.startswith('---------- End Simulation Statistics'):
+            break
+        match = GEM5_COUNTER_RE.match(line)
+        if match:
+            counters.setdefault(match.group(1), float(match.group(2)))
+
+    def find(suffix):
+        for name, value in counters.items():
+            if name.endswith(suffix):
+                return value
+        return None
+
+    branches = find(GEM5_BRANCHES)
+    misses = find(GEM5_MISSES)
+    miss = None
+    if branches and misses is not None:
+        # Truncated to 2 decimals, as bc computed it
+        miss = int(misses * 10000 / branches) / 100
+    return counters, (find(GEM5_IPC), miss)
+
+
+def perf_files(stats_dir):
+    """Yield the (configuration directory, benchmark, file) of perf stat
+    reports, one directory per configuration and one file per benchmark"""
+    for entry in sorted(os.scandir(stats_dir), key=lambda e: e.name):
+        if not entry.is_dir():
+            continue
+        for stat in sorted(os.scandir(entry.path), key=lambda e: e.name):
+            if stat.is_file():
+                yield entry.name, get_benchmark(stat.name), stat.path
+
+
+def gem5_files(stats_dir):
+    """Yield the (configuration directory, benchmark, file) of gem5 runs,
+    ariane* directories of one stats.txt directory per benchmark"""
+    for entry in sorted(os.scandir(stats_dir), key=lambda e: e.name):
+        if not entry.is_dir() or not entry.name.startswith('ariane'):
+            continue
+        for run in sorted(os.scandir(entry.path), key=lambda e: e.name):
+            stat = os.path.join(run.path, 'stats.txt')
+            if run.is_dir() and os.path.isfile(stat):
+                yield entry.name, get_benchmark(run.name), stat
+
+
+# Layouts of the stats directories: the file walker, the file parser and the
+# nominal sizes of the configurations of each study
+BACKENDS = {
+    'perf': (perf_files, parse_perf_stat, PERF_KBITS),
+    'perf_old': (perf_files, parse_perf_stat, PERF_OLD_KBITS),
+    'gem5': (gem5_files, parse_gem5_stats, GEM5_KBITS),
+}
+
+
+def walk_stats(stats_dir, source='perf'):
+    """Yield the (key, (ipc, miss), counters) of the stats files of a
+    directory, key being (source, impl, size, params, benchmark)"""
+    files, parse, kbits = BACKENDS[source]
+    for name_dir, benchmark, path in files(stats_dir):
+        impl, size, params = get_impl(name_dir, kbits)
+        with open(path, 'r', errors='replace') as f:
+            counters, metrics = parse(f)
+        yield (source, impl, size, params, benchmark), metrics, counters
+
+
+def parse_text(filename, source='perf'):
+    """Yield the results of a stats_bp.txt written by create_tables.sh, as
+    walk_stats without counters"""
+    with open(filename, 'r') as f:
+        content = f.read()
+
+    for impl in content.split('----------------------------'):
+        impl_match = re.search(r'Implementation: (.+?) \((\d*) ?Kbits\)', impl)
+        if not impl_match:
+            continue
+        impl_name = impl_match.group(1).strip()
+        size = impl_match.group(2) or 'N/A'
+        benchmarks = re.findall(r'([a-zA-Z\-]+)\s*IPC:\s*([\d.]+)\s*Ratio of branch misses:\s*([\d.]+)\s*%', impl)
+        for bench, ipc, miss in benchmarks:
+            yield (source, impl_name, size, '', bench), (float(ipc), float(miss)), {}
+
+
+def connect(db_path=STATS_DB):
+    db = sqlite3.connect(db_path)
+    db.executescript(SCHEMA)
+    return db
+
+
+def store(db_path, runs):
+    """Insert or replace the runs of walk_stats or parse_text in the results
+    store, returns their number"""
+    db = connect(db_path)
+    count = 0
+    with db:
+        for key, metrics, counters in runs:
+            db.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)', key + tuple(metrics))
+            db.execute('DELETE FROM counters WHERE source = ? AND impl = ? AND size = ? '
+                       'AND params = ? AND benchmark = ?', key)
+            db.executemany('INSERT INTO counters VALUES (?, ?, ?, ?, ?, ?, ?)',
+                           (key + item for item in counters.items()))
+            count += 1
+    db.close()
+    return count
+
+
+def load_results(db_path=STATS_DB, by='impl', source='perf', row='size'):
+    """Read the results of a source as nested dicts of {'ipc', 'miss'}
+
+    by='impl' gives data[impl][size][benchmark], as create_tables.py uses,
+    by='bench' gives data[benchmark][impl][size], as the plot scripts use.
+    row='params' keys the runs by their configuration parameters instead of
+    their nominal size, the runs without parameters (those of a stats_bp.txt)
+    keeping their size. A stats_bp.txt next to a missing store is ingested
+    first.
+    """
+    if not os.path.exists(db_path) and os.path.exists('stats_bp.txt'):
+        store(db_path, parse_text('stats_bp.txt'))
+    db = connect(db_path)
+    rows = db.execute('SELECT impl, size, params, benchmark, ipc, miss FROM results '
+                      'WHERE source = ? AND ipc IS NOT NULL AND miss IS NOT NULL '
+                      'ORDER BY impl, benchmark', (source,)).fetchall()
+    db.close()
+
+    data = defaultdict(lambda: defaultdict(lambda: defaultdict(dict)))
+    for impl, size, params, bench, ipc, miss in rows:
+        if row == 'params' and params:
+            size = params
+        if by == 'impl':
+            data[impl][size][bench] = {'ipc': ipc, 'miss': miss}
+        else:
+            data[bench][impl][size] = {'ipc': ipc, 'miss': miss}
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load branch predictor statistics into the results store')
+    parser.add_argument('stats', nargs='+',
+                        help='Stats directories, one subdirectory per configuration, '
+                             'or stats_bp.txt files')
+    parser.add_argument('--source', default='perf', choices=list(BACKENDS),
+                        help='Layout of the stats: perf stat reports (stats_bp), '
+                             'of the stats_bp_old configurations, or gem5 stats.txt (stats_bp_gem5)')
+    parser.add_argument('--db', default=STATS_DB, help='Results store')
+    args = parser.parse_args()
+
+    for stats in args.stats:
+        if os.path.isdir(stats):
+            runs = walk_stats(stats, args.source)
+        else:
+            runs = parse_text(stats, args.source)
+        print(f"{stats}: {store(args.db, runs)} results")
+
+
+if __name__ == '__main__':
+    main()
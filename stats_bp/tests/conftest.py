@@ -0,0 +1,5 @@
+"""Tests of the report scripts, run with `python3 -m pytest tests` from stats_bp"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
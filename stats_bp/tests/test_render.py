@@ -0,0 +1,73 @@
+import importlib
+import os
+
+import pytest
+
+pytest.importorskip('matplotlib')
+
+from render import load_cache, render
+
+FIGURE = """
+def draw(path, label):
+    with open(path, 'w') as f:
+        f.write({body!r} + label)
+"""
+
+
+def figure_module(tmp_path, monkeypatch, name, body='v1 '):
+    """Module of a drawing function, importable by the workers"""
+    write_module(tmp_path, name, body)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    return importlib.import_module(name)
+
+
+def write_module(tmp_path, name, body):
+    (tmp_path / f'{name}.py').write_text(FIGURE.format(body=body))
+
+
+def read(path):
+    with open(path) as f:
+        return f.read()
+
+
+def test_skip_unchanged(tmp_path, monkeypatch):
+    module = figure_module(tmp_path, monkeypatch, 'figure_skip')
+    cache = str(tmp_path / 'render_cache.json')
+    out = str(tmp_path / 'a.txt')
+    assert render([(module.draw, [out, 'a'], [out])], jobs=1, cache_path=cache) == 1
+    assert read(out) == 'v1 a'
+    assert out in load_cache(cache)
+    assert render([(module.draw, [out, 'a'], [out])], jobs=1, cache_path=cache) == 0
+    # New data, then a missing output
+    assert render([(module.draw, [out, 'b'], [out])], jobs=1, cache_path=cache) == 1
+    assert read(out) == 'v1 b'
+    os.remove(out)
+    assert render([(module.draw, [out, 'b'], [out])], jobs=1, cache_path=cache) == 1
+    assert os.path.exists(out)
+
+
+def test_redraw_changed_source(tmp_path, monkeypatch):
+    module = figure_module(tmp_path, monkeypatch, 'figure_source')
+    cache = str(tmp_path / 'render_cache.json')
+    out = str(tmp_path / 'a.txt')
+    assert render([(module.draw, [out, 'a'], [out])], jobs=1, cache_path=cache) == 1
+    # Of another size, so that the rewrite is seen within the same second
+    write_module(tmp_path, 'figure_source', 'v2.0 ')
+    module = importlib.reload(module)
+    assert render([(module.draw, [out, 'a'], [out])], jobs=1, cache_path=cache) == 1
+    assert read(out) == 'v2.0 a'
+    assert render([(module.draw, [out, 'a'], [out])], jobs=1, cache_path=cache) == 0
+
+
+def test_parallel(tmp_path, monkeypatch):
+    module = figure_module(tmp_path, monkeypatch, 'figure_parallel')
+    cache = str(tmp_path / 'render_cache.json')
+    outs = [str(tmp_path / f'{label}.txt') for label in 'abc']
+    figures = [(module.draw, [out, label], [out]) for out, label in zip(outs, 'abc')]
+    assert render(figures, jobs=2, cache_path=cache) == 3
+    assert [read(out) for out in outs] == ['v1 a', 'v1 b', 'v1 c']
+    assert sorted(load_cache(cache)) == sorted(outs)
+    assert render(figures, jobs=2, cache_path=cache) == 0
+    figures[1] = (module.draw, [outs[1], 'B'], [outs[1]])
+    assert render(figures, jobs=2, cache_path=cache) == 1
+    assert read(outs[1]) == 'v1 B'
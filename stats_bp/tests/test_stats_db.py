@@ -0,0 +1,106 @@
+import os
+
+from stats_db import load_results, parse_text, store, walk_stats
+
+PERF_STAT = """
+ Performance counter stats for './{bench}':
+
+          1,234.56 msec task-clock                #    0.999 CPUs utilized
+     2,000,000,000      cycles                    #    1.620 GHz
+     {instructions:,}      instructions              #    {ipc:.2f}  insn per cycle
+       500,000,000      branches                  #  405.000 M/sec
+        {misses:,}      branch-misses             #    {miss:.2f}% of all branches
+
+       1.235000000 seconds time elapsed
+
+       1.200000000 seconds user
+       0.030000000 seconds sys
+"""
+
+GEM5_STATS = """
+---------- Begin Simulation Statistics ----------
+simSeconds                                   0.001000                       # Number of seconds simulated (Second)
+system.cpu.core.ipc                          {ipc}                       # IPC: instructions per cycle ((Count/Cycle))
+system.cpu.branchPred.committed_0::total        {branches}                       # Number of committed branches (Count)
+system.cpu.branchPred.mispredicted_0::total     {misses}                       # Number of committed mispredictions (Count)
+
+---------- End Simulation Statistics   ----------
+
+---------- Begin Simulation Statistics ----------
+system.cpu.core.ipc                          9.99                       # Second dump
+---------- End Simulation Statistics   ----------
+"""
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(text)
+
+
+def test_perf(tmp_path):
+    stats = tmp_path / 'stats_bp'
+    for bench, ipc in (('dhrystone', 1.5), ('coremark', 0.75)):
+        write(str(stats / 'stats_cva6_0_bht=8192_ctrbits=3' / f'perf_{bench}_stat.txt'),
+              PERF_STAT.format(bench=bench, instructions=int(ipc * 2e9), ipc=ipc,
+                               misses=10000000, miss=2.0))
+    write(str(stats / 'stats_cva6_1_gbp=2048' / 'perf_dhrystone_stat.txt'),
+          PERF_STAT.format(bench='dhrystone', instructions=2000000000, ipc=1.0,
+                           misses=25000000, miss=5.0))
+    runs = list(walk_stats(str(stats), 'perf'))
+    assert len(runs) == 3
+    key, metrics, counters = runs[1]
+    assert key == ('perf', 'Bimodal', '32', 'bht=8192_ctrbits=3', 'dhrystone')
+    assert metrics == (1.5, 2.0)
+    assert counters['branch-misses'] == 10000000
+    assert counters['task-clock'] == 1234.56
+    assert counters['seconds time elapsed'] == 1.235
+
+    db = str(tmp_path / 'stats_bp.db')
+    assert store(db, runs) == 3
+    # Storing again replaces the runs
+    assert store(db, walk_stats(str(stats), 'perf')) == 3
+    data = load_results(db)
+    assert data['Bimodal']['32'] == {'coremark': {'ipc': 0.75, 'miss': 2.0},
+                                     'dhrystone': {'ipc': 1.5, 'miss': 2.0}}
+    assert data['Gshare']['N/A']['dhrystone'] == {'ipc': 1.0, 'miss': 5.0}
+    assert load_results(db, row='params')['Gshare']['gbp=2048']['dhrystone']['miss'] == 5.0
+    assert load_results(db, by='bench')['dhrystone']['Bimodal']['32']['ipc'] == 1.5
+    assert not load_results(db, source='gem5')
+
+
+def test_gem5(tmp_path):
+    stats = tmp_path / 'stats_bp_gem5'
+    write(str(stats / 'ariane_gem5_3_mbp=1024_gbp=2048_lbp=4096_lhr=1024' / 'run_dhrystone' / 'stats.txt'),
+          GEM5_STATS.format(ipc=0.8, branches=3000, misses=100))
+    # Not a configuration directory, and a run without stats
+    write(str(stats / 'other_gem5_0_bht=8192' / 'run_dhrystone' / 'stats.txt'), '')
+    os.makedirs(str(stats / 'ariane_gem5_0_bht=8192' / 'run_coremark'))
+    runs = list(walk_stats(str(stats), 'gem5'))
+    assert len(runs) == 1
+    key, metrics, counters = runs[0]
+    assert key == ('gem5', 'Tournament', '32', 'mbp=1024_gbp=2048_lbp=4096_lhr=1024', 'dhrystone')
+    # 100 / 3000 truncated to 2 decimals, and the IPC of the first dump
+    assert metrics == (0.8, 3.33)
+    assert counters['simSeconds'] == 0.001
+
+    db = str(tmp_path / 'stats_bp.db')
+    store(db, runs)
+    assert load_results(db, source='gem5')['Tournament']['32']['dhrystone'] == {'ipc': 0.8, 'miss': 3.33}
+    assert not load_results(db)
+
+
+def test_text(tmp_path):
+    path = str(tmp_path / 'stats_bp.txt')
+    write(path, "----------------------------\n"
+                "Implementation: Bimodal (64 Kbits)\n"
+                "dhrystone IPC: 1.25 Ratio of branch misses: 3.5 %\n"
+                "----------------------------\n"
+                "Implementation: TAGE ( Kbits)\n"
+                "coremark IPC: 0.5 Ratio of branch misses: 1.0 %\n")
+    runs = list(parse_text(path))
+    assert runs == [(('perf', 'Bimodal', '64', '', 'dhrystone'), (1.25, 3.5), {}),
+                    (('perf', 'TAGE', 'N/A', '', 'coremark'), (0.5, 1.0), {})]
+    db = str(tmp_path / 'stats_bp.db')
+    store(db, runs)
+    assert load_results(db, row='params')['Bimodal']['64']['dhrystone']['ipc'] == 1.25
@@ -20,10 +20,16 @@ import argparse
 import os
 import random
 import re
+import shutil
+import signal
 import sys
+import tempfile
 import logging
 import subprocess
 import datetime
+import glob
+import threading
+import time
 import yaml
 
 from dv.scripts.lib import *
@@ -33,11 +39,30 @@ from dv.scripts.ovpsim_log_to_trace_csv import *
 from dv.scripts.whisper_log_trace_csv import *
 from dv.scripts.sail_log_to_trace_csv import *
 from dv.scripts.instr_trace_compare import *
+from cva6_jobs import *
+from cva6_cache import *
+from cva6_incremental import affected_tests
+from cva6_trace_compare import compare_iss_traces, compare_live_trace
+from cva6_trace_index import get_trace_parsers
+from cva6_bpsim.stream import extract_branches
 from pathlib import Path
 from types import SimpleNamespace
 
 LOGGER = logging.getLogger()
 
+# ArtifactCache of compiled tests, set up from --build_cache
+build_cache = None
+# ArtifactCache of Spike logs, set up from --spike_cache
+spike_cache = None
+# RuntimeHistory ordering the parallel jobs, set up from --runtime_history
+runtime_history = None
+# Journal of the completed regression units, used by --resume
+journal = None
+# Convert the ISS logs to CSV files before comparing them, set by --trace_csv
+trace_csv = False
+# Stop the RTL simulations at their first mismatch with Spike, set by --early_exit
+early_exit = False
+
 class SeedGen:
   '''An object that will generate a pseudo-random seed for test iterations'''
   def __init__(self, start_seed, fixed_seed, seed_yaml):
@@ -236,7 +261,8 @@ def run_csr_test(cmd_list, cwd, csr_file, isa, iterations, lsf_cmd,
 
 def do_simulate(sim_cmd, test_list, cwd, sim_opts, seed_gen, csr_file,
                 isa, end_signature_addr, lsf_cmd, timeout_s, log_suffix,
-                batch_size, output_dir, verbose, check_return_code, debug_cmd):
+                batch_size, output_dir, verbose, check_return_code, debug_cmd,
+                save_seed=True):
   """Run  the instruction generator
 
   Args:
@@ -255,6 +281,10 @@ def do_simulate(sim_cmd, test_list, cwd, sim_opts, seed_gen, csr_file,
     output_dir            : Output directory of the ELF files
     check_return_code     : Check return code of the command
     debug_cmd             : Produce the debug cmd log without running
+    save_seed             : Write the seeds to seed.yaml and seedlist.yaml
+
+  Returns:
+    sim_seed              : Seed used for each test_id
   """
   cmd_list = []
   sim_cmd = re.sub("<out>", os.path.abspath(output_dir), sim_cmd)
@@ -304,7 +334,7 @@ def do_simulate(sim_cmd, test_list, cwd, sim_opts, seed_gen, csr_file,
             logging.info("Running %s, batch %0d/%0d, test_cnt:%0d" %
                          (test['test'], i+1, batch_cnt, test_cnt))
             run_cmd(cmd, timeout_s, check_return_code = check_return_code, debug_cmd = debug_cmd)
-  if sim_seed:
+  if sim_seed and save_seed:
     with open(('%s/seed.yaml' % os.path.abspath(output_dir)) , 'w') as outfile:
       yaml.dump(sim_seed, outfile, default_flow_style=False)
     with open(('seedlist.yaml') , 'a') as seedlist:
@@ -312,6 +342,13 @@ def do_simulate(sim_cmd, test_list, cwd, sim_opts, seed_gen, csr_file,
   if lsf_cmd:
     run_parallel_cmd(cmd_list, timeout_s, check_return_code = check_return_code,
                      debug_cmd = debug_cmd)
+  return sim_seed
+
+
+def get_gen_outputs(test, output_dir):
+  """Return the assembly programs generated for a test"""
+  return ["%s/asm_tests/%s_%d.S" % (output_dir, test['test'], i)
+          for i in range(test['iterations'])]
 
 
 def gen(test_list, argv, output_dir, cwd):
@@ -359,7 +396,7 @@ def elf2bin(elf, binary, debug_cmd):
   run_cmd_output(cmd.split(), debug_cmd = debug_cmd)
 
 
-def gcc_compile(test_list, output_dir, isa, mabi, opts, debug_cmd, linker):
+def gcc_compile(test_list, output_dir, isa, mabi, opts, debug_cmd, linker, jobs=1):
   """Use riscv gcc toolchain to compile the assembly program
 
   Args:
@@ -369,49 +406,78 @@ def gcc_compile(test_list, output_dir, isa, mabi, opts, debug_cmd, linker):
     mabi       : MABI variant passed to GCC
     debug_cmd  : Produce the debug cmd log without running
     linker     : Path to the linker
+    jobs       : Number of tests compiled in parallel
   """
-  cwd = os.path.dirname(os.path.realpath(__file__))
+  compile_jobs = []
   for test in test_list:
     for i in range(0, test['iterations']):
-      if 'no_gcc' in test and test['no_gcc'] == 1:
-        continue
-      prefix = ("%s/asm_tests/%s_%d" % (output_dir, test['test'], i))
-      asm = prefix + ".S"
-      elf = prefix + ".o"
-      binary = prefix + ".bin"
-      test_isa=re.match("[a-z0-9A-Z]+", isa)
-      test_isa=test_isa.group()
-      isa_ext=isa
-      if not os.path.isfile(asm) and not debug_cmd:
-        logging.error("Cannot find assembly test: %s\n", asm)
-        sys.exit(RET_FAIL)
-      # gcc comilation
-      cmd = ("%s %s \
-             -I%s/../env/corev-dv/user_extension \
-             -T%s %s -o %s " % \
-             (get_env_var("RISCV_CC", debug_cmd = debug_cmd), asm, cwd, linker, opts, elf))
-      if 'gcc_opts' in test:
-        cmd += test['gcc_opts']
-      if 'gen_opts' in test:
-        # Disable compressed instruction
-        if re.search('disable_compressed_instr=1', test['gen_opts']):
-          test_isa = re.sub("c",  "", test_isa)
-          #add z,s,x extensions to the isa if there are some
-          if isa_extension_list !=['none']:
-            for i in isa_extension_list:
-              test_isa += (f"_{i}")
-          isa_ext=test_isa
-      # If march/mabi is not defined in the test gcc_opts, use the default
-      # setting from the command line.
-      if not re.search('march', cmd):
-        cmd += (" -march=%s" % isa_ext)
-      if not re.search('mabi', cmd):
-        cmd += (" -mabi=%s" % mabi)
-      logging.info("Compiling test: %s" % asm)
-      run_cmd_output(cmd.split(), debug_cmd = debug_cmd)
-      elf2bin(elf, binary, debug_cmd)
+      job = get_gcc_compile_job(test, i, output_dir, isa, mabi, opts, debug_cmd, linker)
+      if job:
+        compile_jobs.append(job)
+  # The debug command log is a single file, keep it in order.
+  run_jobs(compile_jobs, 1 if debug_cmd else jobs, runtime_history, journal)
 
 
+def get_gcc_compile_job(test, i, output_dir, isa, mabi, opts, debug_cmd, linker):
+  """Get the Job compiling iteration i of a generated test, None if no_gcc is set"""
+  if 'no_gcc' in test and test['no_gcc'] == 1:
+    return None
+  cwd = os.path.dirname(os.path.realpath(__file__))
+  prefix = ("%s/asm_tests/%s_%d" % (output_dir, test['test'], i))
+  asm = prefix + ".S"
+  elf = prefix + ".o"
+  binary = prefix + ".bin"
+  test_isa=re.match("[a-z0-9A-Z]+", isa)
+  test_isa=test_isa.group()
+  isa_ext=isa
+  if not os.path.isfile(asm) and not debug_cmd:
+    logging.error("Cannot find assembly test: %s\n", asm)
+    sys.exit(RET_FAIL)
+  # gcc comilation
+  cmd = ("%s %s \
+         -I%s/../env/corev-dv/user_extension \
+         -T%s %s -o %s " % \
+         (get_env_var("RISCV_CC", debug_cmd = debug_cmd), asm, cwd, linker, opts, elf))
+  if 'gcc_opts' in test:
+    cmd += test['gcc_opts']
+  if 'gen_opts' in test:
+    # Disable compressed instruction
+    if re.search('disable_compressed_instr=1', test['gen_opts']):
+      test_isa = re.sub("c",  "", test_isa)
+      #add z,s,x extensions to the isa if there are some
+      if isa_extension_list !=['none']:
+        for ext in isa_extension_list:
+          test_isa += (f"_{ext}")
+      isa_ext=test_isa
+  # If march/mabi is not defined in the test gcc_opts, use the default
+  # setting from the command line.
+  if not re.search('march', cmd):
+    cmd += (" -march=%s" % isa_ext)
+  if not re.search('mabi', cmd):
+    cmd += (" -mabi=%s" % mabi)
+  job = Job(os.path.basename(prefix), compile_test, cmd, asm, elf, binary, debug_cmd)
+  job.outputs = [elf, binary]
+  return job
+
+
+def compile_test(cmd, asm, elf, binary, debug_cmd):
+  """Compile one assembly program and convert the ELF to plain binary
+
+  With --build_cache, the ELF and binary are reused from a previous run that
+  compiled the same sources with the same command and toolchain.
+  """
+  use_cache = build_cache is not None and not debug_cmd
+  if use_cache:
+    key = build_cache.compile_key(cmd, asm, elf, [get_env_var("RISCV_OBJCOPY")])
+    if build_cache.fetch(key, {"elf": elf, "bin": binary}):
+      logging.info("Reusing cached build of test: %s" % asm)
+      return
+  logging.info("Compiling test: %s" % asm)
+  run_cmd_output(cmd.split(), debug_cmd = debug_cmd)
+  elf2bin(elf, binary, debug_cmd)
+  if use_cache:
+    build_cache.store(key, {"elf": elf, "bin": binary})
+
 
 def tandem_postprocess(tandem_report, target, isa, test_name, log, testlist, iss, iterations = None):
   analyze_tandem_report(tandem_report)
@@ -451,7 +517,8 @@ def generate_yaml_report(yaml_path, target, isa, test, testlist, iss, initial_cr
 
 
 def run_test(test, iss_yaml, isa, target, mabi, gcc_opts, iss_opts, output_dir,
-             setting_dir, debug_cmd, linker, priv, spike_params, test_name=None, iss_timeout=500, testlist="custom"):
+             setting_dir, debug_cmd, linker, priv, spike_params, test_name=None, iss_timeout=500, testlist="custom",
+             isolate=False, reuse=False):
   """Run a directed test with ISS
 
   Args:
@@ -471,6 +538,8 @@ def run_test(test, iss_yaml, isa, target, mabi, gcc_opts, iss_opts, output_dir,
     test_name   : (Optional) Name of the test
     iss_timeout : Timeout for ISS simulation (default: 500)
     testlist    : Test list identifier (default: "custom")
+    isolate     : Run RTL simulations from a working directory of their own
+    reuse       : Only compare the ISS logs of a previous run
   """
   if testlist != None:
     testlist = testlist.split('/')[-1].strip("testlist_").split('.')[0]
@@ -496,11 +565,17 @@ def run_test(test, iss_yaml, isa, target, mabi, gcc_opts, iss_opts, output_dir,
     elf = prefix + ".o"
 
   iss_list = iss_opts.split(",")
-  run_cmd("mkdir -p %s/directed_tests" % output_dir)
+  test_log_name = test_name or test
+  if reuse:
+    logging.info("Reusing the ISS logs of test: %s" % test_log_name)
+    if len(iss_list) == 2:
+      compare_iss_log(iss_list, [get_directed_log(output_dir, iss, test_log_name, target)
+                                 for iss in iss_list], report)
+    return
+  os.makedirs("%s/directed_tests" % output_dir, exist_ok=True)
 
   if test_type != "o":
     # gcc compilation
-    logging.info("Compiling test: %s" % test)
     cmd = ("%s %s \
           -I%s/dv/user_extension \
             -T%s %s -o %s " % \
@@ -508,28 +583,38 @@ def run_test(test, iss_yaml, isa, target, mabi, gcc_opts, iss_opts, output_dir,
               linker, gcc_opts, elf))
     cmd += (" -march=%s" % isa)
     cmd += (" -mabi=%s" % mabi)
-    run_cmd(cmd, debug_cmd = debug_cmd)
+    use_cache = build_cache is not None and not debug_cmd
+    if use_cache:
+      key = build_cache.compile_key(cmd, test_path, elf)
+    if use_cache and build_cache.fetch(key, {"elf": elf}):
+      logging.info("Reusing cached build of test: %s" % test)
+    else:
+      logging.info("Compiling test: %s" % test)
+      run_cmd(cmd, debug_cmd = debug_cmd)
+      if use_cache:
+        build_cache.store(key, {"elf": elf})
   log_list = []
+  completed = True
   # ISS simulation
-  test_log_name = test_name or test
   for iss in iss_list:
     tandem_sim = iss != "spike" and os.environ.get('SPIKE_TANDEM') != None
-    run_cmd("mkdir -p %s/%s_sim" % (output_dir, iss))
-    if log_format == 1:
-      log = ("%s/%s_sim/%s_%d.%s.log" % (output_dir, iss, test_log_name, test_iteration, target))
-    else:
-      log = ("%s/%s_sim/%s.%s.log" % (output_dir, iss, test_log_name, target))
+    os.makedirs("%s/%s_sim" % (output_dir, iss), exist_ok=True)
+    log = get_directed_log(output_dir, iss, test_log_name, target)
     yaml = ("%s/%s_sim/%s.%s.log.yaml" % (output_dir, iss, test_log_name, target))
     log_list.append(log)
     base_cmd = parse_iss_yaml(iss, iss_yaml, isa, target, setting_dir, debug_cmd, priv, spike_params)
     print(elf)
-    cmd = get_iss_cmd(base_cmd, elf, target, log)
+    if isolate and iss in ISOLATED_ISS_LIST:
+      cmd = get_iss_cmd(base_cmd, os.path.abspath(elf), target, os.path.abspath(log))
+      cmd = isolate_iss_cmd(cmd, cwd, "%s/%s_sim/%s.work" % (output_dir, iss, test_log_name))
+    else:
+      cmd = get_iss_cmd(base_cmd, elf, target, log)
     logging.info("[%0s] Running ISS simulation: %s" % (iss, cmd))
     if "spike" in iss: ratio = 10
     else: ratio = 1
     if tandem_sim:
       generate_yaml_report(yaml, target, isa, test_log_name, testlist, iss, True)
-    run_cmd(cmd, iss_timeout//ratio, debug_cmd = debug_cmd)
+    completed &= run_iss_cmd(iss, cmd, elf, log, target, iss_timeout//ratio, debug_cmd = debug_cmd)
     logging.info("[%0s] Running ISS simulation: %s ...done" % (iss, elf))
 
     if tandem_sim:
@@ -537,10 +622,71 @@ def run_test(test, iss_yaml, isa, target, mabi, gcc_opts, iss_opts, output_dir,
 
   if len(iss_list) == 2:
     compare_iss_log(iss_list, log_list, report)
+  return completed
+
+
+def get_directed_log(output_dir, iss, test_name, target):
+  """Return the path of the ISS log of a directed test"""
+  if log_format == 1:
+    return ("%s/%s_sim/%s_%d.%s.log" % (output_dir, iss, test_name, test_iteration, target))
+  return ("%s/%s_sim/%s.%s.log" % (output_dir, iss, test_name, target))
+
+
+def get_iss_logs(test, iss_list, output_dir, target):
+  """Return the paths of all the ISS logs of a test of the testlist"""
+  if 'asm_tests' in test or 'c_tests' in test:
+    return [get_directed_log(output_dir, iss, test['test'], target) for iss in iss_list]
+  return ["%s/%s_sim/%s_%d.%s.log" % (output_dir, iss, test['test'], i, target)
+          for iss in iss_list for i in range(test['iterations'])]
+
+
+def get_reused_tests(test_list, argv, output_dir, cwd):
+  """Return the names of the tests whose results are reused with --since
+
+  A test is reused if it cannot see the changes since the --since revision
+  and its ISS logs from a previous run are in the output directory.
+  """
+  target_cfgs = [argv.target]
+  if argv.target == "hwconfig" and not argv.custom_target:
+    target_cfgs.append(argv.hwconfig_base)
+  affected = affected_tests(argv.since, test_list, argv.testlist, target_cfgs, cwd)
+  if affected is None:
+    return set()
+  iss_list = argv.iss.split(",")
+  reused = set()
+  for test in test_list:
+    if test['test'] in affected:
+      logging.info("Test %s changed since %s" % (test['test'], argv.since))
+    elif all(os.path.isfile(log) for log in get_iss_logs(test, iss_list, output_dir, argv.target)):
+      reused.add(test['test'])
+    else:
+      logging.info("Test %s has no previous results" % test['test'])
+  logging.info("Reusing the results of %d of %d tests" % (len(reused), len(test_list)))
+  return reused
+
+
+# ISS that only write the log they are given
+PURE_ISS_LIST = ["spike", "ovpsim", "sail", "whisper"]
+
+# RTL testharnesses whose Makefile target writes its trace and waveforms only
+# to the current directory, run in parallel from a working directory of their
+# own. The other targets (the UVM ones, xrun-testharness and
+# questa-testharness) use fixed directories and run one at a time.
+ISOLATED_ISS_LIST = ["veri-testharness", "vcs-testharness"]
+
+
+def parallel_jobs(iss_list, jobs):
+  """Return the number of simulations of iss_list that can run in parallel"""
+  serial = [iss for iss in iss_list if iss not in PURE_ISS_LIST + ISOLATED_ISS_LIST]
+  if jobs > 1 and serial:
+    logging.info("%s cannot run in parallel, running its simulations one at a time"
+                 % ",".join(serial))
+    return 1
+  return jobs
 
 
 def iss_sim(test_list, output_dir, iss_list, iss_yaml, iss_opts,
-            isa, target, setting_dir, timeout_s, debug_cmd, priv, spike_params):
+            isa, target, setting_dir, timeout_s, debug_cmd, priv, spike_params, jobs=1):
   """Run ISS simulation with the generated test program
 
   Args:
@@ -553,36 +699,269 @@ def iss_sim(test_list, output_dir, iss_list, iss_yaml, iss_opts,
     setting_dir : Generator setting directory
     timeout_s   : Timeout limit in seconds
     debug_cmd   : Produce the debug cmd log without running
+    jobs        : Number of simulations run in parallel
   """
+  if debug_cmd:
+    jobs = 1
+  spike_jobs = []
+  warmup_jobs = []
+  sim_jobs = []
+  serial_jobs = []
   for iss in iss_list.split(","):
     log_dir = ("%s/%s_sim" % (output_dir, iss))
     base_cmd = parse_iss_yaml(iss, iss_yaml, isa, target, setting_dir, debug_cmd, priv, spike_params)
     logging.info("%s sim log dir: %s" % (iss, log_dir))
-    run_cmd_output(["mkdir", "-p", log_dir])
-    tandem_sim = iss != "spike" and os.environ.get('SPIKE_TANDEM') != None
+    os.makedirs(log_dir, exist_ok=True)
+    isolate = jobs > 1 and iss in ISOLATED_ISS_LIST
+    iss_jobs = []
     for test in test_list:
       if 'no_iss' in test and test['no_iss'] == 1:
         continue
       else:
         for i in range(0, test['iterations']):
-          prefix = ("%s/asm_tests/%s_%d" % (output_dir, test['test'], i))
-          elf = prefix + ".o"
-          log = ("%s/%s_%d.%s.log" % (log_dir, test['test'], i, target))
-          cmd = get_iss_cmd(base_cmd, elf, target, log)
-          yaml = ("%s/%s_%s.%s.log.yaml" % (log_dir, test['test'], i, target))
-          if 'iss_opts' in test:
-            cmd += ' '
-            cmd += test['iss_opts']
-          logging.info("Running %s sim: %s" % (iss, elf))
-          if tandem_sim:
-            generate_yaml_report(yaml, target, isa, test['test'], "generated tests", iss, True, i)
-          if iss == "ovpsim":
-            run_cmd(cmd, timeout_s, check_return_code=False, debug_cmd = debug_cmd)
-          else:
-            run_cmd(cmd, timeout_s, debug_cmd = debug_cmd)
-          logging.debug(cmd)
-          if tandem_sim:
-            tandem_postprocess(yaml, target, isa, test['test'], log, "generated tests", iss, i)
+          iss_jobs.append(get_iss_sim_job(iss, base_cmd, test, i, output_dir, isa, target,
+                                          timeout_s, debug_cmd, isolate))
+    warmup_job = pop_warmup_job(iss_jobs) if isolate else None
+    if warmup_job:
+      # The first simulation builds the RTL model, the others reuse it.
+      warmup_jobs.append(warmup_job)
+    if early_exit and iss == "spike":
+      # The RTL simulations are checked against the Spike logs as they run.
+      spike_jobs += iss_jobs
+    elif parallel_jobs([iss], jobs) == 1:
+      serial_jobs += iss_jobs
+    else:
+      sim_jobs += iss_jobs
+  run_jobs(spike_jobs, jobs, runtime_history, journal)
+  run_jobs(warmup_jobs, jobs, runtime_history, journal)
+  run_jobs(sim_jobs, jobs, runtime_history, journal)
+  run_jobs(serial_jobs, 1, runtime_history, journal)
+
+
+def pop_warmup_job(jobs, exclude=()):
+  """Remove and return the job to run alone before the others
+
+  This is the job expected to be the shortest, so that building the RTL model
+  does not wait for a long test. Jobs completed in a previous run and jobs
+  named in exclude do not simulate, so they are not candidates. Returns None
+  if there is no candidate.
+  """
+  candidates = [job for job in jobs if job.name not in exclude and
+                not (journal and job.outputs and journal.done(job.unit, job.outputs))]
+  if not candidates:
+    return None
+  job = runtime_history.shortest(candidates) if runtime_history else candidates[0]
+  jobs.remove(job)
+  return job
+
+
+def get_iss_sim_job(iss, base_cmd, test, i, output_dir, isa, target, timeout_s,
+                    debug_cmd, isolate):
+  """Get the Job simulating iteration i of a generated test on one ISS
+
+  If isolate is set, the simulation runs from a working directory of its own.
+  """
+  cwd = os.path.dirname(os.path.realpath(__file__))
+  log_dir = ("%s/%s_sim" % (output_dir, iss))
+  tandem_sim = iss != "spike" and os.environ.get('SPIKE_TANDEM') != None
+  prefix = ("%s/asm_tests/%s_%d" % (output_dir, test['test'], i))
+  elf = prefix + ".o"
+  log = ("%s/%s_%d.%s.log" % (log_dir, test['test'], i, target))
+  if isolate:
+    work_dir = ("%s/%s_%d.work" % (log_dir, test['test'], i))
+    cmd = get_iss_cmd(base_cmd, os.path.abspath(elf), target, os.path.abspath(log))
+    cmd = isolate_iss_cmd(cmd, cwd, work_dir)
+  else:
+    cmd = get_iss_cmd(base_cmd, elf, target, log)
+  yaml = ("%s/%s_%s.%s.log.yaml" % (log_dir, test['test'], i, target))
+  if 'iss_opts' in test:
+    cmd += ' '
+    cmd += test['iss_opts']
+  job = Job("%s:%s_%d" % (iss, test['test'], i), iss_sim_test,
+            iss, cmd, elf, log, yaml, tandem_sim, target, isa,
+            test['test'], i, timeout_s, debug_cmd)
+  job.outputs = [log]
+  return job
+
+
+def isolate_iss_cmd(cmd, cwd, work_dir):
+  """Run an RTL simulation command from its own working directory
+
+  The testharness targets leave trace_rvfi_hart_00.dasm and the waveforms in
+  the current directory, so each parallel simulation needs a directory of its
+  own. The command must only use absolute paths.
+  """
+  os.makedirs(work_dir, exist_ok=True)
+  return re.sub(r"^make ", "make -C %s -f %s/Makefile " % (os.path.abspath(work_dir), cwd), cmd)
+
+
+def iss_sim_test(iss, cmd, elf, log, yaml_report, tandem_sim, target, isa,
+                 test_name, iteration, timeout_s, debug_cmd):
+  """Run one ISS simulation of a generated test, return False on a timeout"""
+  logging.info("Running %s sim: %s" % (iss, elf))
+  if tandem_sim:
+    generate_yaml_report(yaml_report, target, isa, test_name, "generated tests", iss, True, iteration)
+  completed = run_iss_cmd(iss, cmd, elf, log, target, timeout_s,
+                          check_return_code = iss != "ovpsim", debug_cmd = debug_cmd)
+  logging.debug(cmd)
+  if tandem_sim:
+    tandem_postprocess(yaml_report, target, isa, test_name, log, "generated tests", iss, iteration)
+  return completed
+
+
+def run_iss_cmd(iss, cmd, elf, log, target, timeout_s, check_return_code=True, debug_cmd=None):
+  """Run an ISS simulation command
+
+  With --spike_cache, a Spike simulation is replaced by the log of an earlier
+  run of the same ELF with the same Spike build and ISA configuration.
+  Returns False if the simulation timed out, its log being truncated.
+  """
+  if early_exit and iss in LIVE_TRACE_ISS and not debug_cmd:
+    spike_log = get_spike_log(log, iss)
+    if os.path.isfile(spike_log):
+      return run_rtl_cmd_early_exit(iss, cmd, log, spike_log, timeout_s, check_return_code)
+    logging.info("[%s] No Spike log to check the simulation against: %s" % (iss, spike_log))
+  use_cache = iss == "spike" and spike_cache is not None and not debug_cmd
+  if use_cache:
+    key = get_spike_trace_key(cmd, elf, log, target)
+    if spike_cache.fetch(key, {"log": log, "iss": log + ".iss"}):
+      logging.info("[spike] Reusing cached trace of %s" % elf)
+      return True
+  start = time.time()
+  run_cmd(cmd, timeout_s, check_return_code = check_return_code, debug_cmd = debug_cmd)
+  # run_cmd returns after a timeout too, never cache a truncated log.
+  completed = time.time() - start < timeout_s
+  if use_cache and completed:
+    spike_cache.store(key, {"log": log, "iss": log + ".iss"})
+  return completed
+
+
+# RTL testharness targets writing their RVFI trace to trace_rvfi_hart_00.dasm,
+# in the directory make runs in, while they simulate
+LIVE_TRACE_ISS = ["veri-testharness", "vcs-testharness"]
+
+
+def get_spike_log(log, iss):
+  """Return the Spike log of the test simulated into log by iss"""
+  return log.replace("/%s_sim/" % iss, "/spike_sim/")
+
+
+def run_rtl_cmd_early_exit(iss, cmd, log, spike_log, timeout_s, check_return_code=True):
+  """Run an RTL simulation, stopping it at its first mismatch with Spike
+
+  The RVFI trace is compared with the Spike log while the simulator writes
+  it. At the first mismatch, the simulation is killed and its log is
+  disassembled from the partial trace, so that iss_cmp reports the same
+  mismatch. Returns False if the simulation timed out.
+  """
+  cwd = os.path.dirname(os.path.realpath(__file__))
+  work_dir = re.match(r"make -C (\S+) ", cmd)
+  dasm = os.path.join(work_dir.group(1) if work_dir else os.getcwd(), "trace_rvfi_hart_00.dasm")
+  if os.path.isfile(dasm):
+    # Trace of a previous simulation
+    os.remove(dasm)
+  mismatch_pc = []
+  timed_out = False
+  deadline = time.time() + timeout_s
+  logging.info("[%s] Running with early exit: %s" % (iss, cmd))
+  with tempfile.TemporaryFile(mode="w+") as output:
+    proc = subprocess.Popen(cmd, shell=True, executable="/bin/bash", start_new_session=True,
+                            stdout=output, stderr=subprocess.STDOUT)
+
+    def stop(spike_entry, rtl_entry):
+      pc = (rtl_entry or spike_entry).pc
+      mismatch_pc.append(pc)
+      logging.error("[%s] Mismatch with Spike at PC 0x%s, stopping the simulation of %s" %
+                    (iss, pc, log))
+      os.killpg(proc.pid, signal.SIGTERM)
+
+    try:
+      compare_live_trace("spike", spike_log, iss, dasm, proc, logging.info, stop, deadline)
+      proc.wait(max(0, deadline - time.time()))
+    except subprocess.TimeoutExpired:
+      logging.error("[%s] Timeout after %ds: %s" % (iss, timeout_s, log))
+      timed_out = True
+    finally:
+      if proc.poll() is None:
+        os.killpg(proc.pid, signal.SIGKILL)
+        proc.wait()
+    output.seek(0)
+    logging.debug(output.read())
+  if mismatch_pc:
+    # The Makefile target did not get to disassemble the trace.
+    tool_path = re.search(r"tool_path=(\S+)", cmd)
+    variant = re.search(r"variant=(\S+)", cmd)
+    spike_dasm = os.path.join(tool_path.group(1) if tool_path else get_env_var("SPIKE_PATH"),
+                              "spike-dasm")
+    with open(dasm, "r") as trace, open(log, "w") as disassembled:
+      subprocess.run([spike_dasm] + (["--isa=%s" % variant.group(1)] if variant else []),
+                     stdin=trace, stdout=disassembled)
+  elif check_return_code and proc.returncode:
+    logging.error("ERROR return code: %d, cmd:%s" % (proc.returncode, cmd))
+    sys.exit(RET_FAIL)
+  return not timed_out
+
+
+_spike_build_id = None
+
+def get_spike_trace_key(cmd, elf, log, target):
+  """Key of a Spike log in the --spike_cache
+
+  The log only depends on the ELF, the Spike build (version hash and binary),
+  the Spike parameter file of the target and the command line, which carries
+  the variant, privilege modes and spike_params.
+  """
+  global _spike_build_id
+  if _spike_build_id is None:
+    spike = os.path.join(get_env_var("SPIKE_PATH"), "spike")
+    _spike_build_id = get_spike_version() + " " + \
+        (file_digest(spike) if os.path.isfile(spike) else "")
+  cwd = os.path.dirname(os.path.realpath(__file__))
+  spike_yaml = cwd + f"/../../config/gen_from_riscv_config/{target}/spike/spike.yaml"
+  parts = ["spike", _spike_build_id, file_digest(elf),
+           cmd.replace(elf, "<elf>").replace(log, "<log>")]
+  if os.path.isfile(spike_yaml):
+    parts.append(file_digest(spike_yaml))
+  return spike_cache.key(*parts)
+
+
+def get_branch_trace_job(iss, test, i, output_dir, target):
+  """Get the Job extracting the branch trace of the log of iteration i of a
+  generated test on one ISS, None if the logs of the ISS cannot be read
+
+  The job has no outputs, so it is never skipped by the journal:
+  extract_branches itself keeps a branch trace newer than its log, and
+  writes it again once the simulation is rerun.
+  """
+  if get_trace_parsers(iss) is None:
+    return None
+  log = ("%s/%s_sim/%s_%d.%s.log" % (output_dir, iss, test['test'], i, target))
+  return Job("%s:%s_%d" % (iss, test['test'], i), extract_branches, log, iss)
+
+
+def branch_trace(test_list, output_dir, iss_list, target, debug_cmd, jobs=1):
+  """Extract the branch traces of the ISS logs, read by cva6_bpsim
+
+  Args:
+    test_list   : List of generated tests
+    output_dir  : Output directory of the ELF files
+    iss_list    : List of instruction set simulators
+    target      : Target of the simulations
+    debug_cmd   : Produce the debug cmd log without running
+    jobs        : Number of extractions run in parallel
+  """
+  if debug_cmd:
+    return
+  branch_jobs = []
+  for iss in iss_list.split(","):
+    for test in test_list:
+      if 'no_iss' in test and test['no_iss'] == 1:
+        continue
+      for i in range(0, test['iterations']):
+        job = get_branch_trace_job(iss, test, i, output_dir, target)
+        if job:
+          branch_jobs.append(job)
+  run_jobs(branch_jobs, jobs, journal=journal)
 
 
 def iss_cmp(test_list, iss, target, output_dir, stop_on_first_error, exp, debug_cmd):
@@ -604,22 +983,182 @@ def iss_cmp(test_list, iss, target, output_dir, stop_on_first_error, exp, debug_
   report = ("%s/iss_regr.log" % output_dir).rstrip()
   for test in test_list:
     for i in range(0, test['iterations']):
-      elf = ("%s/asm_tests/%s_%d.o" % (output_dir, test['test'], i))
-      logging.info("Comparing ISS sim result %s/%s: %s" %
-                  (iss_list[0], iss_list[1], elf))
-      log_list = []
-      run_cmd(("echo 'Test binary: %s' >> %s" % (elf, report)))
-      for iss in iss_list:
-        log_list.append("%s/%s_sim/%s_%d.%s.log" % (output_dir, iss, test['test'], i, target))
-      compare_iss_log(iss_list, log_list, report, stop_on_first_error, exp)
+      iss_cmp_test(test, i, iss_list, target, output_dir, report, stop_on_first_error, exp)
   save_regr_report(report)
 
 
+def iss_cmp_test(test, i, iss_list, target, output_dir, report, stop_on_first_error, exp):
+  """Compare the ISS simulation results of iteration i of a generated test"""
+  elf = ("%s/asm_tests/%s_%d.o" % (output_dir, test['test'], i))
+  logging.info("Comparing ISS sim result %s/%s: %s" %
+              (iss_list[0], iss_list[1], elf))
+  log_list = []
+  get_regr_report(report).write("Test binary: %s" % elf)
+  for iss in iss_list:
+    log_list.append("%s/%s_sim/%s_%d.%s.log" % (output_dir, iss, test['test'], i, target))
+  compare_iss_log(iss_list, log_list, report, stop_on_first_error, exp)
+
+
+def pipeline_regression(test_list, argv, output_dir, cwd, reused=()):
+  """Stream the generated tests through the gen, gcc_compile, iss_sim and
+  iss_cmp steps
+
+  Each test iteration moves on to its next step as soon as its previous step
+  is done, instead of waiting for the whole test list at every step, so the
+  first comparison results come in while the other tests still run. Steps not
+  selected with --steps are skipped. As in the step by step flow, only the
+  instruction generator runs through --lsf_cmd.
+
+  Args:
+    test_list             : List of generated tests
+    argv                  : Configuration arguments
+    output_dir            : Output directory of the ELF files
+    cwd                   : Filesystem path to RISCV-DV repo
+    reused                : Names of the tests that are only compared (--since)
+  """
+  def step_selected(step):
+    return argv.steps == "all" or re.match(".*%s.*" % step, argv.steps)
+
+  jobs = 1 if argv.debug else max(1, argv.jobs)
+  iss_list = argv.iss.split(",")
+  sim_seed = {}
+  stages = []
+
+  if step_selected("gen") and test_list:
+    check_return_code = argv.simulator != "ius"
+    compile_cmd, sim_cmd = get_generator_cmd(argv.simulator, argv.simulator_yaml, argv.cov,
+                                             argv.exp, argv.debug)
+    if not argv.so:
+      do_compile(compile_cmd, test_list, argv.core_setting_dir, cwd, argv.user_extension_dir,
+                 argv.cmp_opts, output_dir, argv.debug, argv.lsf_cmd)
+    seed_gen = SeedGen(argv.start_seed, argv.seed, argv.seed_yaml)
+    seed_lock = threading.Lock()
+
+    def gen_test(test):
+      if test['test'] in reused:
+        return [(test, i) for i in range(test['iterations'])]
+      job = Job(test['test'], do_simulate, sim_cmd, [test], cwd, argv.sim_opts, seed_gen,
+                argv.csr_yaml, argv.isa, argv.end_signature_addr, argv.lsf_cmd, argv.gen_timeout,
+                argv.log_suffix, argv.batch_size, output_dir, argv.verbose,
+                check_return_code, argv.debug, save_seed=False)
+      job.outputs = get_gen_outputs(test, output_dir)
+      test_seed = run_job(job, journal=journal)
+      if test_seed:
+        with seed_lock:
+          sim_seed.update(test_seed)
+          with open(('%s/seed.yaml' % os.path.abspath(output_dir)) , 'w') as outfile:
+            yaml.dump(sim_seed, outfile, default_flow_style=False)
+      return [(test, i) for i in range(test['iterations'])]
+  else:
+    def gen_test(test):
+      return [(test, i) for i in range(test['iterations'])]
+  stages.append(Stage("gen", gen_test, jobs))
+
+  if step_selected("gcc_compile"):
+    def compile_step(item):
+      test, i = item
+      if test['test'] in reused:
+        return [item]
+      job = get_gcc_compile_job(test, i, output_dir, argv.isa, argv.mabi, argv.gcc_opts,
+                                argv.debug, argv.linker)
+      if job:
+        run_job(job, journal=journal)
+      return [item]
+    stages.append(Stage("gcc_compile", compile_step, jobs))
+
+  if step_selected("iss_sim"):
+    base_cmds = {}
+    for iss in iss_list:
+      base_cmds[iss] = parse_iss_yaml(iss, argv.iss_yaml, argv.isa, argv.target,
+                                      argv.core_setting_dir, argv.debug, argv.priv,
+                                      argv.spike_params)
+      os.makedirs("%s/%s_sim" % (output_dir, iss), exist_ok=True)
+    built = set()
+    build_lock = threading.Lock()
+    serial_lock = threading.Lock()
+    serial = {iss for iss in iss_list if parallel_jobs([iss], jobs) == 1}
+
+    def sim_step(item):
+      test, i = item
+      if ('no_iss' in test and test['no_iss'] == 1) or test['test'] in reused:
+        return [item]
+      for iss in iss_list:
+        isolate = jobs > 1 and iss in ISOLATED_ISS_LIST
+        job = get_iss_sim_job(iss, base_cmds[iss], test, i, output_dir, argv.isa, argv.target,
+                              argv.iss_timeout, argv.debug, isolate)
+        if journal and journal.done(job.unit, job.outputs):
+          logging.info("Skipping %s, completed in a previous run" % job.unit)
+          continue
+        if isolate and iss not in built:
+          # The first simulation builds the RTL model, the others wait for it.
+          with build_lock:
+            if iss not in built:
+              run_job(job, runtime_history, journal)
+              built.add(iss)
+              continue
+        if iss in serial:
+          with serial_lock:
+            run_job(job, runtime_history, journal)
+          continue
+        run_job(job, runtime_history, journal)
+      return [item]
+    stages.append(Stage("iss_sim", sim_step, jobs))
+
+  if argv.branch_trace and not argv.debug:
+    def branch_step(item):
+      test, i = item
+      if 'no_iss' in test and test['no_iss'] == 1:
+        return [item]
+      for iss in iss_list:
+        job = get_branch_trace_job(iss, test, i, output_dir, argv.target)
+        if job:
+          run_job(job, journal=journal)
+      return [item]
+    stages.append(Stage("branch_trace", branch_step, jobs))
+
+  report = ("%s/iss_regr.log" % output_dir).rstrip()
+  compare = step_selected("iss_cmp") and not argv.debug and len(iss_list) == 2
+  if compare:
+    def cmp_step(item):
+      test, i = item
+      iss_cmp_test(test, i, iss_list, argv.target, output_dir, report,
+                   argv.stop_on_first_error, argv.exp)
+      return [item]
+    stages.append(Stage("iss_cmp", cmp_step))
+
+  if runtime_history is not None:
+    # Feed the tests with the longest simulations first.
+    test_list = runtime_history.order(test_list, lambda test: [
+        "%s:%s_%d" % (iss, test['test'], i)
+        for iss in iss_list for i in range(test['iterations'])])
+  try:
+    run_pipeline(test_list, stages, queue_size=2 * jobs)
+  finally:
+    if runtime_history is not None:
+      runtime_history.save()
+  if sim_seed:
+    with open(('seedlist.yaml') , 'a') as seedlist:
+      yaml.dump(sim_seed, seedlist, default_flow_style=False)
+  if compare:
+    save_regr_report(report)
+
+
 def compare_iss_log(iss_list, log_list, report, stop_on_first_error=0, exp=False):
   if (len(iss_list) != 2 or len(log_list) != 2):
     logging.error("Only support comparing two ISS logs")
     logging.info("len(iss_list) = %s len(log_list) = %s" % (len(iss_list), len(log_list)))
   else:
+    if not trace_csv:
+      lines = []
+      result = compare_iss_traces(iss_list, log_list, lines.append)
+      if result is not None:
+        regr_report = get_regr_report(report)
+        with regr_report.lock:
+          for line in lines:
+            regr_report.write(line)
+          regr_report.add_result(log_list[1], result)
+        logging.info(result)
+        return
     csv_list = []
     for i in range(2):
       log = log_list[i]
@@ -639,21 +1178,72 @@ def compare_iss_log(iss_list, log_list, report, stop_on_first_error=0, exp=False
       else:
         logging.error("Unsupported ISS" % iss)
         sys.exit(RET_FAIL)
-    result = compare_trace_csv(csv_list[0], csv_list[1], iss_list[0], iss_list[1], report)
+    regr_report = get_regr_report(report)
+    with regr_report.lock:
+      # compare_trace_csv appends to the report file itself.
+      regr_report.flush()
+      result = compare_trace_csv(csv_list[0], csv_list[1], iss_list[0], iss_list[1], report)
+      regr_report.add_result(csv_list[1], result)
     logging.info(result)
 
 
+class RegrReport:
+  '''In-process writer of an ISS regression report
+
+  Keeps the pass/fail counts in memory. The lines of a comparison are
+  buffered and appended to the report with its result, so a regression that
+  is killed part-way leaves the report of the tests compared so far.
+  '''
+  def __init__(self, path):
+    self.path = path
+    self.lines = []
+    self.passed_cnt = 0
+    self.failed_details = []
+    self.lock = threading.RLock()
+
+  def write(self, line):
+    with self.lock:
+      self.lines.append(line + "\n")
+
+  def flush(self):
+    with self.lock:
+      if self.lines:
+        with open(self.path, "a") as report:
+          report.writelines(self.lines)
+        self.lines = []
+
+  def add_result(self, csv, result):
+    '''Count the result string returned by a trace comparison'''
+    with self.lock:
+      if "[PASSED]" in result:
+        self.passed_cnt += 1
+      elif "[FAILED]" in result:
+        self.failed_details.append("%s %s" % (os.path.basename(csv), result.strip()))
+      self.flush()
+
+
+regr_reports = {}
+
+def get_regr_report(report):
+  """Get the RegrReport writing to the report file at path report"""
+  if report not in regr_reports:
+    regr_reports.setdefault(report, RegrReport(report))
+  return regr_reports[report]
+
+
 def save_regr_report(report):
-  passed_cnt = run_cmd(r"grep '\[PASSED\]' %s | wc -l" % report).strip()
-  failed_cnt = run_cmd(r"grep '\[FAILED\]' %s | wc -l" % report).strip()
+  regr_report = get_regr_report(report)
+  passed_cnt = regr_report.passed_cnt
+  failed_cnt = len(regr_report.failed_details)
   summary = ("%s PASSED, %s FAILED" % (passed_cnt, failed_cnt))
   logging.info(summary)
-  run_cmd(("echo %s >> %s" % (summary, report)))
-  if failed_cnt != "0":
-    failed_details = run_cmd(r"sed -e 's,.*_sim/,,' %s | grep '\(csv\|matched\)' | uniq | sed -e 'N;s/\\n/ /g' | grep '\[FAILED\]'" % report).strip()
+  regr_report.write(summary)
+  if failed_cnt != 0:
+    failed_details = "\n".join(regr_report.failed_details)
     logging.info(failed_details)
-    run_cmd(("echo %s >> %s" % (failed_details, report)))
+    regr_report.write(failed_details)
     #sys.exit(RET_FAIL) #Do not return error code in case of test fail.
+  regr_report.flush()
   logging.info("ISS regression report is saved to %s" % report)
 
 
@@ -781,6 +1371,40 @@ def parse_args(cwd):
                       help="Choose additional z, s, x extensions")
   parser.add_argument("--spike_params", type=str, default="",
                       help="Spike command line parameters, run spike --help and spike --print-params to see more")
+  parser.add_argument("-j", "--jobs", type=int, default=1,
+                      help="Number of tests compiled and simulated in parallel by "
+                           "the gcc_compile and iss_sim steps")
+  parser.add_argument("--build_cache", type=str, default="",
+                      help="Directory caching the compiled tests across runs, keyed by "
+                           "their sources, command line and toolchain version")
+  parser.add_argument("--spike_cache", type=str, default="",
+                      help="Directory caching the Spike logs across runs, keyed by "
+                           "the ELF, the Spike version and the ISA configuration")
+  parser.add_argument("--runtime_history", type=str, default="",
+                      help="JSON file of the test runtimes used to start the longest "
+                           "tests first with --jobs (default: <output>/runtime_history.json)")
+  parser.add_argument("--since", type=str, default="",
+                      help="Only run the tests that can see the changes since this git "
+                           "revision, and compare the ISS logs already in the output "
+                           "directory (-o) for the others")
+  parser.add_argument("--resume", action="store_true", default=False,
+                      help="Skip the gen, gcc_compile and iss_sim work completed by a "
+                           "previous run in the output directory (-o), as recorded in "
+                           "its journal.jsonl")
+  parser.add_argument("--trace_csv", action="store_true", default=False,
+                      help="Write the ISS traces to CSV files and compare the files, "
+                           "instead of comparing the Spike and RTL logs as they are read")
+  parser.add_argument("--early_exit", action="store_true", default=False,
+                      help="Compare the trace of veri-testharness and vcs-testharness "
+                           "simulations with the Spike log while they run, and stop them "
+                           "at the first mismatch")
+  parser.add_argument("--branch_trace", action="store_true", default=False,
+                      help="Extract the branch trace of each ISS log after the iss_sim "
+                           "step, for the predictor models of cva6_bpsim")
+  parser.add_argument("--pipeline", action="store_true", default=False,
+                      help="Stream each generated test through the gen, gcc_compile, "
+                           "iss_sim and iss_cmp steps instead of running the steps "
+                           "one after the other")
   rsg = parser.add_argument_group('Random seeds',
                                   'To control random seeds, use at most one '
                                   'of the --start_seed, --seed or --seed_yaml '
@@ -864,14 +1488,18 @@ def load_config(args, cwd):
       args.testlist = cwd + "/target/"+ args.target +"/testlist.yaml"
     if args.target == "hwconfig":
       base, changes = user_config.parse_derive_args(args.hwconfig_opts.split())
+      args.hwconfig_base = base
       input_file = f"../../core/include/{base}_config_pkg.sv"
       output_file = "../../core/include/hwconfig_config_pkg.sv"
       user_config.derive_config(input_file, output_file, changes)
       args.hwconfig_opts = user_config.get_config(output_file)
-      os.system("mkdir -p ../../config/gen_from_riscv_config/hwconfig/spike")
-      os.system("mkdir -p ../../config/gen_from_riscv_config/hwconfig/linker")
-      os.system("cp ../../config/gen_from_riscv_config/%s/spike/spike.yaml ../../config/gen_from_riscv_config/hwconfig/spike/" % (base))
-      os.system("cp ../../config/gen_from_riscv_config/%s/linker/*.ld ../../config/gen_from_riscv_config/hwconfig/linker/" % (base))
+      os.makedirs("../../config/gen_from_riscv_config/hwconfig/spike", exist_ok=True)
+      os.makedirs("../../config/gen_from_riscv_config/hwconfig/linker", exist_ok=True)
+      spike_yaml = "../../config/gen_from_riscv_config/%s/spike/spike.yaml" % (base)
+      if os.path.isfile(spike_yaml):
+        shutil.copy(spike_yaml, "../../config/gen_from_riscv_config/hwconfig/spike/")
+      for ld in glob.glob("../../config/gen_from_riscv_config/%s/linker/*.ld" % (base)):
+        shutil.copy(ld, "../../config/gen_from_riscv_config/hwconfig/linker/")
     else:
       base = args.target
     if base in ("cv64a6_imafdc_sv39", "cv64a6_imafdc_sv39_hpdcache", "cv64a6_imafdc_sv39_wb"):
@@ -973,10 +1601,14 @@ def check_cc_version():
     incorrect_version_exit("GCC", cc_version_string, f">={REQUIRED_GCC_VERSION}")
 
 
-def check_spike_version():
+def get_spike_version():
   # Get Spike hash from core-v-verif submodule
   spike_hash = subprocess.run('git log -1 --pretty=tformat:%h', capture_output=True, text=True, shell=True, cwd=os.environ.get("SPIKE_SRC_DIR"))
-  spike_version = "1.1.1-dev " + spike_hash.stdout.strip()
+  return "1.1.1-dev " + spike_hash.stdout.strip()
+
+
+def check_spike_version():
+  spike_version = get_spike_version()
 
   # Get Spike User version
   get_env_var("SPIKE_PATH")
@@ -1134,6 +1766,23 @@ def main():
     # Create output directory
     output_dir = create_output(args.o, args.noclean, cwd+"/out_")
 
+    global build_cache
+    if args.build_cache:
+      build_cache = ArtifactCache(args.build_cache)
+    global spike_cache
+    if args.spike_cache:
+      spike_cache = ArtifactCache(args.spike_cache)
+    global runtime_history
+    runtime_history = RuntimeHistory(args.runtime_history or
+                                     "%s/runtime_history.json" % output_dir)
+    global trace_csv
+    trace_csv = args.trace_csv
+    global early_exit
+    early_exit = args.early_exit
+    global journal
+    if not args.debug:
+      journal = Journal("%s/journal.jsonl" % output_dir, args.resume)
+
     #add z,s,x extensions to the isa if there are some
     if isa_extension_list !=['']:
       for i in isa_extension_list:
@@ -1148,6 +1797,8 @@ def main():
     for i in range(args.gen_sv_seed):
       test_executed = 0
       test_iteration = i
+      if journal:
+        journal.iteration = i
       print("")
       logging.info("Iteration number: %s" % (i+1))
 
@@ -1172,13 +1823,15 @@ def main():
             sys.exit(RET_FAIL)
           test_executed = 1
 
-      run_cmd_output(["mkdir", "-p", ("%s/asm_tests" % output_dir)])
+      os.makedirs("%s/asm_tests" % output_dir, exist_ok=True)
       # Process regression test list
       matched_list = []
       # Any tests in the YAML test list that specify a directed assembly test
       asm_directed_list = []
       # Any tests in the YAML test list that specify a directed c test
       c_directed_list = []
+      # Tests whose results of a previous run are reused (--since)
+      reused = set()
 
       if test_executed ==0:
         if not args.co:
@@ -1223,16 +1876,25 @@ def main():
           if len(matched_list) == 0 and len(asm_directed_list) == 0 and len(c_directed_list) == 0:
             sys.exit("Cannot find %s in %s" % (args.test, args.testlist))
 
+          if args.since:
+            reused = get_reused_tests(matched_list + asm_directed_list + c_directed_list,
+                                      args, output_dir, cwd)
+
           for t in c_directed_list:
-            copy = re.sub(r'(.*)\/(.*).c$', r'cp \1/\2.c \1/', t['c_tests'])+t['test']+'.c'
-            run_cmd("%s" % copy)
-            t['c_tests'] = re.sub(r'(.*)\/(.*).c$', r'\1/', t['c_tests'])+t['test']+'.c'
+            c_test = re.sub(r'(.*)\/(.*).c$', r'\1/', t['c_tests'])+t['test']+'.c'
+            shutil.copyfile(t['c_tests'], c_test)
+            t['c_tests'] = c_test
 
       directed_tests_list = asm_directed_list + c_directed_list
+      # Generated tests whose gen, gcc_compile and iss_sim steps are run
+      run_list = [t for t in matched_list if t['test'] not in reused]
       # Run instruction generator
       if args.steps == "all" or re.match(".*gen.*", args.steps):
         # Run any handcoded/directed tests specified in YAML format
         if len(directed_tests_list) != 0:
+          directed_jobs = []
+          directed_parallel = 1 if args.debug else parallel_jobs(args.iss.split(","), args.jobs)
+          isolate = directed_parallel > 1
           for test_entry in asm_directed_list:
             gcc_opts = args.gcc_opts
             gcc_opts += test_entry.get('gcc_opts', '')
@@ -1240,28 +1902,60 @@ def main():
             if path_test:
               # path_test is an assembly file
               if os.path.isfile(path_test):
-                run_test(path_test, args.iss_yaml, args.isa, args.target, args.mabi, gcc_opts,
+                logs = [get_directed_log(output_dir, iss, test_entry['test'], args.target)
+                        for iss in args.iss.split(",")]
+                # A directed test completed in a previous run still has its
+                # logs compared, to be part of the report.
+                reuse = test_entry['test'] in reused or \
+                        (journal and journal.done("run_test:%s" % test_entry['test'], logs))
+                job = Job(test_entry['test'], run_test,
+                             path_test, args.iss_yaml, args.isa, args.target, args.mabi, gcc_opts,
                              args.iss, output_dir, args.core_setting_dir, args.debug, args.linker,
-                             args.priv, args.spike_params, test_entry['test'], iss_timeout=args.iss_timeout, testlist=args.testlist)
+                             args.priv, args.spike_params, test_entry['test'], iss_timeout=args.iss_timeout, testlist=args.testlist,
+                             isolate=isolate, reuse=reuse)
+                if not reuse:
+                  job.outputs = logs
+                directed_jobs.append(job)
               else:
                 if not args.debug:
                   logging.error('%s does not exist' % path_test)
                   sys.exit(RET_FAIL)
+          warmup_job = pop_warmup_job(directed_jobs, reused) if isolate else None
+          if warmup_job:
+            # The first simulation builds the RTL model, the others reuse it.
+            run_jobs([warmup_job], 1, runtime_history, journal)
+          run_jobs(directed_jobs, directed_parallel, runtime_history, journal)
 
         # Run remaining tests using the instruction generator
-        gen(matched_list, args, output_dir, cwd)
-
-      if not args.co:
+        if not args.pipeline or args.co:
+          gen_list = [t for t in run_list
+                      if not (journal and journal.done("do_simulate:%s" % t['test'],
+                                                       get_gen_outputs(t, output_dir)))]
+          if len(gen_list) < len(run_list):
+            logging.info("Skipping the generation of %d tests, completed in a previous run"
+                         % (len(run_list) - len(gen_list)))
+          gen(gen_list, args, output_dir, cwd)
+          if journal and not args.co:
+            for t in gen_list:
+              journal.record("do_simulate:%s" % t['test'], get_gen_outputs(t, output_dir))
+
+      if args.pipeline and not args.co:
+        pipeline_regression(matched_list, args, output_dir, cwd, reused)
+      elif not args.co:
         # Compile the assembly program to ELF, convert to plain binary
         if args.steps == "all" or re.match(".*gcc_compile.*", args.steps):
-          gcc_compile(matched_list, output_dir, args.isa, args.mabi,
-                      args.gcc_opts, args.debug, args.linker)
+          gcc_compile(run_list, output_dir, args.isa, args.mabi,
+                      args.gcc_opts, args.debug, args.linker, args.jobs)
 
         # Run ISS simulation
         if args.steps == "all" or re.match(".*iss_sim.*", args.steps):
-          iss_sim(matched_list, output_dir, args.iss, args.iss_yaml, args.iss_opts,
+          iss_sim(run_list, output_dir, args.iss, args.iss_yaml, args.iss_opts,
                   args.isa, args.target, args.core_setting_dir, args.iss_timeout, args.debug,
-                  args.priv, args.spike_params)
+                  args.priv, args.spike_params, args.jobs)
+
+        # Extract the branch traces of the ISS logs
+        if args.branch_trace:
+          branch_trace(run_list, output_dir, args.iss, args.target, args.debug, args.jobs)
 
         # Compare ISS simulation result
         if args.steps == "all" or re.match(".*iss_cmp.*", args.steps):
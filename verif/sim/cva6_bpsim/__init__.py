@@ -0,0 +1,55 @@
+"""
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Trace-driven models of the branch predictors of core/frontend
+
+The conditional branches retired in a Spike/Verilator log or a trace CSV are
+replayed through a model of the predictor selected by BranchPredictorImpl,
+with the table sizes, counter widths and TAGE parameters of the
+configuration package. Each branch is predicted then updated before the
+next one: the models follow the RTL indexing and update rules, but not the
+speculative fetch and resolution timing of the pipeline.
+
+  python3 -m cva6_bpsim --impl gshare --define GBP_ENTRIES=4096 test.log
+
+The branches are read from the branch trace of a log when there is one, as
+written by cva6.py --branch_trace (see stream).
+
+The batch module (which needs NumPy) evaluates bimodal and gshare predictors
+of many sizes and counter widths at once:
+
+  python3 -m cva6_bpsim --impl bimodal --entries 8192,16384 --ctr_bits 2,3 test.log
+
+The dse module explores the parameterizations fitting a storage budget:
+
+  python3 -m cva6_bpsim.dse --kbits 64 test.log
+"""
+
+from .config import IMPLS, FIELDS, CONFIG_PKG, load_config
+from .predictors import Bimodal, Gshare, Local, Tournament, simulate
+from .tage import Tage
+from .stream import BranchTrace, branch_target, control_flow, extract_branches
+
+# Predictor models, in the order of config_pkg::bp_t
+PREDICTORS = {"bimodal": Bimodal, "gshare": Gshare, "local": Local,
+              "tournament": Tournament, "tage": Tage}
+
+
+def make_predictor(cfg, impl=None, **kwargs):
+  """Return the model of a predictor, by name or config_pkg::bp_t value,
+  BranchPredictorImpl by default"""
+  if impl is None:
+    impl = cfg["BranchPredictorImpl"]
+  if isinstance(impl, int):
+    impl = list(PREDICTORS)[impl]
+  return PREDICTORS[impl](cfg, **kwargs)
@@ -0,0 +1,89 @@
+"""
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Report the branch mispredictions of the predictor models on traces
+"""
+
+import argparse
+import logging
+import os
+import time
+
+from . import PREDICTORS, BranchTrace, load_config, make_predictor, simulate
+from .config import CONFIG_PKG
+
+
+def benchmark_name(path):
+  name = os.path.basename(path)
+  return name.split(".")[0]
+
+
+def parse_define(define):
+  name, _, value = define.partition("=")
+  return name, int(value, 0)
+
+
+def parse_list(values):
+  return [int(value, 0) for value in values.split(",")]
+
+
+def main():
+  parser = argparse.ArgumentParser(prog="cva6_bpsim")
+  parser.add_argument("traces", type=str, nargs="+",
+                      help="Spike/Verilator logs or trace CSVs, one per benchmark")
+  parser.add_argument("--iss", type=str, default="spike",
+                      help="ISS that wrote the logs, e.g. spike or veri-testharness")
+  parser.add_argument("--impl", type=str, action="append", choices=list(PREDICTORS),
+                      help="Predictor to model, BranchPredictorImpl by default; repeatable")
+  parser.add_argument("--config_pkg", type=str, default=CONFIG_PKG,
+                      help="Configuration package of the predictor parameters")
+  parser.add_argument("-D", "--define", type=str, action="append", default=[],
+                      help="Set a macro of the configuration package, e.g. BHT_ENTRIES=4096")
+  parser.add_argument("--cycles_per_branch", type=int, default=1,
+                      help="Clock cycles per branch of the TAGE LFSR and u reset sweep")
+  parser.add_argument("--entries", type=parse_list,
+                      help="Comma separated bimodal/gshare table sizes, evaluated together "
+                      "by the NumPy batch engine")
+  parser.add_argument("--ctr_bits", type=parse_list,
+                      help="Comma separated bimodal/gshare counter widths, with --entries")
+  args = parser.parse_args()
+  logging.basicConfig(level=logging.INFO)
+
+  cfg = load_config(args.config_pkg, dict(parse_define(d) for d in args.define))
+  impls = args.impl or [list(PREDICTORS)[cfg["BranchPredictorImpl"]]]
+  print("%-20s %-24s %12s %12s %14s %8s %8s" % ("Benchmark", "Predictor", "Instructions",
+                                              "Branches", "Mispredictions", "Miss %", "MPKI"))
+  for path in args.traces:
+    branches = BranchTrace.from_trace(path, args.iss)
+    results = []
+    for impl in impls:
+      start = time.time()
+      if args.entries and impl in ("bimodal", "gshare"):
+        from . import batch
+        ctr_bits = args.ctr_bits or [cfg["BimodalCtrBits" if impl == "bimodal" else "GlobalCtrBits"]]
+        points = batch.sweep(cfg, branches, impl, args.entries, ctr_bits)
+        results += [(batch.config_name(impl, size, bits), misses)
+                    for ((size, bits), misses) in sorted(points.items())]
+      else:
+        kwargs = {"cycles_per_branch": args.cycles_per_branch} if impl == "tage" else {}
+        results.append((impl, simulate(make_predictor(cfg, impl, **kwargs), branches)))
+      logging.info("%s: %s model, %d branches in %.1fs" %
+                   (path, impl, len(branches), time.time() - start))
+    for (name, misses) in results:
+      print("%-20s %-24s %12d %12d %14d %8.2f %8.2f" %
+            (benchmark_name(path), name, branches.instrs, len(branches), misses,
+             100.0 * misses / max(len(branches), 1), 1000.0 * misses / max(branches.instrs, 1)))
+
+
+if __name__ == "__main__":
+  main()
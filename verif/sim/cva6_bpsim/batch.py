@@ -0,0 +1,160 @@
+"""
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Vectorized bimodal and gshare models, evaluating many table sizes and
+counter widths on one branch trace with NumPy
+
+The entries of these predictors are independent: a counter only sees the
+branches indexing it. The branches are grouped by entry with a stable sort,
+and the counter value before each branch is a segmented prefix scan of the
+updates, each update being the clamped addition x -> min(max(x + d, 0), max)
+and the composition of clamped additions a clamped addition. The result is
+the one of Bimodal and Gshare, with one sort of the trace per table size
+and about 2 sqrt(n) array operations per counter width.
+"""
+
+import numpy as np
+
+from .predictors import FetchTable, clog2
+
+# Predictors of the engine, and the stats_bp configuration name of their
+# (entries, counter bits) points
+IMPLS = {"bimodal": "bht=%d_ctrbits=%d", "gshare": "gbp=%d_ctrbits=%d"}
+
+
+def trace_arrays(trace):
+  """Return the pc, target and taken arrays of a BranchTrace, without copy"""
+  return (np.frombuffer(trace.pc, dtype=np.uint64),
+          np.frombuffer(trace.target, dtype=np.uint64),
+          np.frombuffer(trace.taken, dtype=np.uint8).astype(bool))
+
+
+def global_history(taken, bits):
+  """Return the GHR of gbp.sv before each branch: the last bits outcomes,
+  the newest in bit 0"""
+  ghr = np.zeros(len(taken), dtype=np.int64)
+  outcomes = taken.astype(np.int64)
+  for k in range(bits):
+    ghr[k + 1:] |= outcomes[:len(taken) - k - 1] << k
+  return ghr
+
+
+def sort_entries(entry):
+  """Return the stable order grouping the branches by entry, and which
+  branches of this order are the first of their entry
+
+  The order is sorted by 16 bits digits, least significant first: NumPy
+  radix sorts 16 bits integers.
+  """
+  order = np.arange(len(entry))
+  sorted_entry = entry
+  shift = 0
+  while shift == 0 or (entry >> shift).any():
+    digits = ((sorted_entry >> shift) & 0xffff).astype(np.uint16)
+    order = order[np.argsort(digits, kind="stable")]
+    sorted_entry = entry[order]
+    shift += 16
+  first = np.ones(len(entry), dtype=bool)
+  first[1:] = sorted_entry[1:] != sorted_entry[:-1]
+  return order, first
+
+
+def counters_before(order, first, taken, max_val):
+  """Return the counter value before each branch, and whether the entry was
+  written before (its valid bit)
+
+  order and first are the grouping of the branches by the entry they read
+  and then update, from sort_entries. The grouped updates are cut in about
+  sqrt(n) blocks, scanned side by side: the state before each branch of a
+  block is a clamped addition of the state entering the block, or a known
+  value once an entry starts in the block. The states entering the blocks
+  are then chained, and applied.
+  """
+  n = len(order)
+  length = max(int(np.sqrt(n)), 1)
+  blocks = -(-n // length)
+  pad = blocks * length - n
+  # A padding update adds 0, a counter is left as is
+  add = np.concatenate([np.where(taken[order], 1, -1), np.zeros(pad, dtype=np.int64)])
+  keep = np.concatenate([~first, np.ones(pad, dtype=bool)])
+  add = add.astype(np.int32).reshape(blocks, length).T.copy()
+  keep = keep.astype(np.int32).reshape(blocks, length).T.copy()
+
+  a = np.zeros(blocks, dtype=np.int32)
+  lo = np.full(blocks, -(1 << 30), dtype=np.int32)
+  hi = np.full(blocks, 1 << 30, dtype=np.int32)
+  before_a = np.empty((length, blocks), dtype=np.int32)
+  before_lo = np.empty((length, blocks), dtype=np.int32)
+  before_hi = np.empty((length, blocks), dtype=np.int32)
+  for k in range(length):
+    # A new entry starts from the reset value 0
+    a *= keep[k]
+    lo *= keep[k]
+    hi *= keep[k]
+    before_a[k] = a
+    before_lo[k] = lo
+    before_hi[k] = hi
+    a += add[k]
+    for bound in (lo, hi):
+      bound += add[k]
+      np.maximum(bound, 0, out=bound)
+      np.minimum(bound, max_val, out=bound)
+
+  entering = np.zeros(blocks, dtype=np.int32)
+  state = 0
+  for block in range(1, blocks):
+    state = min(max(state + int(a[block - 1]), int(lo[block - 1])), int(hi[block - 1]))
+    entering[block] = state
+  before = np.clip(entering + before_a, before_lo, before_hi).T.reshape(-1)[:n]
+
+  result = np.empty(n, dtype=np.int32)
+  result[order] = before
+  valid = np.empty(n, dtype=bool)
+  valid[order] = ~first
+  return result, valid
+
+
+def mispredictions(pc, target, taken, order, first, ctr_bits):
+  """Return the mispredictions of a table of ctr_bits counters"""
+  before, valid = counters_before(order, first, taken, (1 << ctr_bits) - 1)
+  predicted = np.where(valid, (before >> (ctr_bits - 1)) != 0, target < pc)
+  return int(np.count_nonzero(predicted != taken))
+
+
+def sweep(cfg, trace, impl, entries, ctr_bits):
+  """Evaluate a bimodal or gshare predictor for each number of entries and
+  counter width
+
+  trace is a BranchTrace or its (pc, target, taken) arrays, the other
+  parameters come from cfg. Returns {(entries, ctr_bits): mispredictions}.
+  """
+  if impl not in IMPLS:
+    raise ValueError("%s cannot be evaluated by the batch engine" % impl)
+  pc, target, taken = trace if isinstance(trace, tuple) else trace_arrays(trace)
+  results = {}
+  for size in entries:
+    table = FetchTable(cfg, size)
+    rows = np.int64(table.rows)
+    row = (pc >> np.uint64(table.row_shift)).astype(np.int64) & (rows - 1)
+    if impl == "gshare":
+      row ^= global_history(taken, clog2(table.rows))
+    column = (pc >> np.uint64(table.column_shift)).astype(np.int64) & table.column_mask
+    order, first = sort_entries(row * table.instr_per_fetch + column)
+    for bits in ctr_bits:
+      results[(size, bits)] = mispredictions(pc, target, taken, order, first, bits)
+  return results
+
+
+def config_name(impl, size, bits):
+  """Return the stats_bp name of a configuration, e.g. bht=8192_ctrbits=3"""
+  return IMPLS[impl] % (size, bits)
@@ -0,0 +1,113 @@
+"""
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Branch predictor parameters of a CVA6 configuration package
+"""
+
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                                "..", "..", "..", "util"))
+
+import user_config
+
+CONFIG_PKG = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                          "..", "..", "..", "core", "include",
+                          "cv64a6_imafdc_sv39_config_pkg.sv")
+
+# Order of config_pkg::bp_t
+IMPLS = ["BimodalBP", "GlobalBP", "LocalBP", "TournamentBP", "TAGEBP"]
+
+# cva6_user_cfg_t fields read by the models
+FIELDS = ["RVC", "SuperscalarEn", "BranchPredictorImpl",
+          "BHTEntries", "ChoicePredictorSize", "GlobalPredictorSize",
+          "LocalPredictorSize", "LocalHistoryTableSize",
+          "BimodalCtrBits", "ChoiceCtrBits", "GlobalCtrBits", "LocalCtrBits",
+          "power", "nTagHistoryTables", "histLengths", "tagTableTagWidths",
+          "tagTableSizes", "tagTableCounterBits", "tagTableUBits",
+          "histBufferBits", "pathHistBits", "uResetPeriod",
+          "initialRstCtrValue", "useAltOnNaBits"]
+
+DEFINE_RE = re.compile(r"^\s*`define\s+(?P<name>\w+)\s+(?P<value>.*?)\s*$")
+MACRO_RE = re.compile(r"^`(?P<name>\w+)$")
+# A cast whose type is not a plain identifier, e.g. config_pkg::bp_t'(x) or
+# (`N_HISTORY_TABLES*32)'(x), which user_config does not strip
+CAST_RE = re.compile(r"^.*?'\((?P<value>.*)\)$")
+
+
+def strip_comment(line):
+  return line.split("//")[0].rstrip() + "\n"
+
+
+def evaluate(value, params, defines):
+  """Evaluate a cva6_cfg field, through its localparam and macro"""
+  while True:
+    value = value.strip()
+    cast = CAST_RE.match(value)
+    macro = MACRO_RE.match(value)
+    if cast:
+      value = cast.group("value")
+    elif macro:
+      value = defines[macro.group("name")]
+    elif value in params:
+      value = params[value]
+    else:
+      break
+  value = user_config.array(value)
+  if isinstance(value, list):
+    return [int(v) for v in value]
+  value = user_config.number(value)
+  return int(value)
+
+
+def load_config(config_pkg=CONFIG_PKG, defines=None, overrides=None):
+  """Return the branch predictor parameters of a configuration package
+
+  The values are the ones of cva6_cfg, with the macros of the package set
+  by defines (as the +define+ of a simulation) or else to their `define
+  default. overrides sets cva6_cfg fields directly. As build_config, the
+  arrays are in table order (histLengths[0] is the one of the first tagged
+  table) and tagTableSizes is scaled by 2**(power-1); INSTR_PER_FETCH is
+  added.
+
+  Returns:
+    cfg : FIELDS name -> int, or list of int for the TAGE arrays
+  """
+  with open(config_pkg, "r") as handle:
+    lines = [strip_comment(line) for line in handle]
+  macros = {}
+  for line in lines:
+    match = DEFINE_RE.match(line)
+    if match:
+      macros.setdefault(match.group("name"), match.group("value"))
+  macros.update({name: str(value) for (name, value) in (defines or {}).items()})
+  params, config = user_config.parse(lines)
+
+  cfg = {}
+  for field in FIELDS:
+    if field in (overrides or {}):
+      cfg[field] = overrides[field]
+    elif field in config:
+      cfg[field] = evaluate(config[field], params, macros)
+    else:
+      raise ValueError("%s has no %s field" % (config_pkg, field))
+
+  cfg["INSTR_PER_FETCH"] = (64 if cfg["SuperscalarEn"] else 32) // (16 if cfg["RVC"] else 32)
+  tables = cfg["nTagHistoryTables"]
+  for field in ("histLengths", "tagTableTagWidths", "tagTableSizes"):
+    cfg[field] = list(cfg[field])[:tables]
+  if "tagTableSizes" not in (overrides or {}):
+    cfg["tagTableSizes"] = [size << (cfg["power"] - 1) for size in cfg["tagTableSizes"]]
+  return cfg
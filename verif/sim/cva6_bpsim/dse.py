@@ -0,0 +1,371 @@
+"""
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Design-space exploration of the branch predictor parameters under a
+storage budget
+
+The parameterizations of each predictor whose storage fits the budget are
+enumerated, evaluated on every benchmark in a process pool, and the Pareto
+frontier of the mean miss rate against the storage is reported. Points are
+evaluated by the trace-driven models, or by real simulations of a
+configuration package derived with util/user_config.py:
+
+  python3 -m cva6_bpsim.dse --kbits 64 --impl gshare --impl tage test.log
+  python3 -m cva6_bpsim.dse --kbits 64 --sim "./run_bench.sh {config_pkg} {benchmark}" dhrystone
+
+The storage is the one of get_effective_size in stats_bp/create_graphs.py:
+the bits of the tables, plus the global history register of the predictors
+having one.
+"""
+
+import argparse
+import logging
+import os
+import re
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from . import BranchTrace, load_config, make_predictor, simulate
+from .config import CONFIG_PKG
+from .predictors import clog2
+
+import user_config
+
+try:
+  from . import batch
+except ImportError:
+  batch = None
+
+# config_pkg::bp_t value of each model, and the stats_bp name of its points
+IMPLS = {
+  "bimodal": (0, "bht=%(entries)d_ctrbits=%(ctr_bits)d"),
+  "gshare": (1, "gbp=%(entries)d_ctrbits=%(ctr_bits)d"),
+  "local": (2, "lbp=%(entries)d_lhr=%(lhr_entries)d_ctrbits=%(ctr_bits)d"),
+  "tournament": (3, "mbp=%(entries)d_gbp=%(gbp_entries)d_lbp=%(lbp_entries)d_lhr=%(lhr_entries)d"),
+  "tage": (4, "bimodal=%(bht_entries)d_power=%(power)d_ubitperiod=%(u_reset_period)d"),
+}
+
+# Localparams of the configuration package set by each point parameter, the
+# index bits following the number of entries
+LOCALPARAMS = {
+  "bimodal": {"entries": ("BHTEntries", "BHTIndexBits"), "ctr_bits": ("BimodalCtrBits",)},
+  "gshare": {"entries": ("GlobalPredictorSize", "GlobalPredictorIndexBits"),
+             "ctr_bits": ("GlobalCtrBits",)},
+  "local": {"entries": ("LocalPredictorSize", "LocalPredictorIndexBits"),
+            "lhr_entries": ("LocalHistoryTableSize", "LocalHistoryTableIndexBits"),
+            "ctr_bits": ("LocalCtrBits",)},
+  "tournament": {"entries": ("ChoicePredictorSize", "ChoicePredictorIndexBits"),
+                 "gbp_entries": ("GlobalPredictorSize", "GlobalPredictorIndexBits"),
+                 "lbp_entries": ("LocalPredictorSize", "LocalPredictorIndexBits"),
+                 "lhr_entries": ("LocalHistoryTableSize", "LocalHistoryTableIndexBits")},
+  "tage": {"bht_entries": ("BHTEntries", "BHTIndexBits"), "power": ("Power",),
+           "u_reset_period": ("UResetPeriod",)},
+}
+
+# Branch miss ratio of a perf stat report, as read by stats_bp/create_tables.sh
+MISS_RATIO_RE = re.compile(r"(?P<ratio>[\d.]+)\s*%\s+of all branches")
+
+
+class Point:
+  """A parameterization of a predictor
+
+  params are the keyword arguments of the model, except for TAGE whose
+  parameters are cva6_cfg fields (see config).
+  """
+
+  def __init__(self, impl, **params):
+    self.impl = impl
+    self.params = params
+
+  @property
+  def name(self):
+    return IMPLS[self.impl][1] % self.params
+
+  def config(self, cfg):
+    """Return the cfg and the model keyword arguments of the point"""
+    if self.impl != "tage":
+      return cfg, self.params
+    cfg = dict(cfg)
+    scale = self.params["power"] - cfg["power"]
+    cfg["tagTableSizes"] = [(size << scale) if scale >= 0 else (size >> -scale)
+                            for size in cfg["tagTableSizes"]]
+    cfg["BHTEntries"] = self.params["bht_entries"]
+    cfg["power"] = self.params["power"]
+    cfg["uResetPeriod"] = self.params["u_reset_period"]
+    return cfg, {}
+
+  def changes(self):
+    """Return the user_config.derive_config changes of the point"""
+    changes = [("+CVA6ConfigBranchPredictorImpl", str(IMPLS[self.impl][0]))]
+    for (param, value) in self.params.items():
+      names = LOCALPARAMS[self.impl][param]
+      changes.append(("+CVA6Config" + names[0], str(value)))
+      if len(names) > 1:
+        changes.append(("+CVA6Config" + names[1], str(clog2(value))))
+    return changes
+
+
+def storage_bits(cfg, point):
+  """Return the (table, history register) bits of a point
+
+  Entries hold a valid bit and a counter, the mbp choice counters have no
+  valid bit and the TAGE entries also hold a tag and a u counter.
+  """
+  cfg, params = point.config(cfg)
+  ipf = cfg["INSTR_PER_FETCH"]
+  if point.impl in ("bimodal", "gshare"):
+    tables = params["entries"] * (params["ctr_bits"] + 1)
+    history = clog2(params["entries"] // ipf) if point.impl == "gshare" else 0
+  elif point.impl == "local":
+    tables = params["entries"] * (params["ctr_bits"] + 1) \
+      + params["lhr_entries"] * clog2(params["entries"] // ipf)
+    history = 0
+  elif point.impl == "tournament":
+    tables = params["entries"] * cfg["ChoiceCtrBits"] \
+      + params["gbp_entries"] * (cfg["GlobalCtrBits"] + 1) \
+      + params["lbp_entries"] * (cfg["LocalCtrBits"] + 1) \
+      + params["lhr_entries"] * clog2(params["lbp_entries"] // ipf)
+    history = clog2(params["gbp_entries"] // ipf)
+  else:
+    tables = cfg["BHTEntries"] * (cfg["BimodalCtrBits"] + 1)
+    for (size, tag_width) in zip(cfg["tagTableSizes"], cfg["tagTableTagWidths"]):
+      tables += size * (1 + cfg["tagTableCounterBits"] + tag_width + cfg["tagTableUBits"])
+    history = cfg["histBufferBits"]
+  return tables, history
+
+
+def enumerate_points(cfg, impl, sizes, ctr_bits, powers, u_reset_periods):
+  """Yield the points of a predictor, of any storage
+
+  sizes are the numbers of entries of each table, the TAGE tagged tables
+  being scaled by the powers instead.
+  """
+  if impl in ("bimodal", "gshare"):
+    for entries in sizes:
+      for bits in ctr_bits:
+        yield Point(impl, entries=entries, ctr_bits=bits)
+  elif impl == "local":
+    for entries in sizes:
+      for lhr_entries in sizes:
+        for bits in ctr_bits:
+          yield Point(impl, entries=entries, lhr_entries=lhr_entries, ctr_bits=bits)
+  elif impl == "tournament":
+    for entries in sizes:
+      for gbp_entries in sizes:
+        for lbp_entries in sizes:
+          for lhr_entries in sizes:
+            yield Point(impl, entries=entries, gbp_entries=gbp_entries,
+                        lbp_entries=lbp_entries, lhr_entries=lhr_entries)
+  else:
+    for bht_entries in sizes:
+      for power in powers:
+        for period in u_reset_periods:
+          yield Point(impl, bht_entries=bht_entries, power=power, u_reset_period=period)
+
+
+def is_legal(cfg, point):
+  """Whether every table of a point has a power of two number of rows"""
+  point_cfg, params = point.config(cfg)
+  if point.impl == "tage":
+    if point.params["power"] < 1:
+      return False
+    sizes = [point_cfg["BHTEntries"]] + point_cfg["tagTableSizes"]
+  else:
+    sizes = [value for (param, value) in params.items() if param != "ctr_bits"]
+  rows = [size // cfg["INSTR_PER_FETCH"] for size in sizes]
+  return all(row >= 1 and not row & (row - 1) for row in rows)
+
+
+def legal_points(cfg, impls, kbits, min_kbits=0, **kwargs):
+  """Return the points of impls whose effective storage is within
+  [min_kbits, kbits], and their effective storage in Kbits"""
+  points = []
+  for impl in impls:
+    for point in enumerate_points(cfg, impl, **kwargs):
+      if not is_legal(cfg, point):
+        continue
+      size = sum(storage_bits(cfg, point)) / 1024.0
+      if min_kbits <= size <= kbits:
+        points.append((point, size))
+  return points
+
+
+def model_misses(cfg, trace, points, cycles_per_branch=1):
+  """Return the (mispredictions, branches) of each point on a trace, with
+  the batch engine for the bimodal and gshare points when NumPy is there"""
+  results = {}
+  swept = [p for p in points if p.impl in ("bimodal", "gshare")] if batch else []
+  for impl in set(p.impl for p in swept):
+    impl_points = [p for p in swept if p.impl == impl]
+    sizes = sorted(set(p.params["entries"] for p in impl_points))
+    bits = sorted(set(p.params["ctr_bits"] for p in impl_points))
+    misses = batch.sweep(cfg, trace, impl, sizes, bits)
+    for point in impl_points:
+      results[point.name] = (misses[(point.params["entries"], point.params["ctr_bits"])], len(trace))
+  for point in points:
+    if point.name not in results:
+      point_cfg, kwargs = point.config(cfg)
+      if point.impl == "tage":
+        kwargs = {"cycles_per_branch": cycles_per_branch}
+      predictor = make_predictor(point_cfg, point.impl, **kwargs)
+      results[point.name] = (simulate(predictor, trace), len(trace))
+  return results
+
+
+def load_trace(path, iss):
+  return BranchTrace.from_trace(path, iss)
+
+
+def sim_miss_ratio(command, config_pkg, benchmark, name):
+  """Run the simulation of a benchmark on a configuration package, and
+  return its branch miss ratio in %"""
+  command = command.format(config_pkg=config_pkg, benchmark=benchmark, name=name)
+  result = subprocess.run(command, shell=True, stdout=subprocess.PIPE,
+                          stderr=subprocess.STDOUT, universal_newlines=True)
+  if result.returncode:
+    raise RuntimeError("%s failed:\n%s" % (command, result.stdout))
+  match = MISS_RATIO_RE.search(result.stdout)
+  if not match:
+    raise RuntimeError("%s printed no branch miss ratio" % command)
+  return float(match.group("ratio"))
+
+
+def evaluate_models(cfg, points, traces, iss, jobs, cycles_per_branch=1):
+  """Return {name: {benchmark: miss %}} of points on the traces
+
+  The traces are read in parallel, then the points are evaluated in about
+  jobs chunks per trace.
+  """
+  rates = {point.name: {} for point in points}
+  with ProcessPoolExecutor(max_workers=jobs) as pool:
+    branches = list(pool.map(load_trace, traces, [iss] * len(traces)))
+    # The batch engine sweeps the points of a predictor at once
+    groups = [[p for p in points if p.impl == impl]
+              for impl in ("bimodal", "gshare") if batch]
+    others = [p for p in points if not any(p in group for group in groups)]
+    chunk = max(-(-len(others) // jobs), 1)
+    groups += [others[i:i + chunk] for i in range(0, len(others), chunk)]
+    futures = [(path, pool.submit(model_misses, cfg, trace, group, cycles_per_branch))
+               for (path, trace) in zip(traces, branches)
+               for group in groups if group]
+    for (path, future) in futures:
+      for (name, (misses, count)) in future.result().items():
+        rates[name][benchmark_name(path)] = 100.0 * misses / max(count, 1)
+  return rates
+
+
+def evaluate_sims(points, benchmarks, command, config_pkg, work_dir, jobs):
+  """Return {name: {benchmark: miss %}} of points simulated by command
+
+  A configuration package is derived from config_pkg for each point.
+  """
+  os.makedirs(work_dir, exist_ok=True)
+  rates = {point.name: {} for point in points}
+  with ProcessPoolExecutor(max_workers=jobs) as pool:
+    futures = []
+    for point in points:
+      point_pkg = os.path.join(work_dir, "%s_config_pkg.sv" % point.name)
+      user_config.derive_config(config_pkg, point_pkg, point.changes())
+      for benchmark in benchmarks:
+        futures.append((point.name, benchmark,
+                        pool.submit(sim_miss_ratio, command, point_pkg, benchmark, point.name)))
+    for (name, benchmark, future) in futures:
+      rates[name][benchmark] = future.result()
+  return rates
+
+
+def pareto_frontier(results):
+  """Return the (name, Kbits, miss %) results that no other result beats
+  on both storage and miss rate, by increasing storage"""
+  frontier = []
+  for result in sorted(results, key=lambda r: (r[1], r[2])):
+    if not frontier or result[2] < frontier[-1][2]:
+      frontier.append(result)
+  return frontier
+
+
+def benchmark_name(path):
+  return os.path.basename(path).split(".")[0]
+
+
+def parse_list(values):
+  return [int(value, 0) for value in values.split(",")]
+
+
+def main():
+  parser = argparse.ArgumentParser(prog="cva6_bpsim.dse")
+  parser.add_argument("benchmarks", type=str, nargs="+",
+                      help="Traces of the benchmarks, or their names with --sim")
+  parser.add_argument("--kbits", type=float, required=True,
+                      help="Storage budget in Kbits")
+  parser.add_argument("--min_kbits", type=float, default=0,
+                      help="Skip the points smaller than this, in Kbits")
+  parser.add_argument("--impl", type=str, action="append", choices=list(IMPLS),
+                      help="Predictor to explore, all by default; repeatable")
+  parser.add_argument("--sizes", type=parse_list,
+                      help="Comma separated numbers of entries, powers of two from 256 by default")
+  parser.add_argument("--ctr_bits", type=parse_list, default=[2, 3],
+                      help="Comma separated counter widths of bimodal, gshare and local")
+  parser.add_argument("--powers", type=parse_list, default=[1, 2, 3, 4, 5],
+                      help="Comma separated TAGE power values")
+  parser.add_argument("--u_reset_periods", type=parse_list,
+                      help="Comma separated TAGE u reset periods, uResetPeriod by default")
+  parser.add_argument("--config_pkg", type=str, default=CONFIG_PKG,
+                      help="Configuration package the points are derived from")
+  parser.add_argument("--iss", type=str, default="spike",
+                      help="ISS that wrote the logs, e.g. spike or veri-testharness")
+  parser.add_argument("--cycles_per_branch", type=int, default=1,
+                      help="Clock cycles per branch of the TAGE model")
+  parser.add_argument("--sim", type=str,
+                      help="Command simulating a point instead of the models, formatted with "
+                      "{config_pkg}, {benchmark} and {name}, printing a perf stat branch miss ratio")
+  parser.add_argument("--work_dir", type=str, default="bp_dse",
+                      help="Directory of the derived configuration packages with --sim")
+  parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(),
+                      help="Number of worker processes")
+  parser.add_argument("--all", action="store_true",
+                      help="Report every point, not only the Pareto frontier")
+  args = parser.parse_args()
+  logging.basicConfig(level=logging.INFO)
+
+  cfg = load_config(args.config_pkg)
+  budget = int(args.kbits * 1024)
+  sizes = args.sizes or [1 << n for n in range(8, budget.bit_length())]
+  points = legal_points(cfg, args.impl or list(IMPLS), args.kbits, args.min_kbits,
+                        sizes=sizes, ctr_bits=args.ctr_bits, powers=args.powers,
+                        u_reset_periods=args.u_reset_periods or [cfg["uResetPeriod"]])
+  if not points:
+    logging.error("No parameterization fits in %g Kbits" % args.kbits)
+    return 1
+  logging.info("Evaluating %d points on %d benchmarks" % (len(points), len(args.benchmarks)))
+  kbits = {point.name: size for (point, size) in points}
+  points = [point for (point, _) in points]
+  if args.sim:
+    rates = evaluate_sims(points, args.benchmarks, args.sim, args.config_pkg,
+                          args.work_dir, args.jobs)
+  else:
+    rates = evaluate_models(cfg, points, args.benchmarks, args.iss, args.jobs,
+                            args.cycles_per_branch)
+
+  results = [(name, kbits[name], sum(rates[name].values()) / len(rates[name]))
+             for name in rates]
+  frontier = pareto_frontier(results)
+  print("%-48s %10s %8s %8s" % ("Configuration", "Kbits", "Miss %", "Pareto"))
+  for (name, size, rate) in sorted(results if args.all else frontier, key=lambda r: r[1]):
+    print("%-48s %10.2f %8.2f %8s" % (name, size, rate, "*" if (name, size, rate) in frontier else ""))
+  return 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,201 @@
+"""
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Models of the bht, gbp, lbp and tournament predictors of core/frontend
+
+A predictor answers predict(pc) with a (valid, taken, metadata) tuple, as
+its bht_prediction_o for the slot of pc, and takes the resolved branch back
+with update(pc, taken, metadata, mispredict), as bht_update_i.
+"""
+
+
+def clog2(value):
+  """$clog2"""
+  return (value - 1).bit_length()
+
+
+def count(counter, taken, max_val):
+  """Saturating counter update of bht.sv, gbp.sv and lbp.sv"""
+  if taken:
+    return counter + 1 if counter < max_val else max_val
+  return counter - 1 if counter > 0 else 0
+
+
+class FetchTable:
+  """RAMs with a column per instruction of a fetch, as the predictors
+  reshape their NR_ENTRIES entries into NR_ROWS x INSTR_PER_FETCH
+
+  A column is selected by pc[ROW_ADDR_BITS+OFFSET-1:OFFSET] (always 0
+  without RVC), and the row of a PC is pc[PREDICTION_BITS-1:ROW_ADDR_BITS+OFFSET].
+  Entries are stored at row * INSTR_PER_FETCH + column.
+  """
+
+  def __init__(self, cfg, entries):
+    self.instr_per_fetch = cfg["INSTR_PER_FETCH"]
+    offset = 1 if cfg["RVC"] else 2
+    self.rows = entries // self.instr_per_fetch
+    if self.rows < 1 or self.rows & (self.rows - 1):
+      raise ValueError("%d entries cannot be reshaped in %d columns" %
+                       (entries, self.instr_per_fetch))
+    self.row_shift = clog2(self.instr_per_fetch) + offset
+    self.column_shift = offset
+    self.column_mask = self.instr_per_fetch - 1 if cfg["RVC"] else 0
+
+  def row(self, pc):
+    return (pc >> self.row_shift) & (self.rows - 1)
+
+  def column(self, pc):
+    return (pc >> self.column_shift) & self.column_mask
+
+  def entry(self, row, pc):
+    return row * self.instr_per_fetch + ((pc >> self.column_shift) & self.column_mask)
+
+
+class Bimodal(FetchTable):
+  """bht.sv: {valid, counter} entries indexed by the PC
+
+  metadata is the row read at prediction, which the update writes back.
+  """
+
+  def __init__(self, cfg, entries=None, ctr_bits=None):
+    super().__init__(cfg, cfg["BHTEntries"] if entries is None else entries)
+    self.ctr_bits = cfg["BimodalCtrBits"] if ctr_bits is None else ctr_bits
+    self.max_val = (1 << self.ctr_bits) - 1
+    self.valid = bytearray(self.rows * self.instr_per_fetch)
+    self.counters = bytearray(self.rows * self.instr_per_fetch)
+
+  def predict(self, pc):
+    row = self.row(pc)
+    entry = self.entry(row, pc)
+    return self.valid[entry], self.counters[entry] >> (self.ctr_bits - 1), row
+
+  def update(self, pc, taken, metadata, mispredict):
+    entry = self.entry(metadata, pc)
+    self.valid[entry] = 1
+    self.counters[entry] = count(self.counters[entry], taken, self.max_val)
+
+
+class Gshare(FetchTable):
+  """gbp.sv: {valid, counter} entries indexed by the row of the PC xor the
+  global history register
+
+  The GHR holds the last clog2(NR_ROWS) outcomes, the newest in bit 0.
+  """
+
+  def __init__(self, cfg, entries=None, ctr_bits=None):
+    super().__init__(cfg, cfg["GlobalPredictorSize"] if entries is None else entries)
+    self.ctr_bits = cfg["GlobalCtrBits"] if ctr_bits is None else ctr_bits
+    self.max_val = (1 << self.ctr_bits) - 1
+    self.ghr = 0
+    self.valid = bytearray(self.rows * self.instr_per_fetch)
+    self.counters = bytearray(self.rows * self.instr_per_fetch)
+
+  def predict(self, pc):
+    index = self.row(pc) ^ self.ghr
+    entry = self.entry(index, pc)
+    return self.valid[entry], self.counters[entry] >> (self.ctr_bits - 1), index
+
+  def update(self, pc, taken, metadata, mispredict):
+    entry = self.entry(metadata, pc)
+    self.valid[entry] = 1
+    self.counters[entry] = count(self.counters[entry], taken, self.max_val)
+    self.ghr = ((self.ghr << 1) | taken) & (self.rows - 1)
+
+
+class Local(FetchTable):
+  """lbp.sv: a local history register per PC row and column, whose value
+  indexes the {valid, counter} entries of the column
+
+  The LHRs are clog2(LBP_ENTRIES / INSTR_PER_FETCH) bits wide, the newest
+  outcome in bit 0. metadata is the LHR value read at prediction.
+  """
+
+  def __init__(self, cfg, entries=None, lhr_entries=None, ctr_bits=None):
+    super().__init__(cfg, cfg["LocalPredictorSize"] if entries is None else entries)
+    self.lhrs = FetchTable(cfg, cfg["LocalHistoryTableSize"] if lhr_entries is None else lhr_entries)
+    self.ctr_bits = cfg["LocalCtrBits"] if ctr_bits is None else ctr_bits
+    self.max_val = (1 << self.ctr_bits) - 1
+    self.lhr = [0] * (self.lhrs.rows * self.instr_per_fetch)
+    self.valid = bytearray(self.rows * self.instr_per_fetch)
+    self.counters = bytearray(self.rows * self.instr_per_fetch)
+
+  def predict(self, pc):
+    index = self.lhr[self.lhrs.entry(self.lhrs.row(pc), pc)]
+    entry = self.entry(index, pc)
+    return self.valid[entry], self.counters[entry] >> (self.ctr_bits - 1), index
+
+  def update(self, pc, taken, metadata, mispredict):
+    lhr = self.lhrs.entry(self.lhrs.row(pc), pc)
+    self.lhr[lhr] = ((self.lhr[lhr] << 1) | taken) & (self.rows - 1)
+    entry = self.entry(metadata, pc)
+    self.valid[entry] = 1
+    self.counters[entry] = count(self.counters[entry], taken, self.max_val)
+
+
+class Tournament(FetchTable):
+  """tournament.sv: a gbp and an lbp, and the counters of mbp.sv choosing
+  between them
+
+  A choice counter at its maximum selects the gbp, at 0 the lbp. It moves
+  towards the component that alone predicted the outcome, a component
+  without a valid prediction counting as wrong. metadata holds the
+  predictions of both components.
+  """
+
+  def __init__(self, cfg, entries=None, gbp_entries=None, lbp_entries=None,
+               lhr_entries=None, ctr_bits=None):
+    super().__init__(cfg, cfg["ChoicePredictorSize"] if entries is None else entries)
+    self.gbp = Gshare(cfg, gbp_entries)
+    self.lbp = Local(cfg, lbp_entries, lhr_entries)
+    self.ctr_bits = cfg["ChoiceCtrBits"] if ctr_bits is None else ctr_bits
+    self.max_val = (1 << self.ctr_bits) - 1
+    self.counters = bytearray(self.rows * self.instr_per_fetch)
+
+  def predict(self, pc):
+    gbp = self.gbp.predict(pc)
+    lbp = self.lbp.predict(pc)
+    select = self.counters[self.entry(self.row(pc), pc)] >> (self.ctr_bits - 1)
+    prediction = gbp if select else lbp
+    return prediction[0], prediction[1], (gbp, lbp)
+
+  def update(self, pc, taken, metadata, mispredict):
+    gbp, lbp = metadata
+    gbp_right = gbp[0] and gbp[1] == taken
+    lbp_right = lbp[0] and lbp[1] == taken
+    entry = self.entry(self.row(pc), pc)
+    if gbp_right and not lbp_right:
+      self.counters[entry] = min(self.counters[entry] + 1, self.max_val)
+    elif lbp_right and not gbp_right:
+      self.counters[entry] = max(self.counters[entry] - 1, 0)
+    self.gbp.update(pc, taken, gbp[2], mispredict)
+    self.lbp.update(pc, taken, lbp[2], mispredict)
+
+
+def simulate(predictor, branches):
+  """Replay (pc, target, taken) conditional branches through a predictor,
+  as frontend.sv predicts and then updates each of them
+
+  Without a valid prediction, frontend.sv predicts a branch taken if it is
+  backward. Returns the number of mispredictions.
+  """
+  predict = predictor.predict
+  update = predictor.update
+  mispredictions = 0
+  for (pc, target, taken) in branches:
+    valid, predicted, metadata = predict(pc)
+    if not valid:
+      predicted = target < pc
+    mispredict = predicted != taken
+    mispredictions += mispredict
+    update(pc, taken, metadata, mispredict)
+  return mispredictions
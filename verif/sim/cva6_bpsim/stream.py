@@ -0,0 +1,261 @@
+"""
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Retired conditional branches of Spike/Verilator logs and trace CSVs
+
+The control-flow instructions of a log can be extracted once to a branch
+trace, packed records of little endian uint64 pc, uint64 target and uint8
+flags after a header (magic, number of records, number of instructions).
+The target of a jalr is the next pc, and the flags hold the outcome and the
+branch, call and return events of perf_counters.sv. A branch trace written
+next to a log (log + ".branches") is read in place of the log.
+"""
+
+import array
+import csv
+import os
+import struct
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), ".."))
+
+from cva6_trace_io import open_log, read_lines
+from cva6_trace_index import get_trace_parsers, is_csv
+
+
+def branch_target(pc, binary):
+  """Return the target of a conditional branch, None for other instructions
+
+  binary is the instruction as an integer: a B-type instruction, or a
+  c.beqz/c.bnez.
+  """
+  if binary & 3 == 3:
+    if binary & 0x7f != 0x63:
+      return None
+    imm = (((binary >> 31) & 1) << 12) | (((binary >> 7) & 1) << 11) \
+      | (((binary >> 25) & 0x3f) << 5) | (((binary >> 8) & 0xf) << 1)
+    imm -= (imm & 0x1000) << 1
+  else:
+    if binary & 3 != 1 or (binary >> 13) & 7 < 6:
+      return None
+    imm = (((binary >> 12) & 1) << 8) | (((binary >> 10) & 3) << 3) \
+      | (((binary >> 5) & 3) << 6) | (((binary >> 3) & 3) << 1) | (((binary >> 2) & 1) << 5)
+    imm -= (imm & 0x100) << 1
+  return pc + imm
+
+
+MAGIC = b"CVA6BRT1"
+HEADER = struct.Struct("<8sQQ")
+RECORD = struct.Struct("<QQB")
+
+FLAG_TAKEN = 0x01
+FLAG_CONDITIONAL = 0x02  # B-type, c.beqz, c.bnez
+FLAG_JAL = 0x04  # jal, c.j
+FLAG_JALR = 0x08  # jalr, c.jr, c.jalr
+FLAG_CALL = 0x10  # jal/jalr writing ra or t0
+FLAG_RETURN = 0x20  # jalr writing x0
+
+# Records buffered before they are written
+FLUSH_RECORDS = 1 << 16
+
+
+def control_flow(pc, binary):
+  """Return the (target, flags) of a control-flow instruction, None for
+  other instructions
+
+  The target of a jalr is None, the taken flag is not set. c.jal (RV32 only)
+  is not decoded, its encoding being c.addiw in RV64.
+  """
+  if binary & 3 == 3:
+    opcode = binary & 0x7f
+    rd = (binary >> 7) & 0x1f
+    if opcode == 0x63:
+      return branch_target(pc, binary), FLAG_CONDITIONAL
+    if opcode == 0x6f:
+      imm = (((binary >> 31) & 1) << 20) | (((binary >> 12) & 0xff) << 12) \
+        | (((binary >> 20) & 1) << 11) | (((binary >> 21) & 0x3ff) << 1)
+      imm -= (imm & 0x100000) << 1
+      return pc + imm, FLAG_JAL | (FLAG_CALL if rd in (1, 5) else 0)
+    if opcode == 0x67 and (binary >> 12) & 7 == 0:
+      return None, FLAG_JALR | (FLAG_CALL if rd in (1, 5) else 0) | (FLAG_RETURN if rd == 0 else 0)
+    return None
+  funct3 = (binary >> 13) & 7
+  if binary & 3 == 1:
+    if funct3 >= 6:
+      return branch_target(pc, binary), FLAG_CONDITIONAL
+    if funct3 == 5:
+      imm = (((binary >> 12) & 1) << 11) | (((binary >> 11) & 1) << 4) \
+        | (((binary >> 9) & 3) << 8) | (((binary >> 8) & 1) << 10) | (((binary >> 7) & 1) << 6) \
+        | (((binary >> 6) & 1) << 7) | (((binary >> 3) & 7) << 1) | (((binary >> 2) & 1) << 5)
+      imm -= (imm & 0x800) << 1
+      return pc + imm, FLAG_JAL
+    return None
+  if binary & 3 == 2 and funct3 == 4 and (binary >> 2) & 0x1f == 0 and (binary >> 7) & 0x1f:
+    if (binary >> 12) & 1:
+      return None, FLAG_JALR | FLAG_CALL
+    return None, FLAG_JALR | FLAG_RETURN
+  return None
+
+
+def branches_path(path):
+  return path + ".branches"
+
+
+def is_branch_trace(path):
+  with open(path, "rb") as handle:
+    return handle.read(len(MAGIC)) == MAGIC
+
+
+def write_branch_trace(path, instrs):
+  """Write the branch trace of (pc, binary) hex strings, returns the number
+  of records
+
+  The trace is written to a temporary file renamed at the end, so that an
+  interrupted extraction leaves no partial trace.
+  """
+  handle = tempfile.NamedTemporaryFile(dir=os.path.dirname(os.path.abspath(path)), delete=False)
+  try:
+    handle.write(HEADER.pack(MAGIC, 0, 0))
+    buffer = bytearray()
+    pending = None
+    records = 0
+    count = 0
+    for (pc, binary) in instrs:
+      count += 1
+      pc = int(pc, 16)
+      if pending is not None:
+        target, flags = pending[1:]
+        if target is None:
+          target = pc
+        if pc == target:
+          flags |= FLAG_TAKEN
+        buffer += RECORD.pack(pending[0], target, flags)
+        records += 1
+        if records % FLUSH_RECORDS == 0:
+          handle.write(buffer)
+          buffer.clear()
+      info = control_flow(pc, int(binary, 16))
+      if info is None:
+        pending = None
+      else:
+        target = None if info[0] is None else info[0] & 0xffffffffffffffff
+        pending = (pc, target, info[1])
+    handle.write(buffer)
+    handle.seek(0)
+    handle.write(HEADER.pack(MAGIC, records, count))
+    handle.close()
+    os.replace(handle.name, path)
+  except BaseException:
+    handle.close()
+    os.unlink(handle.name)
+    raise
+  return records
+
+
+def read_branch_trace(path):
+  """Return the (pc, target, flags) records and the number of instructions
+  of a branch trace"""
+  with open(path, "rb") as handle:
+    data = handle.read()
+  magic, records, instrs = HEADER.unpack_from(data)
+  if magic != MAGIC:
+    raise ValueError("%s is not a branch trace" % path)
+  end = HEADER.size + records * RECORD.size
+  if len(data) < end:
+    raise ValueError("%s is truncated" % path)
+  return RECORD.iter_unpack(memoryview(data)[HEADER.size:end]), instrs
+
+
+def extract_branches(path, iss=None, output=None):
+  """Write the branch trace of a log or trace CSV, next to it by default,
+  unless it is already there and newer than the log. Returns its path."""
+  output = output or branches_path(path)
+  if not (os.path.exists(output) and os.path.getmtime(output) >= os.path.getmtime(path)):
+    write_branch_trace(output, read_instrs(path, iss))
+  return output
+
+
+def read_instrs(path, iss=None):
+  """Yield the (pc, binary) of the instructions of a log of iss or of a
+  trace CSV, as hex strings"""
+  if is_csv(path):
+    with open_log(path, "r") as handle:
+      for row in csv.DictReader(handle):
+        yield row["pc"], row["binary"]
+    return
+  parsers = get_trace_parsers(iss)
+  if parsers is None:
+    raise ValueError("Cannot read the logs of %s" % iss)
+  for (entry, _) in parsers[0](read_lines(path), 0):
+    yield entry.pc, entry.binary
+
+
+class BranchTrace:
+  """Conditional branches of a trace, in retirement order
+
+  A branch is taken when the next instruction is at its target. pc, target
+  and taken are parallel arrays, instrs is the number of instructions of
+  the trace. A trace is read from a branch trace when there is one.
+  """
+
+  def __init__(self):
+    self.pc = array.array("Q")
+    self.target = array.array("Q")
+    self.taken = bytearray()
+    self.instrs = 0
+
+  def __len__(self):
+    return len(self.pc)
+
+  def __iter__(self):
+    return zip(self.pc, self.target, map(bool, self.taken))
+
+  @classmethod
+  def from_instrs(cls, instrs):
+    """Build the branches of (pc, binary) hex strings"""
+    trace = cls()
+    pending = None
+    count = 0
+    for (pc, binary) in instrs:
+      count += 1
+      pc = int(pc, 16)
+      if pending is not None:
+        trace.pc.append(pending[0])
+        trace.target.append(pending[1])
+        trace.taken.append(pc == pending[1])
+      target = branch_target(pc, int(binary, 16))
+      pending = None if target is None else (pc, target & 0xffffffffffffffff)
+    trace.instrs = count
+    return trace
+
+  @classmethod
+  def from_branch_trace(cls, path):
+    """Build the conditional branches of a branch trace"""
+    trace = cls()
+    records, trace.instrs = read_branch_trace(path)
+    for (pc, target, flags) in records:
+      if flags & FLAG_CONDITIONAL:
+        trace.pc.append(pc)
+        trace.target.append(target)
+        trace.taken.append(flags & FLAG_TAKEN)
+    return trace
+
+  @classmethod
+  def from_trace(cls, path, iss=None):
+    if is_branch_trace(path):
+      return cls.from_branch_trace(path)
+    branches = branches_path(path)
+    if os.path.exists(branches) and os.path.getmtime(branches) >= os.path.getmtime(path):
+      return cls.from_branch_trace(branches)
+    return cls.from_instrs(read_instrs(path, iss))
@@ -0,0 +1,299 @@
+"""
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Model of the TAGE predictor of core/frontend: tage.sv, tage_component.sv
+and tage_lfsr.sv
+
+The allocation LFSR and the u counter reset sweep advance on clock cycles,
+which a branch stream does not have: they advance by cycles_per_branch
+cycles per branch, the update of the branch being the last of them.
+"""
+
+from .predictors import Bimodal, FetchTable, clog2
+
+
+class TageLfsr:
+  """tage_lfsr.sv with NBITS = 2 and WIDTH = 4"""
+
+  def __init__(self):
+    self.state = 1
+
+  def rand(self):
+    return self.state >> 2
+
+  def clock(self):
+    state = self.state
+    self.state = ((state << 1) & 0xf) | (((state >> 3) ^ (state >> 2)) & 1)
+
+
+def fold(hist, length, width):
+  """compute_folded_hist_idx/tag: xor of the width bits chunks of hist"""
+  result = 0
+  mask = (1 << width) - 1
+  while length > 0 and width:
+    result ^= hist & mask
+    hist >>= width
+    length -= width
+  return result
+
+
+class TageComponent(FetchTable):
+  """tage_component.sv: a tagged table, its entries being {valid, ctr, tag}
+  and a u counter
+
+  ctr is signed, a prediction is taken when it is positive or null.
+  """
+
+  def __init__(self, cfg, table_idx):
+    size = cfg["tagTableSizes"][table_idx - 1]
+    super().__init__(cfg, size)
+    self.table_idx = table_idx
+    self.history_length = cfg["histLengths"][table_idx - 1]
+    self.tag_width = cfg["tagTableTagWidths"][table_idx - 1]
+    self.ctr_bits = cfg["tagTableCounterBits"]
+    self.u_bits = cfg["tagTableUBits"]
+    self.idx_width = clog2(self.rows)
+    self.size = size
+    self.size_bits = clog2(size)
+    self.shamt = abs(table_idx - self.size_bits)
+    self.path_mask = (1 << min(self.history_length, cfg["pathHistBits"])) - 1
+    self.hist_mask = (1 << self.history_length) - 1
+    self.row_index_bits = clog2(self.instr_per_fetch) if cfg["RVC"] else 1
+    entries = self.rows * self.instr_per_fetch
+    self.valid = bytearray(entries)
+    self.ctr = [0] * entries
+    self.tag = [0] * entries
+    self.u = bytearray(entries)
+    # rst_u_index_q without its MSB, None when the MSB is set (no sweep)
+    self.rst_u_index = None
+
+  def path_hash(self, path_hist):
+    """F"""
+    size_mask = self.size - 1
+    a = path_hist & self.path_mask
+    a1 = a & size_mask
+    a2 = a >> self.size_bits
+    a2 = ((a2 << self.table_idx) & size_mask) + (a2 >> self.shamt)
+    a = a1 ^ a2
+    a = ((a << self.table_idx) & size_mask) + (a >> self.shamt)
+    return a & (self.rows - 1)
+
+  def index(self, pc, hist, path_hist):
+    """hpc"""
+    row = self.row(pc)
+    hist &= self.hist_mask
+    return (row ^ (row >> (self.shamt + 1)) ^ fold(hist, self.history_length, self.idx_width)
+            ^ self.path_hash(path_hist)) & (self.rows - 1)
+
+  def compute_tag(self, pc, hist):
+    """htag"""
+    tag_mask = (1 << self.tag_width) - 1
+    return (((pc >> self.row_shift) & tag_mask)
+            ^ fold(hist & self.hist_mask, self.history_length, self.tag_width))
+
+  def clock(self, rst_us, update=None):
+    """One cycle of the tables and of the u reset sweep
+
+    update is None without tage_component_update_i.valid, else a (pc, index,
+    tag, taken, alloc, update_u_en, mispredict) tuple.
+    """
+    doing_u_rst = self.rst_u_index is not None
+    alloc = update is not None and update[4]
+    do_rst_us = doing_u_rst and not alloc
+    if update is not None:
+      pc, index, tag, taken, alloc, update_u_en, mispredict = update
+      column = self.column(pc)
+    else:
+      index = tag = taken = update_u_en = mispredict = 0
+      column = 0
+    if do_rst_us:
+      u_index = self.rst_u_index >> self.row_index_bits
+      u_column = self.rst_u_index & ((1 << self.row_index_bits) - 1)
+    else:
+      u_index = index
+      u_column = column
+
+    if update is not None:
+      entry = index * self.instr_per_fetch + column
+      self.valid[entry] = 1
+      if alloc:
+        self.tag[entry] = tag
+        self.ctr[entry] = 0 if taken else -1
+      else:
+        ctr = self.ctr[entry]
+        if taken:
+          if ctr < (1 << (self.ctr_bits - 1)) - 1:
+            self.ctr[entry] = ctr + 1
+        elif ctr > -(1 << (self.ctr_bits - 1)):
+          self.ctr[entry] = ctr - 1
+    if (update is not None and (update_u_en or alloc)) or do_rst_us:
+      # The write enable follows the column of the update (0 without one),
+      # the written value the column of u_index: the u counter of another
+      # column than the update one is written as 0
+      value = 0
+      if u_column == column:
+        u = self.u[u_index * self.instr_per_fetch + u_column]
+        if alloc:
+          value = 0
+        elif do_rst_us:
+          value = u >> 1
+        elif update_u_en:
+          if mispredict:
+            value = u - 1 if u > 0 else 0
+          else:
+            value = u + 1 if u < (1 << self.u_bits) - 1 else u
+        else:
+          value = u
+      self.u[u_index * self.instr_per_fetch + column] = value
+
+    if rst_us and not doing_u_rst:
+      self.rst_u_index = 0
+    elif do_rst_us:
+      self.rst_u_index += 1
+      if self.rst_u_index == self.rows << self.row_index_bits:
+        self.rst_u_index = None
+
+
+class Tage(FetchTable):
+  """tage.sv: a bht and nTagHistoryTables tagged tables
+
+  The prediction comes from the tagged table with the longest history whose
+  tag matches, or from its alternate (the next matching table, or the bht)
+  when the entry is newly allocated and use_alt_on_na is not negative.
+  metadata is the tage_metadata_t of the prediction.
+  """
+
+  def __init__(self, cfg, cycles_per_branch=1):
+    super().__init__(cfg, cfg["BHTEntries"])
+    self.num_tables = cfg["nTagHistoryTables"]
+    if self.num_tables < 2 or not self.num_tables & (self.num_tables - 1):
+      # The table numbers are $clog2(nTagHistoryTables) bits, which cannot
+      # hold the number of the last table
+      raise ValueError("nTagHistoryTables = %d is not supported by tage.sv" % self.num_tables)
+    if cycles_per_branch < 1:
+      raise ValueError("cycles_per_branch must be at least 1")
+    self.cycles_per_branch = cycles_per_branch
+    self.bht = Bimodal(cfg)
+    self.tables = [None] + [TageComponent(cfg, i) for i in range(1, self.num_tables + 1)]
+    self.lfsr = TageLfsr()
+    self.hist_mask = (1 << cfg["histBufferBits"]) - 1
+    self.path_mask = (1 << cfg["pathHistBits"]) - 1
+    self.u_reset_period = cfg["uResetPeriod"]
+    self.u_reset_ctr_mask = (1 << clog2(self.u_reset_period)) - 1
+    self.use_alt_on_na_bits = cfg["useAltOnNaBits"]
+    self.g_hist = 0
+    self.path_hist = 0
+    self.u_reset_ctr = cfg["initialRstCtrValue"] & self.u_reset_ctr_mask
+    self.rst_us = False
+    self.use_alt_on_na = 0
+
+  def predict(self, pc):
+    g_hist = self.g_hist
+    path_hist = self.path_hist
+    tables = self.tables
+    column = self.column(pc)
+    # (valid, taken, pseudo_new_alloc) of the tables whose tag matches, the
+    # valid bit is not part of the match
+    matches = {}
+    u_is_null = [False] * (self.num_tables + 1)
+    indexes = [0] * (self.num_tables + 1)
+    tags = [0] * (self.num_tables + 1)
+    for i in range(1, self.num_tables + 1):
+      table = tables[i]
+      index = indexes[i] = table.index(pc, g_hist, path_hist)
+      tag = tags[i] = table.compute_tag(pc, g_hist)
+      entry = index * table.instr_per_fetch + column
+      u_is_null[i] = table.u[entry] == 0
+      if table.tag[entry] == tag:
+        ctr = table.ctr[entry]
+        matches[i] = (table.valid[entry], ctr >= 0, ctr == 0 or ctr == -1)
+    bht = self.bht.predict(pc)
+    longest = max(matches) if matches else 0
+    alt = max((i for i in matches if i != longest and i < self.num_tables), default=0)
+    if longest:
+      alt_valid, alt_taken = matches[alt][:2] if alt else bht[:2]
+      longest_valid, longest_taken, pseudo_new_alloc = matches[longest]
+      if self.use_alt_on_na < 0 or not pseudo_new_alloc:
+        valid, taken = longest_valid, longest_taken
+      else:
+        valid, taken = alt_valid, alt_taken
+    else:
+      valid, taken = bht[:2]
+      longest_valid, longest_taken = alt_valid, alt_taken = bht[:2]
+      pseudo_new_alloc = False
+    metadata = (longest, longest_valid, longest_taken, alt, alt_valid, alt_taken,
+                pseudo_new_alloc, u_is_null, indexes, tags)
+    return valid, taken, metadata
+
+  def update(self, pc, taken, metadata, mispredict):
+    (longest, longest_valid, longest_taken, alt, alt_valid, alt_taken,
+     pseudo_new_alloc, u_is_null, indexes, tags) = metadata
+    for _ in range(self.cycles_per_branch - 1):
+      self.clock_idle()
+    num_tables = self.num_tables
+
+    alloc = mispredict if longest < num_tables else False
+    if longest and pseudo_new_alloc:
+      if longest_valid and longest_taken == taken:
+        alloc = False
+      if longest_valid and alt_valid and longest_taken != alt_taken:
+        limit = 1 << (self.use_alt_on_na_bits - 1)
+        if alt_taken == taken:
+          self.use_alt_on_na = min(self.use_alt_on_na + 1, limit - 1)
+        else:
+          self.use_alt_on_na = max(self.use_alt_on_na - 1, -limit)
+    alloc_id = 0
+    if alloc:
+      nrand = self.lfsr.rand()
+      start_id = longest + 1
+      if nrand & 1 and start_id < num_tables:
+        start_id += 1
+        if nrand & 2 and start_id < num_tables:
+          start_id += 1
+      alloc_id = num_tables
+      for i in range(num_tables, start_id - 1, -1):
+        if u_is_null[i]:
+          alloc_id = i
+          break
+
+    doing_u_rst = any(self.tables[i].rst_u_index is not None for i in range(1, num_tables + 1))
+    # u_is_null has no bit 0
+    longest_u_is_null = longest and u_is_null[longest]
+    for i in range(1, num_tables + 1):
+      table = self.tables[i]
+      update = None
+      if i == longest or i == alloc_id or (i == alt and longest_u_is_null):
+        # The ghist and phist of the metadata give the indexes and tags of
+        # the prediction
+        if i == longest:
+          update = (pc, indexes[i], tags[i], taken, False, True, mispredict)
+        else:
+          update = (pc, indexes[i], tags[i], taken, i == alloc_id and alloc, False, False)
+      table.clock(self.rst_us, update)
+    if not longest or (alt == 0 and longest_u_is_null):
+      # tage.sv leaves bht_update.metadata at 0: the bht is updated at row 0
+      self.bht.update(pc, taken, 0, mispredict)
+
+    self.g_hist = ((self.g_hist << 1) | taken) & self.hist_mask
+    self.path_hist = ((self.path_hist << 1) | ((pc >> 2) & 1)) & self.path_mask
+    rst_us = self.u_reset_ctr == self.u_reset_period - 1
+    if not self.rst_us and not doing_u_rst:
+      self.u_reset_ctr = (self.u_reset_ctr + 1) & self.u_reset_ctr_mask
+    self.rst_us = rst_us
+    self.lfsr.clock()
+
+  def clock_idle(self):
+    """A cycle without update"""
+    for i in range(1, self.num_tables + 1):
+      self.tables[i].clock(self.rst_us)
+    self.lfsr.clock()
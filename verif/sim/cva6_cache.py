@@ -0,0 +1,156 @@
+"""
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Content-addressed cache of regression artifacts shared between cva6.py runs
+"""
+
+import hashlib
+import logging
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+
+INCLUDE_RE = re.compile(r'^\s*(?:#\s*include|\.include)\s+["<](?P<file>[^">]+)[">]',
+                        re.MULTILINE)
+
+
+def file_digest(path):
+  """Return the SHA-256 hex digest of the content of a file"""
+  digest = hashlib.sha256()
+  with open(path, 'rb') as f:
+    for chunk in iter(lambda: f.read(1 << 20), b''):
+      digest.update(chunk)
+  return digest.hexdigest()
+
+
+def include_files(src, include_dirs):
+  """Return the files included by a C or assembly source, recursively
+
+  Includes are looked up in the directory of the including file, then in
+  include_dirs. Includes that cannot be found (toolchain headers) are left
+  out, the toolchain version covers them.
+  """
+  found = []
+  seen = set()
+  todo = [src]
+  while todo:
+    path = todo.pop()
+    try:
+      with open(path, 'r', errors='replace') as f:
+        text = f.read()
+    except OSError:
+      continue
+    for name in INCLUDE_RE.findall(text):
+      for inc_dir in [os.path.dirname(path)] + include_dirs:
+        candidate = os.path.normpath(os.path.join(inc_dir, name))
+        if os.path.isfile(candidate):
+          if candidate not in seen:
+            seen.add(candidate)
+            found.append(candidate)
+            todo.append(candidate)
+          break
+  return sorted(found)
+
+
+_tool_versions = {}
+
+def tool_version(tool):
+  """Return the `<tool> --version` output, computed once per tool"""
+  if tool not in _tool_versions:
+    try:
+      version = subprocess.run([tool, "--version"], capture_output=True, text=True)
+      _tool_versions[tool] = version.stdout + version.stderr
+    except OSError:
+      _tool_versions[tool] = ""
+  return _tool_versions[tool]
+
+
+class ArtifactCache:
+  '''Directory of files stored under the hash of everything they depend on
+
+  Each entry is a directory <cache_dir>/<key[:2]>/<key> holding one file per
+  role (e.g. "elf", "bin"). Entries are written to a temporary directory and
+  renamed in place, so concurrent regressions can share a cache.
+  '''
+  def __init__(self, cache_dir):
+    self.cache_dir = os.path.abspath(cache_dir)
+    os.makedirs(self.cache_dir, exist_ok=True)
+
+  def key(self, *parts):
+    '''Hash a list of strings into a cache key'''
+    digest = hashlib.sha256()
+    for part in parts:
+      digest.update(str(part).encode())
+      digest.update(b'\0')
+    return digest.hexdigest()
+
+  def entry_dir(self, key):
+    return os.path.join(self.cache_dir, key[:2], key)
+
+  def fetch(self, key, files):
+    '''Copy a cached entry to the paths given by a role->path dictionary
+
+    Returns True on a hit, False if the entry or one of its roles is missing.
+    '''
+    entry = self.entry_dir(key)
+    if not all(os.path.isfile(os.path.join(entry, role)) for role in files):
+      return False
+    for role, path in files.items():
+      shutil.copyfile(os.path.join(entry, role), path)
+    return True
+
+  def store(self, key, files):
+    '''Store the files of a role->path dictionary under key'''
+    entry = self.entry_dir(key)
+    if os.path.isdir(entry):
+      return
+    os.makedirs(os.path.dirname(entry), exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=os.path.dirname(entry), prefix=".tmp_")
+    try:
+      for role, path in files.items():
+        shutil.copyfile(path, os.path.join(tmp, role))
+      os.rename(tmp, entry)
+    except OSError as err:
+      # Another run stored the same entry first, or a file is missing.
+      logging.debug("Not caching %s: %s" % (key, err))
+      shutil.rmtree(tmp, ignore_errors=True)
+
+  def compile_key(self, cmd, src, out, tools=()):
+    '''Key of a compilation command line
+
+    The key covers the source and every other file of the command line (e.g.
+    crt.S, syscalls.c or a linker script), the files they include, the
+    version of the compiler (and of any extra tools run on its output) and
+    the command line with the source and output paths left out.
+    '''
+    args = cmd.split()
+    include_dirs = [arg[2:] for arg in args if arg.startswith("-I") and len(arg) > 2]
+    include_dirs += [path for (flag, path) in zip(args, args[1:]) if flag == "-I"]
+    linker_scripts = [arg[2:] for arg in args if arg.startswith("-T") and len(arg) > 2]
+    sources = [src] + [arg for arg in args[1:] if arg not in (src, out) and os.path.isfile(arg)]
+    command = " ".join("<src>" if arg == src else "<out>" if arg == out else arg
+                       for arg in args)
+    parts = ["compile", command]
+    for tool in (args[0],) + tuple(tools):
+      parts += [tool, tool_version(tool)]
+    inputs = sources + linker_scripts
+    for path in sources:
+      inputs += include_files(path, include_dirs)
+    seen = set()
+    for path in inputs:
+      if path not in seen and os.path.isfile(path):
+        seen.add(path)
+        parts += ["<src>" if path == src else path, file_digest(path)]
+    return self.key(*parts)
@@ -0,0 +1,211 @@
+"""
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Selection of the tests that can see the changes made since a git revision,
+used by cva6.py --since
+"""
+
+import fnmatch
+import logging
+import os
+import re
+import subprocess
+
+import yaml
+
+from cva6_cache import include_files
+
+FLIST_VAR_RE = re.compile(r'\$\{(\w+)\}')
+
+# Files that never reach a simulation
+NON_SIM_PATTERNS = ["docs/*", "pd/*", "spyglass/*", "stats_bp*/*", ".github/*",
+                    "*.md", "*.rst", "LICENSE*", "CITATION.cff", "CODEOWNERS"]
+
+# Directories holding the RTL of the core, of which only the files listed in
+# the Flist of the target are simulated
+RTL_DIRS = ["core/", "vendor/", "common/"]
+
+
+def git(repo_dir, *args):
+  """Run a git command in repo_dir and return its standard output"""
+  return subprocess.run(["git", "-C", repo_dir] + list(args), check=True,
+                        capture_output=True, text=True).stdout
+
+
+def changed_files(repo_dir, since):
+  """Return the files changed since a revision, relative to the top of the repository
+
+  Changes in the working tree count, committed or not. Untracked files do
+  not, since the regression outputs are untracked: a new test has no previous
+  results and is run anyway.
+  """
+  return git(repo_dir, "diff", "--name-only", since, "--").split()
+
+
+def read_flist(flist, env, files=None, incdirs=None, flists=None):
+  """Return the files and include directories listed in a Flist
+
+  ${VAR} references are expanded from env, and -F/-f includes are followed.
+  Paths are returned as given after expansion, normalized. The paths of the
+  Flist and of its includes, found or not, are added to flists if given.
+  """
+  if files is None:
+    files, incdirs = set(), set()
+  if flists is not None:
+    flists.add(os.path.normpath(flist))
+  with open(flist, 'r') as f:
+    for line in f:
+      line = line.split("//")[0].strip()
+      if not line or line.startswith('#'):
+        continue
+      line = FLIST_VAR_RE.sub(lambda m: env.get(m.group(1), m.group(0)), line)
+      if line.startswith("+incdir+"):
+        incdirs.add(os.path.normpath(line[len("+incdir+"):]))
+      elif line.startswith("-F ") or line.startswith("-f "):
+        sub_flist = os.path.join(os.path.dirname(flist), line[3:].strip())
+        if os.path.isfile(sub_flist):
+          read_flist(sub_flist, env, files, incdirs, flists)
+        else:
+          logging.warning("Cannot find %s included from %s" % (sub_flist, flist))
+          if flists is not None:
+            flists.add(os.path.normpath(sub_flist))
+      elif not line.startswith("+"):
+        files.add(os.path.normpath(line))
+  return files, incdirs
+
+
+def testlist_entries(text):
+  """Return the test entries of a testlist as a test name -> entry dictionary"""
+  yaml_data = yaml.safe_load(text) or []
+  if isinstance(yaml_data, dict):
+    yaml_data = yaml_data.get('testlist', [])
+  return {entry['test']: entry for entry in yaml_data if 'test' in entry}
+
+
+def testlist_files(testlist, riscv_dv_root):
+  """Return a testlist and the testlists it imports"""
+  found = [testlist]
+  with open(testlist, 'r') as f:
+    yaml_data = yaml.safe_load(f) or []
+  if isinstance(yaml_data, dict):
+    yaml_data = yaml_data.get('testlist', [])
+  for entry in yaml_data:
+    if 'import' in entry:
+      sub_list = re.sub('<riscv_dv_root>', riscv_dv_root, entry['import'])
+      found += testlist_files(sub_list, riscv_dv_root)
+  return found
+
+
+def changed_testlist_entries(repo_dir, since, testlist):
+  """Return the names of the tests added or modified in a testlist since a revision"""
+  path = os.path.relpath(os.path.realpath(testlist), repo_dir)
+  try:
+    old_entries = testlist_entries(git(repo_dir, "show", "%s:%s" % (since, path)))
+  except subprocess.CalledProcessError:
+    old_entries = {}
+  with open(testlist, 'r') as f:
+    new_entries = testlist_entries(f)
+  return {name for name, entry in new_entries.items() if old_entries.get(name) != entry}
+
+
+def test_sources(test):
+  """Return the source of a directed test and the files it includes"""
+  src = test.get('asm_tests') or test.get('c_tests')
+  if not src:
+    return []
+  src = os.path.expanduser(src)
+  include_dirs = [arg[2:] for arg in test.get('gcc_opts', '').split() if arg.startswith("-I")]
+  return [src] + include_files(src, include_dirs)
+
+
+def affected_tests(since, test_list, testlist, target_cfgs, riscv_dv_root):
+  """Return the names of the tests that can see the changes since a revision
+
+  A change in the RTL compiled for the target (the files of core/Flist.cva6
+  and of the testbench Flist with TARGET_CFG set to the target, and the files
+  of their include directories) reaches every test, as does a change in these
+  Flists or their includes, and in the simulation flow itself (verif/, the ISS configurations, the tool
+  installation scripts). RTL of other targets, e.g. their config_pkg, does
+  not reach any test. Within a testlist, only the added or modified entries
+  are affected, and a directed test is affected by changes in its source and
+  in the files it includes.
+
+  Tests whose `needs:` do not match the configuration are already filtered
+  out of test_list, so they are never selected; tests that a config_pkg change
+  makes runnable have no previous results and are run by the caller.
+
+  Args:
+    since         : Git revision to compare the working tree against
+    test_list     : Test entries that may be run
+    testlist      : Testlist the entries come from
+    target_cfgs   : Names of the <cfg>_config_pkg.sv the target is built from
+    riscv_dv_root : Value of <riscv_dv_root> in testlist imports
+
+  Returns:
+    affected      : Set of test names, or None if every test is affected
+  """
+  cwd = os.path.dirname(os.path.realpath(__file__))
+  repo_dir = git(cwd, "rev-parse", "--show-toplevel").strip()
+  changed = changed_files(repo_dir, since)
+  logging.info("%d files changed since %s" % (len(changed), since))
+
+  rtl_files, incdirs, flists = set(), set(), set()
+  env = dict(os.environ)
+  env.setdefault("CVA6_REPO_DIR", repo_dir)
+  env.setdefault("CVA6_TB_DIR", os.path.join(repo_dir, "verif/tb/core"))
+  env.setdefault("HPDCACHE_DIR", os.path.join(repo_dir, "core/cache_subsystem/hpdcache"))
+  for target_cfg in target_cfgs:
+    env["TARGET_CFG"] = target_cfg
+    for flist in ["core/Flist.cva6", "verif/tb/core/Flist.cva6_tb"]:
+      read_flist(os.path.join(repo_dir, flist), env, rtl_files, incdirs, flists)
+  missing = sorted(path for path in flists if not os.path.isfile(path))
+  if missing:
+    # The RTL they list is unknown
+    logging.info("Cannot read %s, running all tests" % ", ".join(missing))
+    return None
+  rtl_files = {os.path.relpath(path, repo_dir) for path in rtl_files}
+  flists = {os.path.relpath(path, repo_dir) for path in flists}
+  incdirs = {os.path.relpath(path, repo_dir) for path in incdirs}
+
+  testlists = {os.path.relpath(os.path.realpath(path), repo_dir): path
+               for path in testlist_files(testlist, riscv_dv_root)}
+  sources = {}
+  for test in test_list:
+    for src in test_sources(test):
+      sources.setdefault(os.path.relpath(os.path.realpath(src), repo_dir), set()).add(test['test'])
+
+  affected = set()
+  for path in changed:
+    if path in testlists:
+      names = changed_testlist_entries(repo_dir, since, testlists[path])
+      logging.info("%s: %d tests changed" % (path, len(names)))
+      affected |= names
+    elif path in sources:
+      affected |= sources[path]
+    elif path in flists:
+      logging.info("%s lists the simulated RTL, running all tests" % path)
+      return None
+    elif path in rtl_files or (os.path.dirname(path) in incdirs and not path.endswith(".sv")):
+      logging.info("%s is simulated, running all tests" % path)
+      return None
+    elif any(path.startswith(rtl_dir) for rtl_dir in RTL_DIRS):
+      logging.debug("%s is not simulated for %s" % (path, ",".join(target_cfgs)))
+    elif any(fnmatch.fnmatch(path, pattern) for pattern in NON_SIM_PATTERNS):
+      logging.debug("%s is not used by the simulation" % path)
+    elif path.startswith("verif/tests/") and path.endswith((".yaml", ".S", ".c")):
+      # Other testlists and sources of tests that are not selected
+      logging.debug("%s is not used by the selected tests" % path)
+    else:
+      logging.info("%s may change every simulation, running all tests" % path)
+      return None
+  return affected
@@ -0,0 +1,345 @@
+"""
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Worker pool and streaming pipeline used by cva6.py to run independent
+regression steps in parallel
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cva6_cache import file_digest
+
+
+class Job:
+  '''One independent unit of regression work, e.g. a (test, iteration, ISS)
+
+  outputs lists the files the job produces. Only jobs with outputs are
+  recorded in a Journal, and skipped when resuming. A function returning
+  False did not complete (e.g. a simulation timed out, leaving a truncated
+  log), and its job is not recorded.
+  '''
+  def __init__(self, name, func, *args, **kwargs):
+    self.name = name
+    self.func = func
+    self.args = args
+    self.kwargs = kwargs
+    self.outputs = []
+
+  @property
+  def unit(self):
+    '''Name of the job in a Journal, unique across the regression steps'''
+    return "%s:%s" % (self.func.__name__, self.name)
+
+  def run(self):
+    return self.func(*self.args, **self.kwargs)
+
+
+class RuntimeHistory:
+  '''Runtime of each job in previous regressions, kept in a JSON file
+
+  Jobs are identified by their name, e.g. "veri-testharness:riscv_arithmetic_basic_test_0".
+  Only the last measured runtime of a job is kept.
+  '''
+  def __init__(self, path):
+    self.path = path
+    self.runtimes = {}
+    self.lock = threading.Lock()
+    if os.path.isfile(path):
+      try:
+        with open(path, 'r') as f:
+          self.runtimes = json.load(f)
+      except (OSError, ValueError):
+        logging.warning("Ignoring unreadable runtime history %s" % path)
+
+  def get(self, name):
+    return self.runtimes.get(name)
+
+  def record(self, name, seconds):
+    with self.lock:
+      self.runtimes[name] = round(seconds, 3)
+
+  def save(self):
+    with self.lock:
+      tmp = self.path + ".tmp"
+      with open(tmp, 'w') as f:
+        json.dump(self.runtimes, f, indent=1, sort_keys=True)
+      os.replace(tmp, self.path)
+
+  def estimate(self, names):
+    '''Expected runtime of the jobs in names, None if none of them ran before'''
+    known = [self.runtimes[name] for name in names if name in self.runtimes]
+    return sum(known) if known else None
+
+  def order(self, items, names=lambda job: [job.name]):
+    '''Sort items longest first by the runtime of their jobs
+
+    Items without any history come first, since they may be long, and keep
+    their original (test list) order, as do items with equal runtimes.
+    '''
+    def key(item):
+      runtime = self.estimate(names(item))
+      return float('inf') if runtime is None else runtime
+    return sorted(items, key=key, reverse=True)
+
+  def shortest(self, jobs):
+    '''Job expected to be the shortest, the first job if there is no history'''
+    known = [job for job in jobs if job.name in self.runtimes]
+    if not known:
+      return jobs[0]
+    return min(known, key=lambda job: self.runtimes[job.name])
+
+
+class Journal:
+  '''Record of the regression units completed in an output directory
+
+  Each line of the journal file is a JSON object giving the name of a unit
+  (e.g. "0:iss_sim_test:spike:riscv_arithmetic_basic_test_0") and the SHA-256
+  digest of each of its output files. Lines are appended and synced as units
+  complete, so the journal survives a killed regression. When resuming, a
+  unit is done if it is in the journal and its outputs are unchanged.
+
+  Unit names start with the --gen_sv_seed iteration: each iteration writes
+  the same output files from new tests, and its units are distinct from the
+  ones of the previous iterations.
+  '''
+  def __init__(self, path, resume=False):
+    self.path = path
+    self.iteration = 0
+    self.units = {}
+    self.checked = {}
+    self.lock = threading.Lock()
+    if not resume:
+      if os.path.isfile(path):
+        os.remove(path)
+      return
+    if os.path.isfile(path):
+      with open(path, 'r') as f:
+        for line in f:
+          try:
+            record = json.loads(line)
+          except ValueError:
+            # Last line cut short by the end of the previous run
+            continue
+          self.units[record["unit"]] = record["outputs"]
+    logging.info("Resuming from %d completed units in %s" % (len(self.units), path))
+
+  def key(self, unit):
+    '''Return the name of unit in the current iteration'''
+    return "%d:%s" % (self.iteration, unit)
+
+  def done(self, unit, outputs):
+    '''Return True if unit completed in a previous run and outputs are unchanged'''
+    unit = self.key(unit)
+    with self.lock:
+      if unit in self.checked:
+        return self.checked[unit]
+      digests = self.units.get(unit)
+      done = (digests is not None and sorted(digests) == sorted(outputs) and
+              all(os.path.isfile(path) and file_digest(path) == digest
+                  for path, digest in digests.items()))
+      self.checked[unit] = done
+      return done
+
+  def record(self, unit, outputs):
+    '''Record unit as completed, unless one of its outputs is missing'''
+    if not all(os.path.isfile(path) for path in outputs):
+      logging.debug("Not recording %s: missing outputs" % unit)
+      return
+    unit = self.key(unit)
+    digests = {path: file_digest(path) for path in outputs}
+    line = json.dumps({"unit": unit, "outputs": digests})
+    with self.lock:
+      self.units[unit] = digests
+      self.checked.pop(unit, None)
+      with open(self.path, 'a') as f:
+        f.write(line + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def run_job(job, history=None, journal=None):
+  """Run a job, recording its runtime in history if given
+
+  With a Journal, a job with outputs is skipped if it completed in a previous
+  run, and recorded once it completes, unless it returns False. A skipped
+  job returns None.
+  """
+  use_journal = journal is not None and job.outputs
+  if use_journal and journal.done(job.unit, job.outputs):
+    logging.info("Skipping %s, completed in a previous run" % job.unit)
+    return None
+  start = time.time()
+  result = job.run()
+  if history is not None:
+    history.record(job.name, time.time() - start)
+  if use_journal and result is not False:
+    journal.record(job.unit, job.outputs)
+  return result
+
+
+def run_jobs(jobs, num_jobs=1, history=None, journal=None):
+  """Run a list of jobs with at most num_jobs of them in flight
+
+  Every job spends its time waiting on a child process (gcc, objcopy, an ISS
+  or an RTL simulator), so worker threads are enough to keep num_jobs cores
+  busy, and they share the option globals set up by cva6.py main().
+
+  With a RuntimeHistory, the jobs that took longest in previous runs are
+  started first, so that a long test does not start last and set the
+  wall-clock time of the regression.
+
+  Args:
+    jobs     : List of Job objects
+    num_jobs : Number of workers, jobs run one at a time in list order if <= 1
+    history  : RuntimeHistory used to order the jobs and updated with their runtimes
+    journal  : Journal used to skip the jobs completed in a previous run
+
+  Returns:
+    results  : Return values of the jobs, in the same order as jobs
+  """
+  try:
+    if num_jobs <= 1 or len(jobs) <= 1:
+      return [run_job(job, history, journal) for job in jobs]
+
+    logging.info("Running %d jobs on %d workers" % (len(jobs), num_jobs))
+    order = list(range(len(jobs)))
+    if history is not None:
+      order = history.order(order, lambda i: [jobs[i].name])
+    pool = ThreadPoolExecutor(max_workers=num_jobs)
+    try:
+      futures = {}
+      for i in order:
+        futures[i] = pool.submit(run_job, jobs[i], history, journal)
+      # Collect in list order so that the caller sees a stable result
+      # order whatever order the jobs finished in.
+      results = [futures[i].result() for i in range(len(jobs))]
+    except BaseException:
+      # A job called sys.exit() or the user hit Ctrl-C: drop the queued jobs
+      # and let the running ones finish their current command.
+      pool.shutdown(wait=False, cancel_futures=True)
+      raise
+    pool.shutdown()
+    return results
+  finally:
+    if history is not None:
+      history.save()
+
+
+class Stage:
+  '''A pipeline step: func maps one item to the list of items for the next step'''
+  def __init__(self, name, func, workers=1):
+    self.name = name
+    self.func = func
+    self.workers = max(1, workers)
+
+
+# Marks the end of the items in a pipeline queue
+_END = object()
+
+
+def _put(q, item, abort):
+  """Put item in a bounded queue, giving up if the pipeline is aborted"""
+  while not abort.is_set():
+    try:
+      q.put(item, timeout=0.1)
+      return True
+    except queue.Full:
+      continue
+  return False
+
+
+def run_pipeline(items, stages, queue_size=1):
+  """Stream items through a list of stages connected by bounded queues
+
+  An item enters stage N+1 as soon as stage N is done with it, so the stages
+  overlap instead of acting as barriers. A full queue blocks the stage that
+  feeds it, which keeps a fast stage from running far ahead of a slow one.
+  The first exception raised by a stage stops the whole pipeline and is
+  raised again here.
+
+  Args:
+    items      : Items fed to the first stage
+    stages     : List of Stage objects
+    queue_size : Capacity of each queue between two stages
+
+  Returns:
+    results    : Items returned by the last stage, in completion order
+  """
+  queues = [queue.Queue(maxsize=queue_size) for stage in stages]
+  remaining = [stage.workers for stage in stages]
+  results = []
+  errors = []
+  lock = threading.Lock()
+  abort = threading.Event()
+
+  def feed():
+    for item in items:
+      if not _put(queues[0], item, abort):
+        return
+    for i in range(stages[0].workers):
+      _put(queues[0], _END, abort)
+
+  def work(k):
+    stage = stages[k]
+    last_stage = k == len(stages) - 1
+    try:
+      while not abort.is_set():
+        try:
+          item = queues[k].get(timeout=0.1)
+        except queue.Empty:
+          continue
+        if item is _END:
+          break
+        for out in stage.func(item):
+          if last_stage:
+            with lock:
+              results.append(out)
+          elif not _put(queues[k + 1], out, abort):
+            return
+    except BaseException as err:
+      logging.error("Pipeline stage %s failed" % stage.name)
+      with lock:
+        errors.append(err)
+      abort.set()
+      return
+    with lock:
+      remaining[k] -= 1
+      stage_done = remaining[k] == 0
+    # The last worker out of a stage closes the queue of the next one.
+    if stage_done and not last_stage:
+      for i in range(stages[k + 1].workers):
+        _put(queues[k + 1], _END, abort)
+
+  threads = [threading.Thread(target=feed, daemon=True)]
+  for k, stage in enumerate(stages):
+    for i in range(stage.workers):
+      threads.append(threading.Thread(target=work, args=(k,), daemon=True,
+                                      name="%s-%d" % (stage.name, i)))
+  for thread in threads:
+    thread.start()
+  try:
+    for thread in threads:
+      while thread.is_alive():
+        thread.join(0.5)
+  except BaseException:
+    abort.set()
+    raise
+  if errors:
+    raise errors[0]
+  return results
@@ -26,6 +26,8 @@ sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
 
 from riscv_trace_csv import *
 from lib import *
+from cva6_trace_entry import GPR_CACHE_SIZE, entry_decoder
+from cva6_trace_io import open_log, read_lines, marker_lines, line_end, chunk_starts, convert_chunks
 
 RD_RE = re.compile(r"(core\s+\d+:\s+)?(?P<pri>\d) 0x(?P<addr>[a-f0-9]+?) " \
                    "\((?P<bin>.*?)\)(( c\S* 0x[a-f0-9]+)*) (?P<reg>[xf]\s*\d*?)\s*0x(?P<val>[a-f0-9]+)")
@@ -35,6 +37,10 @@ CORE_RE = re.compile(
 ADDR_RE = re.compile(
     r"(?P<rd>[a-z0-9]+?),(?P<imm>[\-0-9]+?)\((?P<rs1>[a-z0-9]+)\)")
 ILLE_RE = re.compile(r"trap_illegal_instruction")
+START_TRAMPOLINE_RE = re.compile(r'core.*: 0x0*10000 ')
+END_TRAMPOLINE_RE = re.compile(r'core.*: 0x0*10010 ')
+DIGITS = "0123456789"
+HEX_DIGITS = "0123456789abcdef"
 
 LOGGER = logging.getLogger()
 
@@ -66,17 +72,22 @@ def read_spike_instr(match, full_trace):
     instruction.
 
     """
-    # Extract the disassembled instruction.
-    disasm = match.group('instr')
+    return make_spike_instr(match.group('addr'), match.group('bin'),
+                            match.group('instr'), full_trace)
+
+
+def make_spike_instr(addr, binary, disasm, full_trace):
+    """Build the RiscvInstructionTraceEntry of the CORE_RE groups of a line"""
 
     # Spike's disassembler shows a relative jump as something like "j pc +
     # 0x123" or "j pc - 0x123". We just want the relative offset.
-    disasm = disasm.replace('pc + ', '').replace('pc - ', '-')
+    if 'pc ' in disasm:
+        disasm = disasm.replace('pc + ', '').replace('pc - ', '-')
 
     instr = RiscvInstructionTraceEntry()
-    instr.pc = match.group('addr')
+    instr.pc = addr
     instr.instr_str = disasm
-    instr.binary = match.group('bin')
+    instr.binary = binary
     if full_trace:
         opcode = disasm.split(' ')[0]
         operand = disasm[len(opcode):].replace(' ', '')
@@ -88,7 +99,79 @@ def read_spike_instr(match, full_trace):
     return instr
 
 
-def read_spike_trace(path, full_trace):
+def split_core_prefix(line):
+    """Return the index following the "core<spaces><id>:<spaces>" prefix of a
+    line, as matched by CORE_RE and RD_RE, or -1 if the line has none"""
+    colon = line.find(":", 4)
+    core_id = line[4:colon]
+    number = core_id.lstrip()
+    if colon < 0 or number == core_id or not number.isdecimal():
+        return -1
+    text = line[colon + 1:].lstrip()
+    if len(text) == len(line) - colon - 1:
+        return -1
+    return len(line) - len(text)
+
+
+def match_spike_instr(line):
+    """Return the (addr, bin, instr) groups of CORE_RE.match(line), or None
+
+    The groups are found without the regular expression: after the prefix,
+    the lazy groups stop at the first " (0x", at the first ") " after it and
+    at the end of the line.
+
+    """
+    if not line.startswith("core"):
+        return None
+    addr_start = split_core_prefix(line) + 2
+    if addr_start < 2 or not line.startswith("0x", addr_start - 2):
+        return None
+    bin_start = line.find(" (0x", addr_start)
+    bin_end = line.find(") ", bin_start + 4)
+    addr = line[addr_start:bin_start]
+    if bin_start <= addr_start or addr.strip(HEX_DIGITS) or bin_end < 0:
+        return None
+    disasm = line[bin_end + 2:]
+    if disasm[-1:] == "\n":
+        disasm = disasm[:-1]
+    return addr, line[bin_start + 4:bin_end], disasm
+
+
+def match_spike_commit(line):
+    """Return the (pri, reg, val) groups of RD_RE.match(line), or None
+
+    The usual "core   0: <pri> 0x<pc> (0x<bin>) x<n> 0x<val>" lines are split
+    without the regular expression, the others go through RD_RE.
+
+    """
+    start = split_core_prefix(line) if line.startswith("core") else 0
+    if start >= 0 and line[start:start + 1].isdecimal() and \
+            line.startswith(" 0x", start + 1):
+        addr_end = line.find(" (", start + 4)
+        bin_end = line.find(")", addr_end + 2)
+        if addr_end > start + 4 and bin_end > 0 and \
+                not line[start + 4:addr_end].strip(HEX_DIGITS):
+            after = line[bin_end + 1:bin_end + 3]
+            if after == " x" or after == " f":
+                # [xf]\s*\d*?\s*0x: the whole register number, then spaces
+                tail = line[bin_end + 3:]
+                number = tail.lstrip()
+                digits = len(number) - len(number.lstrip(DIGITS))
+                value = number[digits:].lstrip()
+                if digits and value.startswith("0x") and \
+                        len(value) < len(number) - digits:
+                    val = value[2:len(value) - len(value[2:].lstrip(HEX_DIGITS))]
+                    if val:
+                        reg = tail[:len(tail) - len(number) + digits]
+                        return line[start], after[1] + reg, val
+            elif after != " c" and line.find(")", bin_end + 1) < 0:
+                # No other end for the (bin) group, e.g. a "mem" line
+                return None
+    match = RD_RE.match(line)
+    return match and match.group('pri', 'reg', 'val')
+
+
+def read_spike_trace(path, full_trace, engine="fast"):
     """Read a Spike simulation log at <path>, yielding executed instructions.
 
     This assumes that the log was generated with the -l and --log-commits options
@@ -106,6 +189,22 @@ def read_spike_trace(path, full_trace):
     (entry, illegal). entry is a RiscvInstructionTraceEntry. illegal is a
     boolean, which is true if the instruction caused an illegal instruction trap.
 
+    engine selects parse_spike_trace_fast ("fast") or the reference
+    parse_spike_trace ("regex"), which yield the same entries.
+
+    """
+    if engine == "regex":
+        with open_log(path, 'r') as handle:
+            yield from parse_spike_trace(handle, full_trace)
+    else:
+        yield from parse_spike_trace_fast(read_lines(path), full_trace)
+
+
+def parse_spike_trace(lines, full_trace):
+    """Parse the lines of a Spike simulation log, as read_spike_trace
+
+    lines can be any iterable of lines.
+
     """
 
     # This loop is a simple FSM with states TRAMPOLINE, INSTR, EFFECT. The idea
@@ -127,82 +226,188 @@ def read_spike_trace(path, full_trace):
     in_trampoline = False
     instr = None
 
-    with open(path, 'r') as handle:
-        for line in handle:
-            if in_trampoline:
-                # The TRAMPOLINE state
-                if end_trampoline_re.match(line):
-                    in_trampoline = False
-                continue
-            elif start_trampoline_re.match(line):
-                in_trampoline = True
+    for line in lines:
+        if in_trampoline:
+            # The TRAMPOLINE state
+            if end_trampoline_re.match(line):
+                in_trampoline = False
+            continue
+        elif start_trampoline_re.match(line):
+            in_trampoline = True
+            continue
+
+        if instr is None:
+            # The INSTR state. We expect to see a line matching CORE_RE.
+            # We'll discard any other lines.
+            instr_match = CORE_RE.match(line)
+            if not instr_match:
                 continue
 
-            if instr is None:
-                # The INSTR state. We expect to see a line matching CORE_RE.
-                # We'll discard any other lines.
-                instr_match = CORE_RE.match(line)
-                if not instr_match:
-                    continue
+            instr = read_spike_instr(instr_match, full_trace)
+
+            # If instr.instr_str is 'ecall', we should stop.
+            if instr.instr_str == 'ecall':
+                break
+
+            continue
+
+        # The EFFECT state. If the line matches CORE_RE, we should have been in
+        # state INSTR, so we yield the instruction we had, read the new
+        # instruction and continue. As above, if the new instruction is 'ecall',
+        # we need to stop immediately.
+        instr_match = CORE_RE.match(line)
+        if instr_match:
+            yield instr, False
+            instr = read_spike_instr(instr_match, full_trace)
+            if instr.instr_str == 'ecall':
+                break
+            continue
+
+        # The line doesn't match CORE_RE, so we are definitely on a follow-on
+        # line in the log. First, check for illegal instructions
+        if 'trap_illegal_instruction' in line:
+            yield (instr, True)
+            instr = None
+            continue
+
+        # The instruction seems to have been fine. Do we have commit data (from
+        # the --log-commits Spike option)?
+        commit_match = RD_RE.match(line)
+        if commit_match:
+            instr.gpr.append(gpr_to_abi(commit_match.group('reg')
+                                        .replace(' ', '')) +
+                             ':' + commit_match.group('val'))
+            instr.mode = commit_match.group('pri')
+
+    # At EOF, we might have an instruction in hand. Yield it if so.
+    if instr is not None:
+        yield (instr, False)
+
+
+def parse_spike_trace_fast(lines, full_trace):
+    """Parse the lines of a Spike simulation log, as parse_spike_trace
+
+    This is the same state machine, yielding the same entries, without most
+    of its per-line regular expressions: the trampoline regexes only see the
+    lines holding their PC, the instruction and commit lines are split by
+    match_spike_instr and match_spike_commit, and the ABI name of each
+    register is only looked up once. The entries are compact TraceEntry
+    objects, see entry_decoder, and the "abi:value" gpr strings of repeated
+    register writes are shared.
 
-                instr = read_spike_instr(instr_match, full_trace)
+    """
+    abi_prefixes = {}
+    gpr_writes = {}
+    new_instr = entry_decoder(make_spike_instr, full_trace)
 
-                # If instr.instr_str is 'ecall', we should stop.
-                if instr.instr_str == 'ecall':
-                    break
+    in_trampoline = False
+    instr = None
 
+    for line in lines:
+        is_core = line.startswith("core")
+        if in_trampoline:
+            # The TRAMPOLINE state
+            if is_core and "10010 " in line and END_TRAMPOLINE_RE.match(line):
+                in_trampoline = False
+            continue
+        elif is_core and "10000 " in line and START_TRAMPOLINE_RE.match(line):
+            in_trampoline = True
+            continue
+
+        groups = match_spike_instr(line) if is_core else None
+        if instr is None:
+            # The INSTR state
+            if not groups:
                 continue
+            instr = new_instr(*groups)
+            if instr.instr_str == 'ecall':
+                break
+            continue
+
+        # The EFFECT state
+        if groups:
+            yield instr, False
+            instr = new_instr(*groups)
+            if instr.instr_str == 'ecall':
+                break
+            continue
+
+        if 'trap_illegal_instruction' in line:
+            yield (instr, True)
+            instr = None
+            continue
+
+        if is_core or line[:1].isdecimal():
+            groups = match_spike_commit(line)
+            if groups:
+                pri, reg, val = groups
+                gpr = gpr_writes.get((reg, val))
+                if gpr is None:
+                    abi = abi_prefixes.get(reg)
+                    if abi is None:
+                        abi = abi_prefixes[reg] = gpr_to_abi(reg.replace(' ', '')) + ':'
+                    if len(gpr_writes) >= GPR_CACHE_SIZE:
+                        gpr_writes.clear()
+                    gpr = gpr_writes[(reg, val)] = abi + val
+                instr.gpr.append(gpr)
+                instr.mode = pri
+
+    # At EOF, we might have an instruction in hand. Yield it if so.
+    if instr is not None:
+        yield (instr, False)
+
+
+def spike_chunk_starts(data, num_chunks):
+    """Split the content of a Spike log for chunk_starts
+
+    The state of parse_spike_trace_fast only changes at the start and end of
+    the trampoline, which are found without parsing the other lines. A chunk
+    starts at an instruction line out of the trampoline.
 
-            # The EFFECT state. If the line matches CORE_RE, we should have been in
-            # state INSTR, so we yield the instruction we had, read the new
-            # instruction and continue. As above, if the new instruction is 'ecall',
-            # we need to stop immediately.
-            instr_match = CORE_RE.match(line)
-            if instr_match:
-                yield instr, False
-                instr = read_spike_instr(instr_match, full_trace)
-                if instr.instr_str == 'ecall':
-                    break
-                continue
+    """
+    changes = []
+    in_trampoline = False
+    for offset in marker_lines(data, [b"10000 ", b"10010 "]):
+        end = line_end(data, offset)
+        line = data[offset:end].decode(errors='replace')
+        if in_trampoline:
+            if END_TRAMPOLINE_RE.match(line):
+                in_trampoline = False
+                changes.append((end + 1, True))
+        elif START_TRAMPOLINE_RE.match(line):
+            in_trampoline = True
+            changes.append((offset, False))
 
-            # The line doesn't match CORE_RE, so we are definitely on a follow-on
-            # line in the log. First, check for illegal instructions
-            if 'trap_illegal_instruction' in line:
-                yield (instr, True)
-                instr = None
-                continue
+    def is_start(line):
+        return match_spike_instr(line) is not None and \
+            not START_TRAMPOLINE_RE.match(line)
 
-            # The instruction seems to have been fine. Do we have commit data (from
-            # the --log-commits Spike option)?
-            commit_match = RD_RE.match(line)
-            if commit_match:
-                instr.gpr.append(gpr_to_abi(commit_match.group('reg')
-                                            .replace(' ', '')) +
-                                 ':' + commit_match.group('val'))
-                instr.mode = commit_match.group('pri')
+    return chunk_starts(data, num_chunks, True, changes, is_start)
 
-        # At EOF, we might have an instruction in hand. Yield it if so.
-        if instr is not None:
-            yield (instr, False)
 
+def convert_spike_chunk(spike_log, start, end, csv, index, full_trace):
+    """Convert the bytes [start, end) of a Spike log for convert_chunks"""
+    lines = read_lines(spike_log, start=start, end=end)
+    return write_spike_csv(parse_spike_trace_fast(lines, full_trace), csv,
+                           full_trace)
 
-def process_spike_sim_log(spike_log, csv, full_trace=0):
-    """Process SPIKE simulation log.
 
-    Extract instruction and affected register information from spike simulation
-    log and write the results to a CSV file at csv. Returns the number of
-    instructions written.
+def write_spike_csv(trace, csv, full_trace):
+    """Write the instructions of a trace with an architectural update to a CSV file
+
+    Returns the numbers of instructions read and written, and whether the
+    trace stopped at an ecall.
 
     """
-    logging.info("Processing spike log : {}".format(spike_log))
     instrs_in = 0
     instrs_out = 0
+    entry = None
 
-    with open(csv, "w") as csv_fd:
+    with open_log(csv, "w") as csv_fd:
         trace_csv = RiscvInstructionTraceCsv(csv_fd)
         trace_csv.start_new_trace()
 
-        for (entry, illegal) in read_spike_trace(spike_log, full_trace):
+        for (entry, illegal) in trace:
             instrs_in += 1
             if illegal and full_trace:
                 logging.debug("Illegal instruction: {}, opcode:{}"
@@ -221,6 +426,30 @@ def process_spike_sim_log(spike_log, csv, full_trace=0):
             trace_csv.write_trace_entry(entry)
             instrs_out += 1
 
+    return instrs_in, instrs_out, \
+        entry is not None and entry.instr_str == 'ecall'
+
+
+def process_spike_sim_log(spike_log, csv, full_trace=0, num_jobs=1):
+    """Process SPIKE simulation log.
+
+    Extract instruction and affected register information from spike simulation
+    log and write the results to a CSV file at csv. Returns the number of
+    instructions written.
+
+    With num_jobs > 1, large logs are converted in parallel chunks.
+
+    """
+    logging.info("Processing spike log : {}".format(spike_log))
+
+    if num_jobs > 1:
+        instrs_in, instrs_out = convert_chunks(spike_log, csv, num_jobs,
+                                               spike_chunk_starts,
+                                               convert_spike_chunk, full_trace)
+    else:
+        trace = read_spike_trace(spike_log, full_trace)
+        instrs_in, instrs_out, _ = write_spike_csv(trace, csv, full_trace)
+
     logging.info("Processed instruction count : {}".format(instrs_in))
     logging.info("CSV saved to : {}".format(csv))
     return instrs_out
@@ -229,19 +458,21 @@ def process_spike_sim_log(spike_log, csv, full_trace=0):
 def main():
     # Parse input arguments
     parser = argparse.ArgumentParser()
-    parser.add_argument("--log", type=str, help="Input spike simulation log")
-    parser.add_argument("--csv", type=str, help="Output trace csv_buf file")
+    parser.add_argument("--log", type=str, help="Input spike simulation log, possibly .gz/.zst/.xz compressed")
+    parser.add_argument("--csv", type=str, help="Output trace csv_buf file, compressed if it ends in .gz/.zst/.xz")
     parser.add_argument("-f", "--full_trace", dest="full_trace",
                         action="store_true",
                         help="Generate the full trace")
     parser.add_argument("-v", "--verbose", dest="verbose", action="store_true",
                         help="Verbose logging")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Number of processes converting chunks of the log")
     parser.set_defaults(full_trace=False)
     parser.set_defaults(verbose=False)
     args = parser.parse_args()
     setup_logging(args.verbose)
     # Process spike log
-    process_spike_sim_log(args.log, args.csv, args.full_trace)
+    process_spike_sim_log(args.log, args.csv, args.full_trace, args.jobs)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,117 @@
+"""
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Benchmark of the "regex" and "fast" engines of read_spike_trace and
+read_verilator_trace
+
+Both engines read the same log, their entry streams are checked to be
+identical and their throughput in log lines per second is reported. Without
+--spike_log/--verilator_log, synthetic logs of --instrs instructions are
+generated in a temporary directory.
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+
+from verilator_log_to_trace_csv import read_verilator_trace
+from cva6_spike_log_to_trace_csv import read_spike_trace
+
+INSTRS = [("00000297", "auipc   t0, 0x0"), ("02028593", "addi    a1, t0, 32"),
+          ("00b50633", "add     a2, a0, a1"), ("0005a683", "lw      a3, 0(a1)"),
+          ("00d5a023", "sw      a3, 0(a1)"), ("fe0696e3", "bnez    a3, pc - 20")]
+
+
+def write_synthetic_logs(spike_log, verilator_log, instrs):
+  """Write Spike and Verilator logs of the same random instruction stream"""
+  rng = random.Random(0)
+  with open(spike_log, "w") as spike, open(verilator_log, "w") as verilator:
+    # Spike trampoline, then the reset vector of the testharness
+    for pc in (0x10000, 0x10004, 0x10010):
+      spike.write("core   0: 0x%016x (0x00000297) auipc   t0, 0x0\n" % pc)
+    pc = 0x80000000
+    for i in range(instrs):
+      binary, disasm = INSTRS[rng.randrange(len(INSTRS))]
+      rd = rng.randrange(1, 32)
+      val = rng.getrandbits(64)
+      spike.write("core   0: 0x%016x (0x%s) %s\n" % (pc, binary, disasm))
+      verilator.write("core   0: 0x%016x (0x%s) %s\n" % (pc, binary, disasm))
+      if disasm.startswith(("sw", "bnez")):
+        spike.write("core   0: 3 0x%016x (0x%s) mem 0x%016x\n" % (pc, binary, val))
+        verilator.write("3 0x%016x (0x%s) mem 0x%016x\n" % (pc, binary, val))
+      else:
+        spike.write("core   0: 3 0x%016x (0x%s) x%-2d 0x%016x\n" % (pc, binary, rd, val))
+        verilator.write("3 0x%016x (0x%s) x%2d 0x%016x\n" % (pc, binary, rd, val))
+      pc += 4
+    spike.write("core   0: 0x%016x (0x00000073) ecall\n" % pc)
+    verilator.write("core   0: 0x%016x (0x00000073) ecall\n" % pc)
+
+
+def entry_key(entry, illegal):
+  return (illegal, entry.pc, entry.binary, entry.instr_str, entry.instr,
+          entry.operand, entry.mode, tuple(entry.gpr))
+
+
+def bench(reader, path, full_trace, engine):
+  """Read a log with one engine, return its entries and the elapsed time"""
+  start = time.perf_counter()
+  entries = [entry_key(entry, illegal) for (entry, illegal) in reader(path, full_trace, engine)]
+  return entries, time.perf_counter() - start
+
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--spike_log", type=str, help="Spike log to read")
+  parser.add_argument("--verilator_log", type=str, help="Verilator log to read")
+  parser.add_argument("--instrs", type=int, default=500000,
+                      help="Number of instructions of the synthetic logs")
+  parser.add_argument("-f", "--full_trace", action="store_true",
+                      help="Extract the operands of the instructions")
+  args = parser.parse_args()
+
+  with tempfile.TemporaryDirectory() as tmp:
+    logs = []
+    if args.spike_log:
+      logs.append(("spike", read_spike_trace, args.spike_log))
+    if args.verilator_log:
+      logs.append(("verilator", read_verilator_trace, args.verilator_log))
+    if not logs:
+      spike_log = os.path.join(tmp, "spike.log")
+      verilator_log = os.path.join(tmp, "verilator.log")
+      write_synthetic_logs(spike_log, verilator_log, args.instrs)
+      logs = [("spike", read_spike_trace, spike_log),
+              ("verilator", read_verilator_trace, verilator_log)]
+
+    failed = False
+    for name, reader, path in logs:
+      with open(path, "rb") as log:
+        lines = sum(1 for line in log)
+      regex_entries, regex_time = bench(reader, path, args.full_trace, "regex")
+      fast_entries, fast_time = bench(reader, path, args.full_trace, "fast")
+      identical = regex_entries == fast_entries
+      failed |= not identical
+      print("%-9s %d lines, %d entries, identical: %s" %
+            (name, lines, len(regex_entries), identical))
+      print("  regex: %7.3fs %12.0f lines/s" % (regex_time, lines / regex_time))
+      print("  fast:  %7.3fs %12.0f lines/s (x%.2f)" %
+            (fast_time, lines / fast_time, regex_time / fast_time))
+  sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,290 @@
+"""
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Columnar binary instruction trace, an alternative to the trace CSV of
+RiscvInstructionTraceCsv that can be memory-mapped
+
+Layout, little endian, every section aligned on 8 bytes:
+  header  : magic, number of entries, number of strings
+  columns : one array per entry of COLUMNS, in order
+  strings : offsets of the strings in the string data (number + 1 x uint64),
+            then the UTF-8 string data
+
+pc and binary are stored as integers with their number of hex digits, mode as
+an integer (MODE_NONE when empty), and the other fields as indexes in the
+table of strings, each distinct string being stored once. gpr and csr are
+the ";" separated lists of the CSV.
+"""
+
+import argparse
+import array
+import csv
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+
+sys.path.insert(0, "dv/scripts")
+
+from riscv_trace_csv import *
+from cva6_trace_io import open_log
+
+MAGIC = b"CVA6TRC1"
+HEADER = struct.Struct("<8sQQ")
+
+# Name and array type code of the columns
+COLUMNS = [("pc", "Q"), ("binary", "Q"), ("mode", "B"), ("pc_digits", "B"),
+           ("binary_digits", "B"), ("instr_str", "I"), ("instr", "I"),
+           ("operand", "I"), ("gpr", "I"), ("csr", "I")]
+MODE_NONE = 0xff
+
+# Entries buffered per column before they are written to its temporary file
+FLUSH_ENTRIES = 1 << 16
+
+
+def align(offset):
+  return (offset + 7) & ~7
+
+
+def encode_hex(value, field):
+  """Return the integer and number of digits of a hex string of the trace"""
+  if not value:
+    return 0, 0
+  number = int(value, 16)
+  if len(value) > 16 or "%0*x" % (len(value), number) != value:
+    raise ValueError("%s %r cannot be stored in a binary trace" % (field, value))
+  return number, len(value)
+
+
+def decode_hex(number, digits):
+  return "%0*x" % (digits, number) if digits else ""
+
+
+class RiscvInstructionTraceBinWriter(object):
+  """Write RiscvInstructionTraceEntry objects to a binary trace
+
+  The columns are buffered in temporary files next to the trace and
+  assembled by close().
+  """
+
+  def __init__(self, path):
+    self.path = path
+    self.count = 0
+    self.strings = {}
+    self.columns = {name: array.array(code) for (name, code) in COLUMNS}
+    tmp_dir = os.path.dirname(os.path.abspath(path))
+    self.column_files = {name: tempfile.TemporaryFile(dir=tmp_dir) for (name, _) in COLUMNS}
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    if exc[0] is None:
+      self.close()
+    else:
+      self.discard()
+
+  def intern(self, value):
+    index = self.strings.get(value)
+    if index is None:
+      index = self.strings[value] = len(self.strings)
+    return index
+
+  def write_trace_entry(self, entry):
+    columns = self.columns
+    pc, pc_digits = encode_hex(entry.pc, "pc")
+    binary, binary_digits = encode_hex(entry.binary, "binary")
+    if entry.mode == "":
+      mode = MODE_NONE
+    elif len(entry.mode) == 1 and entry.mode.isdigit():
+      mode = int(entry.mode)
+    else:
+      raise ValueError("mode %r cannot be stored in a binary trace" % entry.mode)
+    columns["pc"].append(pc)
+    columns["binary"].append(binary)
+    columns["mode"].append(mode)
+    columns["pc_digits"].append(pc_digits)
+    columns["binary_digits"].append(binary_digits)
+    columns["instr_str"].append(self.intern(entry.instr_str))
+    columns["instr"].append(self.intern(entry.instr))
+    columns["operand"].append(self.intern(entry.operand))
+    columns["gpr"].append(self.intern(";".join(entry.gpr)))
+    columns["csr"].append(self.intern(";".join(entry.csr)))
+    self.count += 1
+    if len(columns["pc"]) >= FLUSH_ENTRIES:
+      self.flush_columns()
+
+  def flush_columns(self):
+    for name, column in self.columns.items():
+      column.tofile(self.column_files[name])
+      del column[:]
+
+  def close(self):
+    """Write the trace file"""
+    self.flush_columns()
+    data = [value.encode() for value in self.strings]
+    offsets = array.array("Q", [0])
+    for value in data:
+      offsets.append(offsets[-1] + len(value))
+    with open(self.path, "wb") as handle:
+      handle.write(HEADER.pack(MAGIC, self.count, len(data)))
+      for (name, _) in COLUMNS:
+        handle.write(b"\0" * (align(handle.tell()) - handle.tell()))
+        column_file = self.column_files[name]
+        column_file.seek(0)
+        shutil.copyfileobj(column_file, handle)
+        column_file.close()
+      handle.write(b"\0" * (align(handle.tell()) - handle.tell()))
+      offsets.tofile(handle)
+      handle.write(b"".join(data))
+
+  def discard(self):
+    for column_file in self.column_files.values():
+      column_file.close()
+
+
+class RiscvInstructionTraceBin(object):
+  """Memory-mapped binary trace
+
+  Entries are read as RiscvInstructionTraceEntry objects, by index or in
+  order, and each column is available without copy as a memoryview, or as
+  a NumPy array when NumPy is installed.
+
+  The memoryviews are released by close(). The NumPy arrays keep the
+  mapping alive: while one of them is referenced, close() leaves the trace
+  mapped, and it is unmapped once the last array is freed.
+  """
+
+  def __init__(self, path):
+    with open(path, "rb") as handle:
+      self.data = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, self.count, num_strings = HEADER.unpack_from(self.data)
+    if magic != MAGIC:
+      self.data.close()
+      raise ValueError("%s is not a binary trace" % path)
+    self.offsets = {}
+    offset = HEADER.size
+    view = memoryview(self.data)
+    self.columns = {}
+    for (name, code) in COLUMNS:
+      offset = align(offset)
+      size = self.count * array.array(code).itemsize
+      self.offsets[name] = offset
+      self.columns[name] = view[offset:offset + size].cast(code)
+      offset += size
+    offset = align(offset)
+    string_offsets = view[offset:offset + 8 * (num_strings + 1)].cast("Q")
+    start = offset + 8 * (num_strings + 1)
+    self.strings = [bytes(view[start + string_offsets[i]:start + string_offsets[i + 1]]).decode()
+                    for i in range(num_strings)]
+    string_offsets.release()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
+
+  def __len__(self):
+    return self.count
+
+  def close(self):
+    for column in self.columns.values():
+      column.release()
+    try:
+      self.data.close()
+    except BufferError:
+      # Exported to NumPy arrays, unmapped when they are freed
+      pass
+
+  def column(self, name):
+    """Return a column as a memoryview of integers"""
+    return self.columns[name]
+
+  def numpy(self, name):
+    """Return a column as a read-only NumPy array over the mapped trace"""
+    import numpy as np
+    code = dict(COLUMNS)[name]
+    return np.frombuffer(self.data, dtype=np.dtype(code).newbyteorder("<"),
+                         count=self.count, offset=self.offsets[name])
+
+  def entry(self, index):
+    """Return the entry at index as a RiscvInstructionTraceEntry"""
+    columns = self.columns
+    strings = self.strings
+    entry = RiscvInstructionTraceEntry()
+    entry.pc = decode_hex(columns["pc"][index], columns["pc_digits"][index])
+    entry.binary = decode_hex(columns["binary"][index], columns["binary_digits"][index])
+    mode = columns["mode"][index]
+    entry.mode = "" if mode == MODE_NONE else str(mode)
+    entry.instr_str = strings[columns["instr_str"][index]]
+    entry.instr = strings[columns["instr"][index]]
+    entry.operand = strings[columns["operand"][index]]
+    # As RiscvInstructionTraceCsv.read_trace
+    entry.gpr = strings[columns["gpr"][index]].split(";")
+    entry.csr = strings[columns["csr"][index]].split(";")
+    return entry
+
+  def __iter__(self):
+    for index in range(self.count):
+      yield self.entry(index)
+
+  def read_trace(self, trace):
+    """Append the entries to a list, as RiscvInstructionTraceCsv.read_trace"""
+    trace.extend(self)
+
+
+def csv_to_bin(csv_path, bin_path):
+  """Convert a trace CSV to a binary trace, return the number of entries"""
+  with open_log(csv_path, "r") as csv_fd, RiscvInstructionTraceBinWriter(bin_path) as writer:
+    # Entries are written as they are read, as RiscvInstructionTraceCsv.read_trace
+    for row in csv.DictReader(csv_fd):
+      entry = RiscvInstructionTraceEntry()
+      entry.gpr = row['gpr'].split(';')
+      entry.csr = row['csr'].split(';')
+      entry.pc = row['pc']
+      entry.operand = row['operand']
+      entry.binary = row['binary']
+      entry.instr_str = row['instr_str']
+      entry.instr = row['instr']
+      entry.mode = row['mode']
+      writer.write_trace_entry(entry)
+    return writer.count
+
+
+def bin_to_csv(bin_path, csv_path):
+  """Convert a binary trace to a trace CSV, return the number of entries"""
+  with RiscvInstructionTraceBin(bin_path) as trace, open_log(csv_path, "w") as csv_fd:
+    trace_csv = RiscvInstructionTraceCsv(csv_fd)
+    trace_csv.start_new_trace()
+    for entry in trace:
+      trace_csv.write_trace_entry(entry)
+    return len(trace)
+
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument("input", type=str, help="Trace CSV, or binary trace")
+  parser.add_argument("output", type=str, help="Binary trace, or trace CSV")
+  args = parser.parse_args()
+  if ".csv" in os.path.basename(args.input):
+    count = csv_to_bin(args.input, args.output)
+  else:
+    count = bin_to_csv(args.input, args.output)
+  print("%d entries written to %s" % (count, args.output))
+
+
+if __name__ == "__main__":
+  main()
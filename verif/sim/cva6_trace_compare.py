@@ -0,0 +1,182 @@
+"""
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Streaming comparison of two ISS traces, without intermediate CSV files
+"""
+
+import logging
+import os
+import time
+
+from dv.scripts.instr_trace_compare import check_update_gpr
+from verilator_log_to_trace_csv import read_verilator_trace, parse_verilator_trace_fast, undasm_lines
+from cva6_spike_log_to_trace_csv import read_spike_trace
+
+
+def get_trace_reader(iss):
+  """Return the trace reader generator of an ISS, None if it has none"""
+  if iss == "spike":
+    return read_spike_trace
+  if "veri" in iss or "vsim" in iss or "vcs" in iss or "questa" in iss:
+    return read_verilator_trace
+  return None
+
+
+def arch_updates(trace, full_trace=0):
+  """Filter the (entry, illegal) tuples of a trace reader
+
+  Keeps the instructions that process_spike_sim_log/process_verilator_sim_log
+  write to their CSV: the ones with an architectural update, unless full_trace
+  is set.
+  """
+  for (entry, illegal) in trace:
+    if full_trace or entry.gpr or entry.instr_str in ['wfi', 'ecall']:
+      yield entry
+
+
+def compare_traces(trace_1, trace_2, name_1, name_2, write, on_mismatch=None):
+  """Compare two instruction traces in order, stopping at the first divergence
+
+  This is the in-order mode of compare_trace_csv, applied to the entries as
+  they are read: every GPR update of trace_1 must be the next GPR update of
+  trace_2. Only the current entry of each trace is held in memory.
+
+  Args:
+    trace_1 : Iterable of RiscvInstructionTraceEntry, the reference
+    trace_2 : Iterable of RiscvInstructionTraceEntry
+    name_1  : Name of the ISS of trace_1
+    name_2  : Name of the ISS of trace_2
+    write   : Function writing a line of the mismatch report
+    on_mismatch : Function called with the diverging entries of trace_1 and
+              trace_2 as soon as they are found, either may be None if its
+              trace ended first
+
+  Returns:
+    result  : "[PASSED]: <n> matched" or "[FAILED]: <n> matched, <m> mismatch",
+              as compare_trace_csv
+  """
+  gpr_val_1 = {}
+  gpr_val_2 = {}
+  index_1 = 0
+  index_2 = 0
+  matched_cnt = 0
+  mismatch_cnt = 0
+  trace_2 = iter(trace_2)
+  for entry_1 in trace_1:
+    index_1 += 1
+    # Skip the instructions of trace 1 that do not change a GPR
+    if not check_update_gpr(entry_1.gpr, gpr_val_1):
+      continue
+    # Move forward trace 2 until a GPR update happens
+    entry_2 = None
+    for entry in trace_2:
+      index_2 += 1
+      if check_update_gpr(entry.gpr, gpr_val_2):
+        entry_2 = entry
+        break
+    if entry_2 is None:
+      if on_mismatch:
+        on_mismatch(entry_1, None)
+      mismatch_cnt += 1
+      write("Mismatch[%d]:\n[%d] %s : %s" %
+            (mismatch_cnt, index_1, name_1, entry_1.get_trace_string()))
+      write("Trace %s ended after %d instructions" % (name_2, index_2))
+      break
+    if entry_1.gpr != entry_2.gpr:
+      if on_mismatch:
+        on_mismatch(entry_1, entry_2)
+      mismatch_cnt += 1
+      write("Mismatch[%d]:\n%s[%d] : %s" %
+            (mismatch_cnt, name_1, index_1, entry_1.get_trace_string()))
+      write("%s[%d] : %s" % (name_2, index_2, entry_2.get_trace_string()))
+      break
+    matched_cnt += 1
+  else:
+    # Trace 1 ended, any remaining GPR update in trace 2 is a mismatch
+    for entry in trace_2:
+      index_2 += 1
+      if check_update_gpr(entry.gpr, gpr_val_2):
+        if on_mismatch:
+          on_mismatch(None, entry)
+        mismatch_cnt += 1
+        write("Trace %s ended after %d instructions, %s[%d] : %s" %
+              (name_1, index_1, name_2, index_2, entry.get_trace_string()))
+        break
+  if mismatch_cnt == 0:
+    return "[PASSED]: %d matched\n" % matched_cnt
+  return "[FAILED]: %d matched, %d mismatch\n" % (matched_cnt, mismatch_cnt)
+
+
+def compare_iss_traces(iss_list, log_list, write, full_trace=0):
+  """Compare the logs of two ISS without writing CSV files
+
+  Returns the result string of compare_traces, or None if one of the ISS has
+  no trace reader.
+  """
+  readers = [get_trace_reader(iss) for iss in iss_list]
+  if None in readers:
+    return None
+  traces = []
+  for reader, log, iss in zip(readers, log_list, iss_list):
+    logging.info("Streaming %s log : %s" % (iss, log))
+    traces.append(arch_updates(reader(log, full_trace), full_trace))
+  write("%s : %s" % (iss_list[0], log_list[0]))
+  write("%s : %s" % (iss_list[1], log_list[1]))
+  result = compare_traces(traces[0], traces[1], iss_list[0], iss_list[1], write)
+  write(result.rstrip("\n"))
+  return result
+
+
+def follow(path, proc, deadline=None, poll_s=0.05):
+  """Yield the lines of a file as a running process writes them
+
+  Waits for the file to be created, and stops at the end of the file once
+  the process has exited, or when time.time() passes deadline. A line is
+  only yielded once its newline is written.
+  """
+  handle = None
+  pending = ""
+  try:
+    while True:
+      exited = proc.poll() is not None
+      if handle is None and os.path.isfile(path):
+        handle = open(path, 'r', errors='replace')
+      data = handle.read() if handle else ""
+      if data:
+        lines = (pending + data).split("\n")
+        pending = lines.pop()
+        for line in lines:
+          yield line + "\n"
+        continue
+      if exited or (deadline and time.time() > deadline):
+        break
+      time.sleep(poll_s)
+    if pending:
+      yield pending
+  finally:
+    if handle:
+      handle.close()
+
+
+def compare_live_trace(ref_iss, ref_log, iss, dasm, proc, write, on_mismatch, deadline=None):
+  """Compare the raw RVFI trace of a running RTL simulation with a reference log
+
+  The trace is parsed by the same state machine as the Verilator logs, while
+  the simulator writes it. on_mismatch is called at the first divergence,
+  e.g. to stop the simulation, and the comparison ends there.
+
+  Returns the result string of compare_traces.
+  """
+  ref_trace = arch_updates(get_trace_reader(ref_iss)(ref_log, 0))
+  live_trace = arch_updates(parse_verilator_trace_fast(undasm_lines(follow(dasm, proc, deadline)), 0))
+  return compare_traces(ref_trace, live_trace, ref_iss, iss, write, on_mismatch)
@@ -0,0 +1,84 @@
+"""
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Compact instruction trace entries, built by the fast trace parsers
+"""
+
+import sys
+
+sys.path.insert(0, "dv/scripts")
+
+from riscv_trace_csv import *
+
+# Distinct (binary, disassembly) pairs remembered by an entry decoder, the
+# cache is emptied when it is full
+DECODE_CACHE_SIZE = 1 << 18
+
+# Distinct "abi:value" register writes remembered by a parser, the cache is
+# emptied when it is full
+GPR_CACHE_SIZE = 1 << 18
+
+# The parsers never record CSR writes, all their entries share this list
+NO_CSR = ()
+
+
+class TraceEntry(object):
+  """Slotted stand-in for RiscvInstructionTraceEntry
+
+  It has the fields RiscvInstructionTraceCsv and the trace comparison read,
+  and get_trace_string, but no __dict__. The strings an instruction shares
+  with the previous executions of the same binary are not copied, and csr
+  is a shared empty tuple.
+  """
+
+  __slots__ = ("gpr", "csr", "instr", "operand", "pc", "binary", "instr_str", "mode")
+
+  def __init__(self, pc, binary, instr_str, instr="", operand=""):
+    self.pc = pc
+    self.binary = binary
+    self.instr_str = instr_str
+    self.instr = instr
+    self.operand = operand
+    self.mode = ""
+    self.gpr = []
+    self.csr = NO_CSR
+
+  def get_trace_string(self):
+    """Return a short string of the trace entry, as RiscvInstructionTraceEntry"""
+    return ("pc[{}] {}: {} {}".format(
+      self.pc, self.instr_str, " ".join(self.gpr), " ".join(self.csr)))
+
+
+def entry_decoder(make_instr, full_trace):
+  """Return a function building the TraceEntry of the (addr, bin, instr)
+  groups of an instruction line
+
+  make_instr(addr, binary, disasm, full_trace) is the decoding of a line
+  into a RiscvInstructionTraceEntry. Only its pc depends on the address, so
+  the other fields are decoded once per distinct binary and disassembly,
+  and shared: the disassembly string work (and with full_trace, the operand
+  extraction) is skipped for every instruction executed before.
+  """
+  decoded = {}
+
+  def decode(addr, binary, disasm):
+    fields = decoded.get((binary, disasm))
+    if fields is None:
+      if len(decoded) >= DECODE_CACHE_SIZE:
+        decoded.clear()
+      instr = make_instr(addr, binary, disasm, full_trace)
+      fields = decoded[(binary, disasm)] = (sys.intern(instr.binary), instr.instr_str,
+                                            sys.intern(instr.instr), instr.operand)
+    return TraceEntry(addr, *fields)
+
+  return decode
@@ -0,0 +1,263 @@
+"""
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Sidecar indexes of Spike/Verilator logs and trace CSVs, to read a trace from
+its K-th instruction, or from the first occurrence of a PC, without parsing
+what comes before
+
+The index of <trace> is saved to <trace>.idx, as JSON:
+  size, mtime_ns : Size and modification time of the indexed trace
+  step           : Number of instructions between two restart points
+  count          : Number of instructions in the trace
+  offsets        : [instruction number, byte offset] restart points, where
+                   parsing can start from the initial state of the parser
+  pcs            : Hex PC (without leading zeros) -> number of the first
+                   instruction at this PC
+
+Instructions are numbered from 0, in the order read_spike_trace and
+read_verilator_trace yield them, or in the order of the CSV rows.
+"""
+
+import argparse
+import bisect
+import csv
+import functools
+import io
+import json
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, "dv/scripts")
+
+from riscv_trace_csv import *
+from cva6_trace_io import CHUNK_SIZE, compression, read_lines
+from verilator_log_to_trace_csv import parse_verilator_trace_fast
+from cva6_spike_log_to_trace_csv import parse_spike_trace_fast
+
+# Default number of instructions between two restart points
+STEP = 100000
+
+
+def get_trace_parsers(iss):
+  """Return the line parsers of the log of an ISS, None if it has none
+
+  The first parser starts from the beginning of the log, the second one from
+  a restart point of the index.
+  """
+  if iss == "spike":
+    return parse_spike_trace_fast, parse_spike_trace_fast
+  if "veri" in iss or "vsim" in iss or "vcs" in iss or "questa" in iss:
+    return parse_verilator_trace_fast, \
+      functools.partial(parse_verilator_trace_fast, in_trampoline=False)
+  return None
+
+
+def is_csv(path):
+  return ".csv" in os.path.basename(path)
+
+
+def pc_key(pc):
+  """Return the key of a PC, given as an integer or a hex string, in the index"""
+  return "%x" % (pc if isinstance(pc, int) else int(pc, 16))
+
+
+def index_path(path):
+  return path + ".idx"
+
+
+def read_lines_with_offsets(path, position, chunk_size=CHUNK_SIZE):
+  """Yield the lines of a log as read_lines, storing the byte offset of the
+  last yielded line in position[0], and None there at the end of the file
+
+  Lines must end with \\n or \\r\\n.
+  """
+  with open(path, 'rb') as handle:
+    offset = 0
+    pending = b""
+    while True:
+      chunk = handle.read(chunk_size)
+      if not chunk:
+        break
+      lines = (pending + chunk).split(b"\n")
+      pending = lines.pop()
+      for line in lines:
+        position[0] = offset
+        offset += len(line) + 1
+        yield (line[:-1] if line.endswith(b"\r") else line).decode()
+    if pending:
+      position[0] = offset
+      yield (pending[:-1] if pending.endswith(b"\r") else pending).decode()
+  position[0] = None
+
+
+def build_log_index(path, iss, step):
+  """Return the restart points and the PC index of a Spike or Verilator log
+
+  The parser yields an instruction when it reads the line of the next one,
+  out of the trampoline and debug window: parsing from this line with a
+  fresh state yields the rest of the trace.
+  """
+  parse = get_trace_parsers(iss)[0]
+  position = [0]
+  offsets = [[0, 0]]
+  pcs = {}
+  count = 0
+  for (entry, illegal) in parse(read_lines_with_offsets(path, position), 0):
+    try:
+      pcs.setdefault(pc_key(entry.pc), count)
+    except ValueError:
+      pass
+    count += 1
+    # Illegal instructions are yielded at their trap line, the last
+    # instruction at the end of the log or at its ecall line
+    if count >= offsets[-1][0] + step and not illegal and position[0] is not None \
+       and entry.instr_str != 'ecall':
+      offsets.append([count, position[0]])
+  return count, offsets, pcs
+
+
+def build_csv_index(path, step):
+  """Return the restart points and the PC index of a trace CSV
+
+  Restart points are the offsets of the rows, the CSV header being read
+  separately.
+  """
+  offsets = []
+  pcs = {}
+  count = 0
+  with open(path, 'rb') as handle:
+    header = next(csv.reader([handle.readline().decode()]))
+    pc_column = header.index("pc")
+    offset = handle.tell()
+    for line in handle:
+      if count % step == 0:
+        offsets.append([count, offset])
+      offset += len(line)
+      try:
+        pcs.setdefault(pc_key(next(csv.reader([line.decode()]))[pc_column]), count)
+      except ValueError:
+        pass
+      count += 1
+  return count, offsets or [[0, offset]], pcs
+
+
+def build_index(path, iss=None, step=STEP):
+  """Index a log of an ISS, or a trace CSV, and save the index next to it
+
+  Returns the index.
+  """
+  if compression(path):
+    raise ValueError("Cannot index the compressed trace %s" % path)
+  logging.info("Indexing %s" % path)
+  stat = os.stat(path)
+  if is_csv(path):
+    count, offsets, pcs = build_csv_index(path, step)
+  elif get_trace_parsers(iss):
+    count, offsets, pcs = build_log_index(path, iss, step)
+  else:
+    raise ValueError("Cannot index the logs of %s" % iss)
+  index = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "step": step,
+           "count": count, "offsets": offsets, "pcs": pcs}
+  with open(index_path(path), 'w') as handle:
+    json.dump(index, handle)
+  return index
+
+
+def load_index(path):
+  """Return the saved index of a trace, None if it is missing or out of date"""
+  try:
+    with open(index_path(path), 'r') as handle:
+      index = json.load(handle)
+  except (OSError, ValueError):
+    return None
+  stat = os.stat(path)
+  if index.get("size") != stat.st_size or index.get("mtime_ns") != stat.st_mtime_ns:
+    return None
+  return index
+
+
+def read_csv_rows(path, offset):
+  """Yield the rows of a trace CSV from a byte offset as RiscvInstructionTraceEntry,
+  as RiscvInstructionTraceCsv.read_trace"""
+  with open(path, 'rb') as handle:
+    header = handle.readline()
+    handle.seek(offset)
+    text = io.TextIOWrapper(handle, newline='')
+    for row in csv.DictReader(text, fieldnames=next(csv.reader([header.decode()]))):
+      entry = RiscvInstructionTraceEntry()
+      entry.gpr = row['gpr'].split(';')
+      entry.csr = row['csr'].split(';')
+      entry.pc = row['pc']
+      entry.operand = row['operand']
+      entry.binary = row['binary']
+      entry.instr_str = row['instr_str']
+      entry.instr = row['instr']
+      entry.mode = row['mode']
+      yield entry, False
+
+
+def seek_trace(path, iss=None, instr=0, pc=None, full_trace=0):
+  """Yield the (entry, illegal) tuples of a trace from an instruction
+
+  The trace is a log of iss, or a trace CSV whose entries are never illegal.
+  Reading starts at the instruction number instr, or at the first one at pc
+  if given, from the nearest restart point of the index, which is built if
+  it is missing or out of date. Nothing is yielded for a PC never reached.
+  """
+  index = load_index(path) or build_index(path, iss)
+  if pc is not None:
+    instr = index["pcs"].get(pc_key(pc))
+    if instr is None:
+      return
+  offsets = index["offsets"]
+  start, offset = offsets[max(bisect.bisect_right([k for (k, _) in offsets], instr) - 1, 0)]
+  if is_csv(path):
+    trace = read_csv_rows(path, offset)
+  else:
+    parse, restart = get_trace_parsers(iss)
+    lines = read_lines(path, start=offset)
+    trace = restart(lines, full_trace) if offset else parse(lines, full_trace)
+  for number, entry in enumerate(trace, start):
+    if number >= instr:
+      yield entry
+
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument("trace", type=str, help="Spike/Verilator log or trace CSV")
+  parser.add_argument("--iss", type=str, default="spike",
+                      help="ISS that wrote the log, e.g. spike or veri-testharness")
+  parser.add_argument("--step", type=int, default=STEP,
+                      help="Number of instructions between two restart points")
+  parser.add_argument("--instr", type=int, help="Print the trace from this instruction number")
+  parser.add_argument("--pc", type=str, help="Print the trace from the first instruction at this PC")
+  parser.add_argument("-n", "--count", type=int, default=20, help="Number of instructions to print")
+  args = parser.parse_args()
+  logging.basicConfig(level=logging.INFO)
+
+  index = load_index(args.trace)
+  if index is None or index["step"] != args.step:
+    index = build_index(args.trace, args.iss, args.step)
+  print("%s: %d instructions, %d restart points, %d PCs" %
+        (args.trace, index["count"], len(index["offsets"]), len(index["pcs"])))
+  if args.instr is None and args.pc is None:
+    return
+  trace = seek_trace(args.trace, args.iss, args.instr or 0, args.pc)
+  for (number, (entry, illegal)) in zip(range(args.count), trace):
+    print("%s%s" % (entry.get_trace_string(), " (illegal)" if illegal else ""))
+
+
+if __name__ == "__main__":
+  main()
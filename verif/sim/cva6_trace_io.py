@@ -0,0 +1,278 @@
+"""
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Fast line reading of simulation logs and instruction traces, transparently
+compressed or not, and conversion of large logs in parallel chunks
+"""
+
+import bisect
+import gzip
+import io
+import lzma
+import mmap
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+# Default size of the binary reads, large enough to amortize the per-read
+# overhead on multi-gigabyte logs
+CHUNK_SIZE = 1 << 22
+
+# Smallest part of a log converted by a process of convert_chunks
+MIN_PART_SIZE = 1 << 24
+
+# Parts per process, so that the processes finishing first pick up the
+# remaining parts
+PARTS_PER_JOB = 4
+
+# Compression of the logs and trace files by extension: command line tools,
+# in order of preference, with the options making them multi-threaded
+COMPRESSORS = {".gz": [["pigz"], ["gzip"]], ".zst": [["zstd", "-T0"]], ".xz": [["xz", "-T0"]]}
+
+
+def compression(path):
+  """Return the compression extension of a path, None if it is not compressed"""
+  ext = os.path.splitext(path)[1]
+  return ext if ext in COMPRESSORS else None
+
+
+class PipeIO(io.RawIOBase):
+  """Raw file over the output or input of a decompressor or compressor process"""
+
+  def __init__(self, proc, path):
+    self.proc = proc
+    self.path = path
+    self.pipe = proc.stdout if proc.stdout else proc.stdin
+    self.eof = False
+
+  def readable(self):
+    return self.pipe is self.proc.stdout
+
+  def writable(self):
+    return self.pipe is self.proc.stdin
+
+  def readinto(self, buffer):
+    size = self.pipe.readinto(buffer)
+    self.eof = size == 0
+    return size
+
+  def write(self, data):
+    return self.pipe.write(data)
+
+  def close(self):
+    if self.closed:
+      return
+    self.pipe.close()
+    status = self.proc.wait()
+    super().close()
+    # A reader closed before the end stops the decompressor with SIGPIPE
+    if status and (self.writable() or self.eof):
+      raise OSError("%s failed on %s with status %d" % (self.proc.args[0], self.path, status))
+
+
+def open_compressed(path, ext, writing):
+  """Open a compressed file in binary mode
+
+  A command line tool is preferred: it runs in parallel with the parsing,
+  and pigz, zstd -T0 and xz -T0 compress with several threads. The Python
+  modules are used when no tool is installed.
+  """
+  for tool in COMPRESSORS[ext]:
+    if not shutil.which(tool[0]):
+      continue
+    if writing:
+      with open(path, "wb") as handle:
+        proc = subprocess.Popen(tool + ["-c"], stdin=subprocess.PIPE, stdout=handle)
+    else:
+      proc = subprocess.Popen(tool + ["-dc", path], stdout=subprocess.PIPE)
+    raw = PipeIO(proc, path)
+    return io.BufferedWriter(raw) if writing else io.BufferedReader(raw)
+  mode = "wb" if writing else "rb"
+  if ext == ".gz":
+    return gzip.open(path, mode)
+  if ext == ".xz":
+    return lzma.open(path, mode)
+  try:
+    import zstandard
+  except ImportError:
+    raise OSError("Cannot open %s: neither zstd nor the zstandard module are installed" % path)
+  return zstandard.open(path, mode, cctx=zstandard.ZstdCompressor(threads=-1))
+
+
+def open_log(path, mode="r"):
+  """Open a log or trace file, compressed according to its extension
+
+  Takes the "r", "w", "rb" and "wb" modes of open().
+  """
+  ext = compression(path)
+  if ext is None:
+    return open(path, mode)
+  handle = open_compressed(path, ext, "w" in mode)
+  return handle if "b" in mode else io.TextIOWrapper(handle)
+
+
+def split_lines(data):
+  """Decode a block of complete lines and split it as text mode would
+
+  \\n, \\r\\n and \\r all end a line. The lines are returned without their
+  line ending.
+  """
+  text = data.decode()
+  if "\r" in text:
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+  return text.split("\n")
+
+
+def read_lines(path, chunk_size=CHUNK_SIZE, start=0, end=None):
+  """Yield the lines of a text file, read in large binary chunks
+
+  The lines are the ones of `open(path, 'r')`, without their line ending.
+  Each chunk is cut after its last newline and decoded in one go, instead of
+  decoding and allocating line by line. With start and end, only the lines
+  of these bytes of the file are read, which needs an uncompressed file.
+  """
+  with open_log(path, 'rb') as handle:
+    if start:
+      handle.seek(start)
+    remaining = -1 if end is None else end - start
+    pending = b""
+    while remaining:
+      chunk = handle.read(chunk_size if remaining < 0 else min(chunk_size, remaining))
+      if not chunk:
+        break
+      if remaining > 0:
+        remaining -= len(chunk)
+      data = pending + chunk
+      last = data.rfind(b"\n")
+      if last < 0:
+        pending = data
+        continue
+      pending = data[last + 1:]
+      lines = split_lines(data[:last + 1])
+      # The block ends with a newline, hence an empty last element
+      lines.pop()
+      yield from lines
+    if pending:
+      lines = split_lines(pending)
+      if not lines[-1]:
+        # The file ends with a lone \r
+        lines.pop()
+      yield from lines
+
+
+def marker_lines(data, needles):
+  """Return the sorted offsets of the lines of data holding one of needles"""
+  offsets = set()
+  for needle in needles:
+    pos = data.find(needle)
+    while pos >= 0:
+      offsets.add(data.rfind(b"\n", 0, pos) + 1)
+      end = data.find(b"\n", pos)
+      if end < 0:
+        break
+      pos = data.find(needle, end)
+  return sorted(offsets)
+
+
+def line_end(data, offset):
+  """Return the offset of the end of the line at offset"""
+  end = data.find(b"\n", offset)
+  return len(data) if end < 0 else end
+
+
+def chunk_starts(data, num_chunks, normal, changes, is_start):
+  """Split a log in about num_chunks chunks that can be parsed independently
+
+  The parsers keep a state across lines, e.g. in a trampoline or not, and an
+  instruction in hand. A chunk may only start at a line where the state is
+  the initial one (normal) and that starts a new instruction (is_start), so
+  that parsing it from a fresh state yields the entries the whole log would.
+
+  Args:
+    data       : Content of the log, e.g. a mmap
+    num_chunks : Number of chunks to aim for
+    normal     : Whether the state is normal at the start of the log
+    changes    : Sorted (offset, normal) list: the state is normal before the
+                 line at offset or not, up to the next change
+    is_start   : Function telling if a decoded line starts an instruction
+
+  Returns:
+    starts     : Offsets of the chunks, followed by the size of the log
+  """
+  size = len(data)
+  change_offsets = [offset for (offset, _) in changes]
+  starts = [0]
+  for i in range(1, num_chunks):
+    # Start from the first line in this chunk, up to the start of the next one
+    offset = size * i // num_chunks
+    offset = data.find(b"\n", offset - 1) + 1
+    limit = size * (i + 1) // num_chunks
+    while 0 < offset < limit:
+      index = bisect.bisect_right(change_offsets, offset)
+      if not (changes[index - 1][1] if index else normal):
+        offset = next((o for (o, state) in changes[index:] if state), -1)
+        continue
+      end = line_end(data, offset)
+      if is_start(data[offset:end].decode(errors='replace')):
+        starts.append(offset)
+        break
+      offset = end + 1
+  starts.append(size)
+  return starts
+
+
+def convert_chunks(path, csv, num_jobs, find_starts, convert, *args):
+  """Convert a log to a trace CSV with num_jobs processes
+
+  The log is split by find_starts(data, num_chunks), each chunk is converted
+  by convert(path, start, end, csv, index, *args) to its own CSV, returning
+  (instrs_in, instrs_out, stopped), and the CSV are concatenated in order up
+  to the first chunk that stopped the trace.
+
+  Compressed logs cannot be split, they are converted by a single process.
+
+  Returns the numbers of instructions read and written.
+  """
+  size = os.path.getsize(path)
+  num_chunks = min(num_jobs * PARTS_PER_JOB, size // MIN_PART_SIZE)
+  if num_chunks < 2 or compression(path):
+    instrs_in, instrs_out, _ = convert(path, 0, None, csv, 0, *args)
+    return instrs_in, instrs_out
+  with open(path, 'rb') as handle:
+    with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as data:
+      starts = find_starts(data, num_chunks)
+
+  instrs_in = 0
+  instrs_out = 0
+  with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(csv))) as tmp:
+    parts = [os.path.join(tmp, "%d.csv" % i) for i in range(len(starts) - 1)]
+    with ProcessPoolExecutor(max_workers=num_jobs) as executor:
+      futures = [executor.submit(convert, path, start, end, part, i, *args)
+                 for (i, (start, end, part)) in enumerate(zip(starts, starts[1:], parts))]
+      with open_log(csv, 'wb') as csv_fd:
+        for i, future in enumerate(futures):
+          part_in, part_out, stopped = future.result()
+          instrs_in += part_in
+          instrs_out += part_out
+          with open(parts[i], 'rb') as part_fd:
+            if i:
+              # Skip the header of the CSV
+              part_fd.readline()
+            shutil.copyfileobj(part_fd, csv_fd)
+          if stopped:
+            for future in futures[i + 1:]:
+              future.cancel()
+            break
+  return instrs_in, instrs_out
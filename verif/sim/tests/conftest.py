@@ -0,0 +1,24 @@
+"""
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Tests of the regression scripts, run with `python3 -m pytest tests` from
+verif/sim. The tests of the trace scripts need riscv-dv in dv/ and are
+skipped without it.
+"""
+
+import os
+import sys
+
+SIM_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(SIM_DIR, "dv", "scripts"))
+sys.path.insert(0, SIM_DIR)
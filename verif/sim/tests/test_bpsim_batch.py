@@ -0,0 +1,56 @@
+"""
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import random
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("riscv_trace_csv")
+
+from cva6_bpsim import BranchTrace, Bimodal, Gshare, simulate
+from cva6_bpsim.batch import sweep
+
+MODELS = {"bimodal": Bimodal, "gshare": Gshare}
+
+
+def random_trace(branches):
+  """Branches of a few hundred PCs, each taken with its own probability"""
+  rng = random.Random(0)
+  sites = [(0x80000000 + 2 * rng.randrange(1 << 14), rng.random()) for i in range(300)]
+  trace = BranchTrace()
+  for i in range(branches):
+    pc, bias = sites[rng.randrange(len(sites))]
+    trace.pc.append(pc)
+    trace.target.append(pc + rng.choice([-64, 32]))
+    trace.taken.append(rng.random() < bias)
+  return trace
+
+
+@pytest.mark.parametrize("impl", sorted(MODELS))
+@pytest.mark.parametrize("cfg", [{"RVC": 1, "INSTR_PER_FETCH": 2},
+                                 {"RVC": 0, "INSTR_PER_FETCH": 1}])
+def test_sweep_matches_models(impl, cfg):
+  trace = random_trace(20000)
+  entries = [16, 128, 1024]
+  ctr_bits = [1, 2, 3]
+  results = sweep(cfg, trace, impl, entries, ctr_bits)
+  assert sorted(results) == [(size, bits) for size in entries for bits in ctr_bits]
+  for (size, bits), misses in results.items():
+    assert misses == simulate(MODELS[impl](cfg, size, bits), trace)
+
+
+def test_sweep_rejects_other_predictors():
+  with pytest.raises(ValueError):
+    sweep({"RVC": 1, "INSTR_PER_FETCH": 2}, random_trace(10), "tournament", [16], [2])
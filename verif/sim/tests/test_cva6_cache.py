@@ -0,0 +1,57 @@
+"""
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import pytest
+
+from cva6_cache import ArtifactCache
+
+
+@pytest.fixture
+def build(tmp_path):
+  """A test program with the crt.S, syscalls.c and linker script of the
+  custom testlists, and the include directory of crt.S"""
+  common = tmp_path / "common"
+  inc = tmp_path / "inc"
+  common.mkdir()
+  inc.mkdir()
+  (tmp_path / "test.S").write_text('#include "test.h"\n')
+  (tmp_path / "test.h").write_text("#define A 1\n")
+  (common / "crt.S").write_text('#include "encoding.h"\n')
+  (common / "syscalls.c").write_text("int x;\n")
+  (common / "test.ld").write_text("SECTIONS {}\n")
+  (inc / "encoding.h").write_text("#define B 2\n")
+  return tmp_path
+
+
+def compile_cmd(build, split_include):
+  include = ["-I", str(build / "inc")] if split_include else ["-I%s" % (build / "inc")]
+  return " ".join(["gcc", "-static"] + include +
+                  ["-T%s" % (build / "common" / "test.ld"), str(build / "test.S"),
+                   str(build / "common" / "crt.S"), str(build / "common" / "syscalls.c"),
+                   "-o", str(build / "test.o")])
+
+
+@pytest.mark.parametrize("split_include", [False, True])
+@pytest.mark.parametrize("changed", ["test.S", "test.h", "common/crt.S", "common/syscalls.c",
+                                     "common/test.ld", "inc/encoding.h"])
+def test_compile_key_covers_every_input(tmp_path, build, split_include, changed):
+  cache = ArtifactCache(str(tmp_path / "cache"))
+  cmd = compile_cmd(build, split_include)
+  src, out = str(build / "test.S"), str(build / "test.o")
+  key = cache.compile_key(cmd, src, out)
+  assert cache.compile_key(cmd, src, out) == key
+  with open(build / changed, "a") as f:
+    f.write("\n")
+  assert cache.compile_key(cmd, src, out) != key
+
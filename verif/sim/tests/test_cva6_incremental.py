@@ -0,0 +1,116 @@
+"""
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import subprocess
+
+import pytest
+
+import cva6_incremental
+from cva6_incremental import affected_tests
+
+FILES = {
+  "core/Flist.cva6": "-F ${CVA6_REPO_DIR}/core/frontend/Flist.frontend\n"
+                     "${CVA6_REPO_DIR}/core/include/${TARGET_CFG}_config_pkg.sv\n"
+                     "${CVA6_REPO_DIR}/core/cva6.sv\n",
+  "core/frontend/Flist.frontend": "${CVA6_REPO_DIR}/core/frontend/bht.sv\n",
+  "core/frontend/bht.sv": "module bht; endmodule\n",
+  "core/frontend/unused.sv": "module unused; endmodule\n",
+  "core/include/cv64a6_imafdc_sv39_config_pkg.sv": "package config_pkg; endpackage\n",
+  "core/include/cv32a60x_config_pkg.sv": "package config_pkg; endpackage\n",
+  "core/cva6.sv": "module cva6; endmodule\n",
+  "verif/tb/core/Flist.cva6_tb": "${CVA6_REPO_DIR}/verif/tb/core/tb.sv\n",
+  "verif/tb/core/tb.sv": "module tb; endmodule\n",
+  "verif/tests/testlist.yaml": "- test: t1\n  asm_tests: <repo>/verif/tests/t1.S\n"
+                               "- test: t2\n  asm_tests: <repo>/verif/tests/t2.S\n",
+  "verif/tests/t1.S": "nop\n",
+  "verif/tests/t2.S": "nop\n",
+  "verif/sim/cva6_incremental.py": "",
+}
+
+
+def run_git(repo, *args):
+  subprocess.run(["git", "-C", str(repo)] + list(args), check=True, capture_output=True)
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+  """A git repository with the Flists of the core and a testlist of two
+  directed tests, seen by affected_tests as the CVA6 repository"""
+  for path, text in FILES.items():
+    (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+    (tmp_path / path).write_text(text.replace("<repo>", str(tmp_path)))
+  run_git(tmp_path, "init", "-q")
+  run_git(tmp_path, "add", ".")
+  run_git(tmp_path, "-c", "user.name=test", "-c", "user.email=test@example.com",
+          "commit", "-q", "-m", "base")
+  monkeypatch.setattr(cva6_incremental, "__file__",
+                      str(tmp_path / "verif/sim/cva6_incremental.py"))
+  monkeypatch.setenv("CVA6_REPO_DIR", str(tmp_path))
+  return tmp_path
+
+
+def affected(repo):
+  testlist = str(repo / "verif/tests/testlist.yaml")
+  test_list = list(cva6_incremental.testlist_entries(open(testlist).read()).values())
+  return affected_tests("HEAD", test_list, testlist, ["cv64a6_imafdc_sv39"], "")
+
+
+def edit(repo, path, text="// changed\n"):
+  with open(repo / path, "a") as f:
+    f.write(text)
+
+
+def test_nothing_changed(repo):
+  assert affected(repo) == set()
+
+
+@pytest.mark.parametrize("path", ["core/frontend/bht.sv", "core/cva6.sv",
+                                  "core/include/cv64a6_imafdc_sv39_config_pkg.sv",
+                                  "verif/tb/core/tb.sv"])
+def test_simulated_rtl_reaches_every_test(repo, path):
+  edit(repo, path)
+  assert affected(repo) is None
+
+
+@pytest.mark.parametrize("path", ["core/frontend/unused.sv",
+                                  "core/include/cv32a60x_config_pkg.sv"])
+def test_other_rtl_reaches_no_test(repo, path):
+  edit(repo, path)
+  assert affected(repo) == set()
+
+
+@pytest.mark.parametrize("path", ["core/Flist.cva6", "core/frontend/Flist.frontend",
+                                  "verif/tb/core/Flist.cva6_tb"])
+def test_flist_change_reaches_every_test(repo, path):
+  edit(repo, path, "${CVA6_REPO_DIR}/core/frontend/unused.sv\n")
+  assert affected(repo) is None
+
+
+def test_missing_flist_include_reaches_every_test(repo):
+  (repo / "core/frontend/Flist.frontend").unlink()
+  edit(repo, "core/cva6.sv")
+  run_git(repo, "add", "-A")
+  run_git(repo, "-c", "user.name=test", "-c", "user.email=test@example.com",
+          "commit", "-q", "-m", "uninitialized submodule")
+  assert affected(repo) is None
+
+
+def test_directed_test_source(repo):
+  edit(repo, "verif/tests/t2.S", "addi x0, x0, 0\n")
+  assert affected(repo) == {"t2"}
+
+
+def test_testlist_entry(repo):
+  edit(repo, "verif/tests/testlist.yaml", "  iterations: 2\n")
+  assert affected(repo) == {"t2"}
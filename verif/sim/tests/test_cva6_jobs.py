@@ -0,0 +1,61 @@
+"""
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from cva6_jobs import Job, Journal, run_job
+
+
+def simulate(log, completed):
+  with open(log, "w") as f:
+    f.write("core   0: 0x0000000080000000 (0x00000013) nop\n")
+  return completed
+
+
+def sim_job(log, completed=None):
+  job = Job("spike:test_0", simulate, log, completed)
+  job.outputs = [log]
+  return job
+
+
+def test_journal_resume(tmp_path):
+  path = str(tmp_path / "journal.jsonl")
+  log = str(tmp_path / "test_0.log")
+  journal = Journal(path)
+  assert run_job(sim_job(log), journal=journal) is None
+  assert journal.done("simulate:spike:test_0", [log])
+  # Checked again in the same run, as --gen_sv_seed iterations do
+  assert journal.done("simulate:spike:test_0", [log])
+
+  resumed = Journal(path, resume=True)
+  assert resumed.done("simulate:spike:test_0", [log])
+  with open(log, "a") as f:
+    f.write("changed\n")
+  assert not Journal(path, resume=True).done("simulate:spike:test_0", [log])
+  assert not Journal(path).done("simulate:spike:test_0", [log])
+
+
+def test_journal_iterations(tmp_path):
+  log = str(tmp_path / "test_0.log")
+  journal = Journal(str(tmp_path / "journal.jsonl"))
+  run_job(sim_job(log), journal=journal)
+  journal.iteration = 1
+  assert not journal.done("simulate:spike:test_0", [log])
+
+
+def test_incomplete_job_not_recorded(tmp_path):
+  path = str(tmp_path / "journal.jsonl")
+  log = str(tmp_path / "test_0.log")
+  run_job(sim_job(log, completed=False), journal=Journal(path))
+  assert not Journal(path, resume=True).done("simulate:spike:test_0", [log])
+  run_job(sim_job(log, completed=True), journal=Journal(path, resume=True))
+  assert Journal(path, resume=True).done("simulate:spike:test_0", [log])
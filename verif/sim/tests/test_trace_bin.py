@@ -0,0 +1,59 @@
+"""
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import pytest
+
+pytest.importorskip("riscv_trace_csv")
+
+from cva6_trace_benchmark import write_synthetic_logs
+from cva6_trace_bin import RiscvInstructionTraceBin, bin_to_csv, csv_to_bin
+from cva6_spike_log_to_trace_csv import process_spike_sim_log
+
+
+@pytest.fixture
+def trace_csv(tmp_path):
+  write_synthetic_logs(str(tmp_path / "spike.log"), str(tmp_path / "verilator.log"), 1000)
+  path = str(tmp_path / "spike.csv")
+  process_spike_sim_log(str(tmp_path / "spike.log"), path, full_trace=1)
+  return path
+
+
+def test_csv_bin_round_trip(tmp_path, trace_csv):
+  trace_bin = str(tmp_path / "spike.bin")
+  copy = str(tmp_path / "copy.csv")
+  assert csv_to_bin(trace_csv, trace_bin) == 1001
+  assert bin_to_csv(trace_bin, copy) == 1001
+  with open(trace_csv) as f, open(copy) as g:
+    assert g.read() == f.read()
+
+
+def test_entries(tmp_path, trace_csv):
+  trace_bin = str(tmp_path / "spike.bin")
+  csv_to_bin(trace_csv, trace_bin)
+  with RiscvInstructionTraceBin(trace_bin) as trace:
+    assert len(trace) == 1001
+    entry = trace.entry(0)
+    assert int(entry.pc, 16) == 0x80000000
+    assert [e.pc for e in trace] == [trace.entry(i).pc for i in range(len(trace))]
+
+
+def test_numpy_outlives_trace(tmp_path, trace_csv):
+  np = pytest.importorskip("numpy")
+  trace_bin = str(tmp_path / "spike.bin")
+  csv_to_bin(trace_csv, trace_bin)
+  trace = RiscvInstructionTraceBin(trace_bin)
+  pcs = trace.numpy("pc")
+  trace.close()
+  assert pcs.dtype.itemsize == 8
+  assert np.array_equal(pcs[:3], [0x80000000, 0x80000004, 0x80000008])
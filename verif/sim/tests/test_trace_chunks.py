@@ -0,0 +1,52 @@
+"""
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import pytest
+
+pytest.importorskip("riscv_trace_csv")
+
+import cva6_spike_log_to_trace_csv
+import cva6_trace_io
+import verilator_log_to_trace_csv
+from cva6_trace_benchmark import write_synthetic_logs
+
+
+def read(path):
+  with open(path, "rb") as f:
+    return f.read()
+
+
+@pytest.mark.parametrize("module, process, find_starts, log", [
+  (cva6_spike_log_to_trace_csv, "process_spike_sim_log", "spike_chunk_starts", 0),
+  (verilator_log_to_trace_csv, "process_verilator_sim_log", "verilator_chunk_starts", 1),
+])
+@pytest.mark.parametrize("full_trace", [0, 1])
+def test_chunked_matches_serial(tmp_path, monkeypatch, module, process, find_starts, log, full_trace):
+  logs = [str(tmp_path / "spike.log"), str(tmp_path / "verilator.log")]
+  write_synthetic_logs(logs[0], logs[1], 5000)
+  serial = str(tmp_path / "serial.csv")
+  chunked = str(tmp_path / "chunked.csv")
+  instrs = getattr(module, process)(logs[log], serial, full_trace)
+
+  # Split the log, a few hundred KB, in 8 parts
+  monkeypatch.setattr(cva6_trace_io, "MIN_PART_SIZE", 1 << 12)
+  starts = []
+  split = getattr(module, find_starts)
+  def record_starts(data, num_chunks):
+    starts.extend(split(data, num_chunks))
+    return starts
+  monkeypatch.setattr(module, find_starts, record_starts)
+  assert getattr(module, process)(logs[log], chunked, full_trace, num_jobs=2) == instrs
+  assert len(starts) > 2
+  assert read(chunked) == read(serial)
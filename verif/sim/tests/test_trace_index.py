@@ -0,0 +1,76 @@
+"""
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+
+import pytest
+
+pytest.importorskip("riscv_trace_csv")
+
+from cva6_trace_benchmark import entry_key, write_synthetic_logs
+from cva6_trace_index import build_index, load_index, seek_trace
+from cva6_spike_log_to_trace_csv import process_spike_sim_log, read_spike_trace
+from verilator_log_to_trace_csv import read_verilator_trace
+
+
+@pytest.fixture
+def logs(tmp_path):
+  spike_log = str(tmp_path / "spike.log")
+  verilator_log = str(tmp_path / "verilator.log")
+  write_synthetic_logs(spike_log, verilator_log, 2000)
+  return spike_log, verilator_log
+
+
+def keys(trace):
+  return [entry_key(entry, illegal) for (entry, illegal) in trace]
+
+
+@pytest.mark.parametrize("iss, log, reader", [
+  ("spike", 0, read_spike_trace),
+  ("veri-testharness", 1, read_verilator_trace),
+])
+@pytest.mark.parametrize("full_trace", [0, 1])
+def test_seek_log(logs, iss, log, reader, full_trace):
+  path = logs[log]
+  serial = keys(reader(path, full_trace))
+  index = build_index(path, iss, step=300)
+  assert index["count"] == len(serial)
+  assert len(index["offsets"]) > 2
+  for instr in (0, 1, 299, 300, 301, 1234, len(serial) - 1):
+    assert keys(seek_trace(path, iss, instr, full_trace=full_trace)) == serial[instr:]
+  pc = serial[1234][1]
+  assert keys(seek_trace(path, iss, pc=pc, full_trace=full_trace)) == serial[1234:]
+  assert keys(seek_trace(path, iss, pc=0x1234)) == []
+
+
+def test_seek_csv(tmp_path, logs):
+  path = str(tmp_path / "spike.csv")
+  process_spike_sim_log(logs[0], path, full_trace=1)
+  serial = keys(seek_trace(path))
+  assert len(serial) == 2001
+  build_index(path, step=300)
+  assert keys(seek_trace(path, instr=1500)) == serial[1500:]
+  assert keys(seek_trace(path, pc=serial[700][1])) == serial[700:]
+
+
+def test_stale_index(logs):
+  path = logs[0]
+  build_index(path, "spike", step=300)
+  assert load_index(path) is not None
+  with open(path, "a") as f:
+    f.write("core   0: 0x0000000080010000 (0x00000013) nop\n")
+  assert load_index(path) is None
+  # Rebuilt on the next seek
+  list(seek_trace(path, "spike", 10))
+  assert load_index(path) is not None
@@ -0,0 +1,76 @@
+"""
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import shutil
+
+import pytest
+
+import cva6_trace_io
+from cva6_trace_io import COMPRESSORS, compression, open_log, read_lines
+
+LINES = ["core   0: 0x%016x (0x00000013) nop" % (0x80000000 + 4 * i) for i in range(20000)]
+
+
+def use_tool(monkeypatch, ext, tool):
+  """Compress with the command line tool, or with the Python module"""
+  if tool:
+    if not shutil.which(COMPRESSORS[ext][-1][0]):
+      pytest.skip("%s is not installed" % COMPRESSORS[ext][-1][0])
+  else:
+    if ext == ".zst":
+      pytest.importorskip("zstandard")
+    monkeypatch.setattr(cva6_trace_io.shutil, "which", lambda name: None)
+
+
+@pytest.mark.parametrize("tool", [True, False])
+@pytest.mark.parametrize("ext", sorted(COMPRESSORS))
+def test_round_trip(tmp_path, monkeypatch, ext, tool):
+  use_tool(monkeypatch, ext, tool)
+  path = str(tmp_path / ("trace.log" + ext))
+  assert compression(path) == ext
+  with open_log(path, "w") as f:
+    f.write("\n".join(LINES) + "\n")
+  with open(path, "rb") as f:
+    assert b"nop" not in f.read()
+  with open_log(path, "r") as f:
+    assert f.read().splitlines() == LINES
+  assert list(read_lines(path, chunk_size=1000)) == LINES
+
+
+@pytest.mark.parametrize("tool", [True, False])
+def test_early_close(tmp_path, monkeypatch, tool):
+  use_tool(monkeypatch, ".gz", tool)
+  path = str(tmp_path / "trace.log.gz")
+  with open_log(path, "w") as f:
+    f.write("\n".join(LINES) + "\n")
+  # Stopping a reader before the end of the log is not an error
+  with open_log(path, "r") as f:
+    assert f.readline().rstrip("\n") == LINES[0]
+
+
+@pytest.mark.parametrize("ext", [".gz", ".xz"])
+def test_compressed_conversion(tmp_path, ext):
+  pytest.importorskip("riscv_trace_csv")
+  from cva6_trace_benchmark import write_synthetic_logs
+  from cva6_spike_log_to_trace_csv import process_spike_sim_log
+  spike_log = str(tmp_path / "spike.log")
+  write_synthetic_logs(spike_log, str(tmp_path / "verilator.log"), 1000)
+  with open(spike_log, "rb") as f, open_log(spike_log + ext, "wb") as g:
+    shutil.copyfileobj(f, g)
+  plain = str(tmp_path / "spike.csv")
+  compressed = str(tmp_path / ("spike.csv" + ext))
+  instrs = process_spike_sim_log(spike_log, plain)
+  assert process_spike_sim_log(spike_log + ext, compressed, num_jobs=2) == instrs
+  with open(plain, "r") as f, open_log(compressed, "r") as g:
+    assert g.read() == f.read()
@@ -0,0 +1,48 @@
+"""
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import pytest
+
+pytest.importorskip("riscv_trace_csv")
+
+from cva6_trace_benchmark import entry_key, write_synthetic_logs
+from cva6_spike_log_to_trace_csv import read_spike_trace
+from verilator_log_to_trace_csv import read_verilator_trace
+
+
+@pytest.fixture(scope="module")
+def logs(tmp_path_factory):
+  tmp = tmp_path_factory.mktemp("logs")
+  spike_log = str(tmp / "spike.log")
+  verilator_log = str(tmp / "verilator.log")
+  write_synthetic_logs(spike_log, verilator_log, 2000)
+  return spike_log, verilator_log
+
+
+def read(reader, path, full_trace, engine):
+  return [entry_key(entry, illegal) for (entry, illegal) in reader(path, full_trace, engine)]
+
+
+@pytest.mark.parametrize("full_trace", [0, 1])
+def test_spike_fast_matches_regex(logs, full_trace):
+  fast = read(read_spike_trace, logs[0], full_trace, "fast")
+  assert len(fast) == 2001
+  assert fast == read(read_spike_trace, logs[0], full_trace, "regex")
+
+
+@pytest.mark.parametrize("full_trace", [0, 1])
+def test_verilator_fast_matches_regex(logs, full_trace):
+  fast = read(read_verilator_trace, logs[1], full_trace, "fast")
+  assert len(fast) == 2001
+  assert fast == read(read_verilator_trace, logs[1], full_trace, "regex")
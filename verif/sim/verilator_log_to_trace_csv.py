@@ -27,11 +27,26 @@ sys.path.insert(0, "dv/scripts")
 
 from riscv_trace_csv import *
 from lib import *
+from cva6_trace_entry import GPR_CACHE_SIZE, entry_decoder
+from cva6_trace_io import open_log, read_lines, marker_lines, line_end, chunk_starts, convert_chunks
 
 RD_RE    = re.compile(r"(?P<pri>\d) 0x(?P<addr>[a-f0-9]+?) " \
                       "\((?P<bin>.*?)\) (?P<reg>[xf]\s*\d*?) 0x(?P<val>[a-f0-9]+)")
 CORE_RE  = re.compile(r"core.*0x(?P<addr>[a-f0-9]+?) \(0x(?P<bin>.*?)\) (?P<instr>.*?)$")
 ILLE_RE  = re.compile(r"trap_illegal_instruction")
+HEX_DIGITS = "0123456789abcdef"
+
+# PCs delimiting the trampoline and the debug window, as matched by the
+# end_trampoline_re, start_debug_it_re and stop_debug_it_re of
+# parse_verilator_trace after the leading "core"
+END_TRAMPOLINE = ": 0x0000000080000000 "
+START_DEBUG_IT = ": 0x0000000000000800 "
+STOP_DEBUG_IT  = ": 0x0000000000000890 "
+DASM_RE  = re.compile(r"DASM\((?P<bin>[0-9a-f]+)\)")
+
+# Disassembly of the instructions the trace parser looks at, for traces that
+# did not go through spike-dasm yet
+DASM_INSTR = {"00000073": "ecall", "10500073": "wfi"}
 
 LOGGER = logging.getLogger()
 
@@ -57,18 +72,22 @@ def read_verilator_instr(match, full_trace):
   instruction.
 
   '''
+  return make_verilator_instr(match.group('addr'), match.group('bin'),
+                              match.group('instr'), full_trace)
 
-  # Extract the disassembled instruction.
-  disasm = match.group('instr')
+
+def make_verilator_instr(addr, binary, disasm, full_trace):
+  '''Build the RiscvInstructionTraceEntry of the CORE_RE groups of a line'''
 
   # Spike's disassembler shows a relative jump as something like "j pc +
   # 0x123" or "j pc - 0x123". We just want the relative offset.
-  disasm = disasm.replace('pc + ', '').replace('pc - ', '-')
+  if 'pc ' in disasm:
+    disasm = disasm.replace('pc + ', '').replace('pc - ', '-')
 
   instr = RiscvInstructionTraceEntry()
-  instr.pc = match.group('addr')
+  instr.pc = addr
   instr.instr_str = disasm
-  instr.binary = match.group('bin')
+  instr.binary = binary
 
   if full_trace:
     opcode = disasm.split(' ')[0]
@@ -81,7 +100,61 @@ def read_verilator_instr(match, full_trace):
   return instr
 
 
-def read_verilator_trace(path, full_trace):
+def match_verilator_instr(line):
+  '''Return the (addr, bin, instr) groups of CORE_RE.match(line), or None
+
+  The usual "core   0: 0x<pc> (0x<bin>) <disasm>" lines are split without the
+  regular expression. With a single " (0x" in the line, the greedy "core.*0x"
+  can only stop at the last "0x" before it, and the lazy groups at the first
+  ") " after it and at the end of the line. Other lines go through CORE_RE.
+
+  '''
+  bin_start = line.find(" (0x", 4)
+  if bin_start < 0:
+    return None
+  if line.find(" (0x", bin_start + 4) < 0:
+    addr_start = line.rfind("0x", 4, bin_start) + 2
+    addr = line[addr_start:bin_start]
+    bin_end = line.find(") ", bin_start + 4)
+    if addr_start > 1 and addr and not addr.strip(HEX_DIGITS) and bin_end > 0:
+      disasm = line[bin_end + 2:]
+      if disasm[-1:] == "\n":
+        disasm = disasm[:-1]
+      return addr, line[bin_start + 4:bin_end], disasm
+  match = CORE_RE.match(line)
+  return match and match.group('addr', 'bin', 'instr')
+
+
+def match_verilator_commit(line):
+  '''Return the (pri, reg, val) groups of RD_RE.match(line), or None
+
+  The usual "<pri> 0x<pc> (0x<bin>) x<n> 0x<val>" lines are split without the
+  regular expression, the others go through RD_RE.
+
+  '''
+  if line[:1].isdecimal() and line.startswith(" 0x", 1):
+    addr_end = line.find(" (", 4)
+    bin_end = line.find(") ", addr_end + 2)
+    if addr_end > 4 and not line[4:addr_end].strip(HEX_DIGITS) and bin_end > 0:
+      reg = line[bin_end + 2:bin_end + 3]
+      if reg == "x" or reg == "f":
+        # [xf]\s*\d*? followed by " 0x": the whole register number
+        tail = line[bin_end + 3:]
+        number = tail.lstrip()
+        val_start = number.find(" 0x")
+        if val_start > 0 and number[:val_start].isdecimal():
+          val = number[val_start + 3:]
+          val = val[:len(val) - len(val.lstrip(HEX_DIGITS))]
+          if val:
+            return line[0], reg + tail[:len(tail) - len(number) + val_start], val
+      elif line.find(") ", bin_end + 2) < 0:
+        # No other end for the (bin) group, e.g. a "mem" line
+        return None
+  match = RD_RE.match(line)
+  return match and match.group('pri', 'reg', 'val')
+
+
+def read_verilator_trace(path, full_trace, engine="fast"):
   '''Read a Spike simulation log at <path>, yielding executed instructions.
 
   This assumes that the log was generated with the -l and --log-commits options
@@ -99,6 +172,23 @@ def read_verilator_trace(path, full_trace):
   (entry, illegal). entry is a RiscvInstructionTraceEntry. illegal is a
   boolean, which is true if the instruction caused an illegal instruction trap.
 
+  engine selects parse_verilator_trace_fast ("fast") or the reference
+  parse_verilator_trace ("regex"), which yield the same entries.
+
+  '''
+  if engine == "regex":
+    with open_log(path, 'r') as handle:
+      yield from parse_verilator_trace(handle, full_trace)
+  else:
+    yield from parse_verilator_trace_fast(read_lines(path), full_trace)
+
+
+def parse_verilator_trace(lines, full_trace):
+  '''Parse the lines of a Verilator simulation log, as read_verilator_trace
+
+  lines can be any iterable of lines, e.g. the lines of a log that is still
+  being written.
+
   '''
 
   # This loop is a simple FSM with states TRAMPOLINE, INSTR, EFFECT. The idea
@@ -122,91 +212,231 @@ def read_verilator_trace(path, full_trace):
   in_debug = False
   instr = None
 
-  with open(path, 'r') as handle:
-    for line in handle:
-      if in_trampoline:
-        # The TRAMPOLINE state
-        if end_trampoline_re.match(line):
-          in_trampoline = False
-        else :
-          continue
+  for line in lines:
+    if in_trampoline:
+      # The TRAMPOLINE state
+      if end_trampoline_re.match(line):
+        in_trampoline = False
+      else :
+        continue
 
-      if not in_trampoline:
-        if in_debug:
-          if stop_debug_it_re.match(line):
-            in_debug = False
-          continue
-        else:
-          if start_debug_it_re.match(line):
-            in_debug = True
-            continue
-
-      if instr is None:
-        # The INSTR state. We expect to see a line matching CORE_RE. We'll
-        # discard any other lines.
-        instr_match = CORE_RE.match(line)
-        if not instr_match:
+    if not in_trampoline:
+      if in_debug:
+        if stop_debug_it_re.match(line):
+          in_debug = False
+        continue
+      else:
+        if start_debug_it_re.match(line):
+          in_debug = True
           continue
 
-        instr = read_verilator_instr(instr_match, full_trace)
+    if instr is None:
+      # The INSTR state. We expect to see a line matching CORE_RE. We'll
+      # discard any other lines.
+      instr_match = CORE_RE.match(line)
+      if not instr_match:
+        continue
+
+      instr = read_verilator_instr(instr_match, full_trace)
 
-        # If instr.instr_str is 'ecall', we should stop.
-        if instr.instr_str == 'ecall':
-          break
+      # If instr.instr_str is 'ecall', we should stop.
+      if instr.instr_str == 'ecall':
+        break
+
+      continue
 
+    # The EFFECT state. If the line matches CORE_RE, we should have been in
+    # state INSTR, so we yield the instruction we had, read the new
+    # instruction and continue. As above, if the new instruction is 'ecall',
+    # we need to stop immediately.
+    instr_match = CORE_RE.match(line)
+    if instr_match:
+      yield (instr, False)
+      instr = read_verilator_instr(instr_match, full_trace)
+      if instr.instr_str == 'ecall':
+        break
+      continue
+
+    # The line doesn't match CORE_RE, so we are definitely on a follow-on
+    # line in the log. First, check for illegal instructions
+    if 'trap_illegal_instruction' in line:
+      yield (instr, True)
+      instr = None
+      continue
+
+    # The instruction seems to have been fine. Do we have commit data (from
+    # the --log-commits Spike option)?
+    commit_match = RD_RE.match(line)
+    if commit_match:
+      instr.gpr.append(gpr_to_abi(commit_match.group('reg')
+                                  .replace(' ', '')) +
+                       ':' + commit_match.group('val'))
+      instr.mode = commit_match.group('pri')
+
+  # At EOF, we might have an instruction in hand. Yield it if so.
+  if instr is not None:
+    yield (instr, False)
+
+
+def parse_verilator_trace_fast(lines, full_trace, in_trampoline=True):
+  '''Parse the lines of a Verilator simulation log, as parse_verilator_trace
+
+  This is the same state machine, yielding the same entries, without its
+  per-line regular expressions: the trampoline and debug markers are
+  substring tests on the lines starting with "core", the instruction and
+  commit lines are split by match_verilator_instr and match_verilator_commit,
+  and the ABI name of each register is only looked up once. The entries are
+  compact TraceEntry objects, see entry_decoder, and the "abi:value" gpr
+  strings of repeated register writes are shared.
+
+  in_trampoline is false for lines that start after the trampoline, e.g. a
+  chunk of verilator_chunk_starts.
+
+  '''
+  abi_prefixes = {}
+  gpr_writes = {}
+  new_instr = entry_decoder(make_verilator_instr, full_trace)
+
+  in_debug = False
+  instr = None
+
+  for line in lines:
+    is_core = line.startswith("core")
+    if in_trampoline:
+      # The TRAMPOLINE state
+      if is_core and line.find(END_TRAMPOLINE, 4) >= 0:
+        in_trampoline = False
+      else:
         continue
 
-      # The EFFECT state. If the line matches CORE_RE, we should have been in
-      # state INSTR, so we yield the instruction we had, read the new
-      # instruction and continue. As above, if the new instruction is 'ecall',
-      # we need to stop immediately.
-      instr_match = CORE_RE.match(line)
-      if instr_match:
+    if in_debug:
+      if is_core and line.find(STOP_DEBUG_IT, 4) >= 0:
+        in_debug = False
+      continue
+    elif is_core and line.find(START_DEBUG_IT, 4) >= 0:
+      in_debug = True
+      continue
+
+    if instr is None:
+      # The INSTR state
+      groups = match_verilator_instr(line) if is_core else None
+      if not groups:
+        continue
+      instr = new_instr(*groups)
+      if instr.instr_str == 'ecall':
+        break
+      continue
+
+    # The EFFECT state
+    if is_core:
+      groups = match_verilator_instr(line)
+      if groups:
         yield (instr, False)
-        instr = read_verilator_instr(instr_match, full_trace)
+        instr = new_instr(*groups)
         if instr.instr_str == 'ecall':
           break
         continue
 
-      # The line doesn't match CORE_RE, so we are definitely on a follow-on
-      # line in the log. First, check for illegal instructions
-      if 'trap_illegal_instruction' in line:
-        yield (instr, True)
-        instr = None
+    if 'trap_illegal_instruction' in line:
+      yield (instr, True)
+      instr = None
+      continue
+
+    if line[:1].isdecimal():
+      groups = match_verilator_commit(line)
+      if groups:
+        pri, reg, val = groups
+        gpr = gpr_writes.get((reg, val))
+        if gpr is None:
+          abi = abi_prefixes.get(reg)
+          if abi is None:
+            abi = abi_prefixes[reg] = gpr_to_abi(reg.replace(' ', '')) + ':'
+          if len(gpr_writes) >= GPR_CACHE_SIZE:
+            gpr_writes.clear()
+          gpr = gpr_writes[(reg, val)] = abi + val
+        instr.gpr.append(gpr)
+        instr.mode = pri
+
+  # At EOF, we might have an instruction in hand. Yield it if so.
+  if instr is not None:
+    yield (instr, False)
+
+
+def undasm_lines(lines):
+  '''Fill in the DASM(<binary>) placeholders of a raw RVFI trace
+
+  The testharness writes trace_rvfi_hart_00.dasm with placeholders that
+  spike-dasm replaces once the simulation is over. Only the instructions that
+  parse_verilator_trace looks at (ecall, wfi) are disassembled here, the
+  others keep their placeholder, which is enough to compare the register
+  updates of a trace while it is written.
+  '''
+  for line in lines:
+    if "DASM(" in line:
+      line = DASM_RE.sub(lambda m: DASM_INSTR.get(m.group('bin'), m.group(0)), line)
+    yield line
+
+
+def verilator_chunk_starts(data, num_chunks):
+  '''Split the content of a Verilator log for chunk_starts
+
+  The state of parse_verilator_trace_fast only changes at the trampoline and
+  debug markers, which are found without parsing the other lines. A chunk
+  starts at an instruction line out of the trampoline and debug window, so
+  that the commit lines following a debug window still go to the instruction
+  before it.
+
+  '''
+  changes = []
+  in_trampoline = True
+  in_debug = False
+  markers = [marker.encode() for marker in (END_TRAMPOLINE, START_DEBUG_IT, STOP_DEBUG_IT)]
+  for offset in marker_lines(data, markers):
+    end = line_end(data, offset)
+    line = data[offset:end].decode(errors='replace')
+    if not line.startswith("core"):
+      continue
+    if in_trampoline:
+      if line.find(END_TRAMPOLINE, 4) < 0:
         continue
+      in_trampoline = False
+    if in_debug:
+      if line.find(STOP_DEBUG_IT, 4) >= 0:
+        in_debug = False
+    elif line.find(START_DEBUG_IT, 4) >= 0:
+      in_debug = True
+    changes.append((end + 1, not (in_trampoline or in_debug)))
 
-      # The instruction seems to have been fine. Do we have commit data (from
-      # the --log-commits Spike option)?
-      commit_match = RD_RE.match(line)
-      if commit_match:
-        instr.gpr.append(gpr_to_abi(commit_match.group('reg')
-                                    .replace(' ', '')) +
-                         ':' + commit_match.group('val'))
-        instr.mode = commit_match.group('pri')
-
-    # At EOF, we might have an instruction in hand. Yield it if so.
-    if instr is not None:
-      yield (instr, False)
+  def is_start(line):
+    return line.startswith("core") and line.find(START_DEBUG_IT, 4) < 0 \
+      and match_verilator_instr(line) is not None
 
+  return chunk_starts(data, num_chunks, False, changes, is_start)
 
-def process_verilator_sim_log(verilator_log, csv, full_trace = 0):
-  """Process VERILATOR simulation log.
 
-  Extract instruction and affected register information from verilator simulation
-  log and write the results to a CSV file at csv. Returns the number of
-  instructions written.
+def convert_verilator_chunk(verilator_log, start, end, csv, index, full_trace):
+  '''Convert the bytes [start, end) of a Verilator log for convert_chunks'''
+  lines = read_lines(verilator_log, start=start, end=end)
+  trace = parse_verilator_trace_fast(lines, full_trace, in_trampoline=index == 0)
+  return write_verilator_csv(trace, csv, full_trace)
 
-  """
-  logging.info("Processing verilator log : %s" % verilator_log)
 
+def write_verilator_csv(trace, csv, full_trace):
+  '''Write the instructions of a trace with an architectural update to a CSV file
+
+  Returns the numbers of instructions read and written, and whether the
+  trace stopped at an ecall.
+
+  '''
   instrs_in = 0
   instrs_out = 0
+  entry = None
 
-  with open(csv, "w") as csv_fd:
+  with open_log(csv, "w") as csv_fd:
     trace_csv = RiscvInstructionTraceCsv(csv_fd)
     trace_csv.start_new_trace()
 
-    for (entry, illegal) in read_verilator_trace(verilator_log, full_trace):
+    for (entry, illegal) in trace:
       instrs_in += 1
 
       if illegal and full_trace:
@@ -225,6 +455,28 @@ def process_verilator_sim_log(verilator_log, csv, full_trace = 0):
       trace_csv.write_trace_entry(entry)
       instrs_out += 1
 
+  return instrs_in, instrs_out, entry is not None and entry.instr_str == 'ecall'
+
+
+def process_verilator_sim_log(verilator_log, csv, full_trace = 0, num_jobs = 1):
+  """Process VERILATOR simulation log.
+
+  Extract instruction and affected register information from verilator simulation
+  log and write the results to a CSV file at csv. Returns the number of
+  instructions written.
+
+  With num_jobs > 1, large logs are converted in parallel chunks.
+
+  """
+  logging.info("Processing verilator log : %s" % verilator_log)
+
+  if num_jobs > 1:
+    instrs_in, instrs_out = convert_chunks(verilator_log, csv, num_jobs, verilator_chunk_starts,
+                                           convert_verilator_chunk, full_trace)
+  else:
+    trace = read_verilator_trace(verilator_log, full_trace)
+    instrs_in, instrs_out, _ = write_verilator_csv(trace, csv, full_trace)
+
   logging.info("Processed instruction count : %d" % instrs_in)
   logging.info("CSV saved to : %s" % csv)
   return instrs_out
@@ -233,18 +485,20 @@ def process_verilator_sim_log(verilator_log, csv, full_trace = 0):
 def main():
   # Parse input arguments
   parser = argparse.ArgumentParser()
-  parser.add_argument("--log", type=str, help="Input verilator simulation log")
-  parser.add_argument("--csv", type=str, help="Output trace csv_buf file")
+  parser.add_argument("--log", type=str, help="Input verilator simulation log, possibly .gz/.zst/.xz compressed")
+  parser.add_argument("--csv", type=str, help="Output trace csv_buf file, compressed if it ends in .gz/.zst/.xz")
   parser.add_argument("-f", "--full_trace", dest="full_trace", action="store_true",
                                          help="Generate the full trace")
   parser.add_argument("-v", "--verbose", dest="verbose", action="store_true",
                                          help="Verbose logging")
+  parser.add_argument("-j", "--jobs", type=int, default=1,
+                                         help="Number of processes converting chunks of the log")
   parser.set_defaults(full_trace=False)
   parser.set_defaults(verbose=False)
   args = parser.parse_args()
   setup_logging(args.verbose)
   # Process verilator log
-  process_verilator_sim_log(args.log, args.csv, args.full_trace)
+  process_verilator_sim_log(args.log, args.csv, args.full_trace, args.jobs)
 
 
 if __name__ == "__main__":